@@ -1,3 +1,15 @@
-from dofu import modules
+import importlib
+
 from dofu import package_managers
 from dofu import package_requirements
+
+
+def __getattr__(name: str):
+    # import the registered modules lazily,
+    # so that applying a compiled plan requires no module registry
+    if name == "modules":
+        return importlib.import_module(f"{__name__}.{name}")
+    # the session imports all the modules, so it is exported lazily as well
+    if name == "Session":
+        return importlib.import_module(f"{__name__}.session").Session
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
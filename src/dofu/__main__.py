@@ -1,15 +1,29 @@
 import logging
+import os
 import shlex
+import sys
 import typing
 
 import fire
 
-from dofu import env, gum
+from dofu import bundle as bdl, client, env, gum, shutils
+from dofu import modules  # noqa: F401 - register all the modules
+from dofu.daemon import Daemon
 from dofu.equipment import ModuleEquipmentManager
+from dofu.export import export_dockerfile
+from dofu.generation import Generation
 from dofu.inspect import extend_interface
+from dofu.lockfile import LockFile
 from dofu.logging import init as init_logging
 from dofu.module import ModuleRegistrationManager
 from dofu.options import Options, Strategy
+from dofu.ownership import OwnershipIndex
+from dofu.plan import Plan
+from dofu.runner import CompiledPlan
+from dofu.sandbox import Sandbox, touched_paths
+from dofu.target import Target, fan_out
+from dofu.verification import StateIndex
+from dofu.watch import watch
 
 _logger = logging.getLogger("dofu.app")
 
@@ -29,6 +43,11 @@ class App:
         dry_run: bool = False,
         strategy: typing.Literal["ask", "force", "auto", "quit"] = "ask",
         loglevel: typing.Literal["debug", "info", "warn", "error", "fatal"] = None,
+        jobs: int = 1,
+        refresh: bool = False,
+        prefetch: bool = False,
+        decisions: str = None,
+        locked: bool = False,
     ):
         """
         :param dry_run: Dry run mode without changing anything.
@@ -36,12 +55,29 @@ class App:
             Can be one of "ask", "force", "auto", "quit".
         :param loglevel: The log level.
             Can be one of "debug", "info", "warn", "error", "fatal".
+        :param jobs: The maximum number of modules to equip or remove concurrently.
+        :param refresh: Sync every module even if nothing seems changed.
+        :param prefetch: Download everything before changing anything.
+        :param decisions: The yaml file of the strategies decided for conflicting paths,
+            like the one written by `dofu conflicts --output`.
+        :param locked: Sync git repos and packages to the pins in dofu.lock,
+            like the one written by `dofu lock`.
         """
         init_logging(loglevel=loglevel)
 
         options = Options.instance()
         options.dry_run = dry_run
         options.strategy = Strategy.from_name(strategy)
+        options.jobs = jobs
+        options.refresh = refresh
+        options.prefetch = prefetch
+        if decisions:
+            options.decisions = shutils.load_decisions(decisions)
+        if locked:
+            if not os.path.exists(env.lock_file()):
+                _logger.error(f"No lock file {env.lock_file()}, run `dofu lock` first")
+                sys.exit(1)
+            options.pins = LockFile.load(env.lock_file())
 
     @staticmethod
     @extend_interface(__init)
@@ -92,7 +128,130 @@ class App:
 
     @staticmethod
     @extend_interface(__init)
-    def equip(*module_names: str):
+    def plan(*module_names: str, fmt: typing.Literal["table", "json"] = "table"):
+        """
+        Plan a sync.
+
+        Print the actions that syncing the modules with the given names would take,
+        together with the estimated durations from past runs.
+        If no modules are given, the equipped modules are planned.
+        Nothing is changed, and only the fingerprints and pinned checkouts are probed,
+        so planning is cheap and side-effect-free.
+
+        :param module_names: The names of modules to sync.
+        :param fmt: The format to print the plan in. Can be one of "table", "json".
+        """
+        # load module equipment meta information
+        manager = ModuleEquipmentManager.load()
+
+        module_names = module_names or manager.equipped_module_names()
+        Plan.resolve_sync(manager, list(module_names)).print(fmt)
+
+    @staticmethod
+    @extend_interface(__init)
+    def owns(*paths: str):
+        """
+        Find who manages paths.
+
+        Print the module and command managing each of the given paths,
+        looked up in the ownership index without loading the equipment state.
+
+        :param paths: The paths to look up.
+        """
+        # the index is stale if an interrupted run has journaled some steps
+        index = None
+        if not os.path.exists(env.equipment_journal_file()):
+            index = OwnershipIndex.load(env.ownership_persistence_file())
+        if index is None:
+            index = ModuleEquipmentManager.load().ownership
+
+        for path in paths:
+            owner = index.lookup(path)
+            if owner is None:
+                _logger.info(f"{path} is not managed by any module")
+            elif owner.transaction is None:
+                _logger.info(
+                    f"{path} is managed by {owner.module_name} - {owner.cmdline}"
+                )
+            else:
+                _logger.info(
+                    f"{path} is managed by {owner.module_name}"
+                    f" - command #{owner.command + 1} of transaction"
+                    f" #{owner.transaction + 1} - {owner.cmdline}"
+                )
+
+    @staticmethod
+    @extend_interface(__init)
+    def verify(*module_names: str):
+        """
+        Verify equipped modules.
+
+        Check the paths managed by the modules with the given names for drift
+        from the states recorded when they were equipped,
+        without loading the equipment state.
+        If no modules are given, all the equipped modules are verified.
+        Exit with 1 if any path has drifted.
+
+        :param module_names: The names of the modules to verify.
+        """
+        index = StateIndex.load(env.state_persistence_file())
+        for module_name in module_names:
+            if module_name not in index.module_names():
+                _logger.warning(f"No recorded states of module {module_name}")
+
+        drifted = 0
+        for module_name, drifts in index.verify(module_names or None).items():
+            if not drifts:
+                _logger.debug(f"Module {module_name} has not drifted")
+                continue
+
+            _logger.warning(f"Module {module_name} has drifted:")
+            for path, reason in drifts:
+                _logger.warning(f" - {path}: {reason}")
+            drifted += 1
+
+        if drifted:
+            _logger.error(f"{drifted} modules have drifted")
+            sys.exit(1)
+
+    @staticmethod
+    @extend_interface(__init)
+    def conflicts(*module_names: str, output: str = None):
+        """
+        Scan conflicts.
+
+        Find the paths that already exist where equipping the modules
+        with the given names would create something, without changing anything.
+        If no modules are given, the equipped modules are scanned.
+
+        :param module_names: The names of modules to scan.
+        :param output: The path of the decisions file to write,
+            where each conflict is decided to be backed up by default.
+            Edit it and pass it to `--decisions` to run without any prompt.
+        """
+        # load module equipment meta information
+        manager = ModuleEquipmentManager.load()
+
+        module_names = module_names or manager.equipped_module_names()
+        blueprint = ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+        conflicts = manager.scan_conflicts(blueprint)
+        for ensure in conflicts:
+            _logger.info(ensure.failure_message())
+        _logger.info(f"{len(conflicts)} conflicts found")
+
+        if output:
+            shutils.save_decisions(
+                output,
+                {ensure.decision_key(): Strategy.AUTO for ensure in conflicts},
+            )
+
+    @staticmethod
+    @extend_interface(__init)
+    def equip(
+        *module_names: str,
+        targets: typing.Union[str, typing.List[str]] = None,
+        from_bundle: str = None,
+    ):
         """
         Equip modules.
 
@@ -102,10 +261,23 @@ class App:
         The order of equipping is determined by the dependency graph automatically.
 
         :param module_names: The names of modules to equip.
+        :param targets: The homes to equip into in parallel instead of your home,
+            separated by commas. Each one is like "HOME" or "HOME:CACHE_ROOT".
+        :param from_bundle: The bundle written by `dofu bundle` to equip all its
+            modules from, without network.
         """
         # load module equipment meta information
         manager = ModuleEquipmentManager.load()
 
+        if from_bundle:
+            if module_names or targets:
+                _logger.error("The modules of a bundle are fixed when bundling")
+                sys.exit(1)
+
+            with bdl.extracted(from_bundle) as plan:
+                plan.apply(manager)
+            return
+
         # choose modules to equip
         module_names = (
             gum.choose(
@@ -121,7 +293,9 @@ class App:
         )
 
         module_names = list(filter(None, module_names))
-        if module_names:
+        if module_names and targets:
+            fan_out("equip", module_names, _parse_targets(targets))
+        elif module_names:
             manager.equip(module_names)
 
     @staticmethod
@@ -205,7 +379,7 @@ class App:
 
     @staticmethod
     @extend_interface(__init)
-    def sync(*module_names: str):
+    def sync(*module_names: str, targets: typing.Union[str, typing.List[str]] = None):
         """
         Sync modules.
 
@@ -216,6 +390,8 @@ class App:
         The order of equipping is determined by the dependency graph automatically.
 
         :param module_names: The names of modules to equip.
+        :param targets: The homes to sync in parallel instead of your home,
+            separated by commas. Each one is like "HOME" or "HOME:CACHE_ROOT".
         """
         # load module equipment meta information
         manager = ModuleEquipmentManager.load()
@@ -235,9 +411,295 @@ class App:
         )
 
         module_names = list(filter(None, module_names))
-        if module_names:
+        if module_names and targets:
+            fan_out("sync", module_names, _parse_targets(targets))
+        elif module_names:
             manager.sync(module_names)
 
+    @staticmethod
+    @extend_interface(__init)
+    def lock(*module_names: str):
+        """
+        Lock equipped modules.
+
+        Write the commit id of every git repo and the installed version of
+        every package of the modules with the given names into dofu.lock,
+        so that `--locked` syncs any machine to exactly the same pins.
+        If no modules are given, all the equipped modules are locked.
+
+        :param module_names: The names of the modules to lock.
+        """
+        manager = ModuleEquipmentManager.load()
+
+        module_names = module_names or manager.equipped_module_names()
+        for module_name in module_names:
+            if module_name not in manager.meta:
+                _logger.warning(f"Module {module_name} is not equipped")
+
+        lock = LockFile.capture(
+            manager.meta[name] for name in module_names if name in manager.meta
+        )
+        lock.save(env.lock_file())
+
+        _logger.info(
+            f"Locked {len(lock.gitrepos)} gitrepos"
+            f" and {sum(map(len, lock.packages.values()))} packages"
+            f" into {env.lock_file()}"
+        )
+
+    @staticmethod
+    @extend_interface(__init)
+    def bisect(module_name: str, *, check: str):
+        """
+        Bisect the commands of a module.
+
+        Find the command that breaks an equipped module by binary search,
+        rolling back and executing the recorded commands again between checks.
+        All the commands are applied again after bisecting.
+
+        :param module_name: The name of the equipped module to bisect.
+        :param check: The shell script to check the module with,
+            which should exit with 0 if the module works.
+        """
+        # load module equipment meta information
+        manager = ModuleEquipmentManager.load()
+
+        index = manager.bisect(module_name, lambda: shutils.call(check) == 0)
+        if index is not None:
+            commands = list(manager.meta[module_name].commands())
+            _logger.info(
+                f"The first bad command is #{index + 1}/{len(commands)}"
+                f" - {commands[index].cmdline()}"
+            )
+
+    @staticmethod
+    @extend_interface(__init)
+    def watch(*module_names: str, debounce: float = 0.5, polling: bool = False):
+        """
+        Watch modules.
+
+        Watch the project and the paths managed by the modules with the given names,
+        and re-apply only the modules affected by each batch of changes.
+        If no modules are given, the equipped modules are watched.
+
+        :param module_names: The names of modules to watch.
+        :param debounce: The seconds without any change before re-applying.
+        :param polling: Poll for changes even if inotify is available.
+        """
+        # load module equipment meta information
+        manager = ModuleEquipmentManager.load()
+
+        module_names = module_names or manager.equipped_module_names()
+        try:
+            watch(list(module_names), debounce=debounce, polling=polling)
+
+        except KeyboardInterrupt:
+            _logger.info("Stopped watching")
+
+    @staticmethod
+    @extend_interface(__init)
+    def daemon(*, stop: bool = False):
+        """
+        Run the daemon.
+
+        Keep dofu resident and serve the commands of the command line
+        over a Unix socket, so that they are answered without starting dofu again.
+        Queries are always served by the daemon while it is running,
+        and so are the equipping commands given the modules and a strategy
+        other than "ask". Other commands, or any command with DOFU_NO_DAEMON set,
+        run locally as usual.
+
+        :param stop: Stop the running daemon instead.
+        """
+        if stop:
+            if not client.stop():
+                _logger.info("No daemon is running")
+            return
+
+        try:
+            Daemon(env.daemon_socket_file(), App).serve()
+
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    @extend_interface(__init)
+    def try_(module_name: str, *, shell: str = None, keep: bool = False):
+        """
+        Try a module in a sandbox.
+
+        Equip the module with the given name in a disposable copy of your home,
+        and drop you into a shell in it.
+        The real home and the real equipment state are left untouched,
+        while the packages required by the module are still installed as usual.
+        The sandbox is discarded once the shell exits.
+
+        :param module_name: The name of the module to try.
+        :param shell: The shell to drop into, $SHELL by default.
+        :param keep: Keep the sandbox after the shell exits.
+        """
+        options = Options.instance()
+        sandbox = Sandbox.create(touched_paths([module_name]))
+        try:
+            retcode = sandbox.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "dofu",
+                    "equip",
+                    module_name,
+                    f"--strategy={options.strategy.name.lower()}",
+                    f"--jobs={options.jobs}",
+                    f"--dry_run={options.dry_run}",
+                ]
+            )
+            if retcode != 0:
+                _logger.error(f"Failed to equip module {module_name} in the sandbox")
+
+            _logger.info(f"Entering sandbox home {sandbox.home}, exit to discard it")
+            sandbox.run([shell or os.environ.get("SHELL", "/bin/sh")])
+
+        finally:
+            if keep:
+                _logger.info(f"Kept sandbox {sandbox.path}")
+            else:
+                sandbox.discard()
+
+    @staticmethod
+    @extend_interface(__init)
+    def build(name: str, *module_names: str):
+        """
+        Build a generation.
+
+        Materialize the managed symlinks and directories of the modules
+        with the given names into a generation, without touching the user home.
+        All the dependencies of the modules will be materialized as well.
+        If no modules are given, you will be asked to choose modules to build.
+
+        :param name: The name of the generation, like "server" or "workstation".
+        :param module_names: The names of modules to build.
+        """
+        module_names = (
+            gum.choose(
+                *ModuleRegistrationManager.all_module_names(),
+                header=f"Choose modules to build generation {name}",
+                no_limit=True,
+            )
+            .strip()
+            .split("\n")
+            if not module_names
+            else module_names
+        )
+
+        module_names = list(filter(None, module_names))
+        if module_names:
+            Generation.build(name, module_names)
+
+    @staticmethod
+    @extend_interface(__init)
+    def switch(name: str = None):
+        """
+        Switch generations.
+
+        Make the built generation with the given name live by an atomic swap.
+        If no name is given, switch back to the previous generation.
+
+        :param name: The name of the generation to switch to.
+        """
+        generation = Generation.load(name) if name else Generation.previous()
+        if generation is None:
+            _logger.warning("No previous generation to switch back to, quit.")
+            return
+
+        generation.switch()
+
+    @staticmethod
+    @extend_interface(__init)
+    def generations():
+        """
+        List generations.
+
+        List all the built generations and their modules.
+        """
+        current, previous = Generation.current(), Generation.previous()
+        for name in Generation.names():
+            generation = Generation.load(name)
+            mark = ""
+            if current and current.name == name:
+                mark = " [green]Current[/]"
+            elif previous and previous.name == name:
+                mark = " [blue]Previous[/]"
+
+            _logger.info(f"Generation {name}{mark}")
+            _logger.debug(f"  - Modules: {', '.join(generation.module_names)}")
+
+    @staticmethod
+    @extend_interface(__init)
+    def compile(*module_names: str, output: str = "dofu-plan.yaml"):
+        """
+        Compile modules into a plan.
+
+        Resolve the blueprint of equipping the modules with the given names,
+        and serialize all their packages, gitrepos and commands into a single file.
+        The file can be applied by `dofu-run` on any machine with the same layout,
+        without importing the modules or resolving the blueprint again.
+
+        :param module_names: The names of modules to compile.
+        :param output: The path of the compiled plan.
+        """
+        module_names = module_names or ModuleRegistrationManager.all_module_names()
+        plan = CompiledPlan.compile(list(module_names))
+        plan.save(output)
+
+        _logger.info(f"Compiled {len(plan.modules)} modules into {output}")
+
+    @staticmethod
+    @extend_interface(__init)
+    def bundle(*module_names: str, output: str = "bundle.tar"):
+        """
+        Bundle modules for offline equipping.
+
+        Pack the compiled plan of the modules with the given names,
+        a git bundle of every git repo they clone,
+        and the archives of their packages where the package manager supports it,
+        into a tar file to be equipped by `dofu equip --from-bundle`
+        on a machine without network.
+
+        :param module_names: The names of modules to bundle.
+        :param output: The path of the tar file.
+        """
+        module_names = module_names or ModuleRegistrationManager.all_module_names()
+        bdl.create_bundle(list(module_names), output)
+
+    @staticmethod
+    @extend_interface(__init)
+    def export(
+        kind: typing.Literal["dockerfile"],
+        *module_names: str,
+        output: str = "Dockerfile.dofu",
+        base: str = "ubuntu:22.04",
+    ):
+        """
+        Export modules as a build recipe of a container image.
+
+        The Dockerfile is layered from the least to the most frequently changed,
+        that is, system packages, git repos, dofu itself,
+        and then the config of each module from the least recently changed one,
+        so that a config tweak only rebuilds the layers after it.
+        It must be built with the project as the context.
+
+        :param kind: The kind of the recipe, only `dockerfile` is supported.
+        :param module_names: The names of modules to export.
+        :param output: The path of the Dockerfile, which must be in the project.
+        :param base: The base image, which must be based on apt.
+        """
+        if kind != "dockerfile":
+            _logger.error(f"Unsupported export kind {kind}, expected dockerfile")
+            sys.exit(1)
+
+        module_names = module_names or ModuleRegistrationManager.all_module_names()
+        export_dockerfile(list(module_names), output, base=base)
+
     @staticmethod
     @extend_interface(__init)
     def integrate():
@@ -248,14 +710,25 @@ class App:
         command is available globally (typically under ~/.local/bin/dofu).
         Run `uv tool update-shell` once if that directory is not on PATH.
         """
-        from dofu import shutils
-
         project = str(env.project_path())
         shutils.check_call(
             f"uv tool install --force --editable {shlex.quote(project)}"
         )
 
 
+def _parse_targets(targets: typing.Union[str, typing.List[str]]) -> typing.List[Target]:
+    """
+    Parse the targets given in the command line.
+    """
+    specs = targets.split(",") if isinstance(targets, str) else targets
+    return [Target.parse(spec) for spec in filter(None, specs)]
+
+
+# `try` is a keyword, so the command is renamed after the class is defined
+setattr(App, "try", App.__dict__["try_"])
+delattr(App, "try_")
+
+
 def main():
     fire.Fire(App())
 
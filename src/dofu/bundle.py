@@ -0,0 +1,160 @@
+import concurrent.futures
+import contextlib
+import logging
+import os
+import tarfile
+import tempfile
+import typing as t
+
+from dofu import env, mirrors, package_managers as pms, utils, version_control as vc
+from dofu.options import Options
+from dofu.runner import CompiledPlan
+
+_logger = logging.getLogger(__name__)
+
+_PLAN = "plan.yaml"
+"""
+Path of the compiled plan in a bundle.
+"""
+
+_GITREPOS = "gitrepos"
+"""
+Directory of the git bundle files in a bundle.
+"""
+
+_PACKAGES = "packages"
+"""
+Directory of the package archives in a bundle, one subdirectory per package manager.
+"""
+
+
+def create_bundle(module_names: t.List[str], output: os.PathLike, *, max_workers=8):
+    """
+    Pack everything equipping the modules needs into a tar file,
+    so that they can be equipped on a machine without network.
+
+    The bundle contains the compiled plan of the modules,
+    a git bundle file of every git repo with all its branches and tags,
+    and the archives of the packages whose package manager supports archiving,
+    with their dependencies missing on this machine.
+
+    :param module_names: names of the modules.
+    :param output: path of the tar file.
+    :param max_workers: maximum number of downloads running at the same time.
+    """
+    plan = CompiledPlan.compile(module_names)
+
+    gitrepos = {git.url: git for module in plan.modules for git in module.gitrepos}
+    batches = {}
+    for module in plan.modules:
+        for pkg in module.packages:
+            manager = pkg.available_manager()
+            if manager is None:
+                _logger.warning(f"No package manager available for {pkg.spec.package}")
+                continue
+            batches.setdefault(type(manager), (manager, []))[1].append(pkg.spec)
+
+    with tempfile.TemporaryDirectory(dir=env.cache_root()) as staging:
+        plan.save(os.path.join(staging, _PLAN))
+        os.makedirs(os.path.join(staging, _GITREPOS))
+
+        def pack_gitrepo(git) -> str:
+            mirror = mirrors.update_mirror(git.url, reference=git.path)
+            vc.bundle_create(
+                "--all", repo_path=mirror, file=_bundle_file(staging, git.url)
+            )
+            return git.url
+
+        def pack_packages(manager, specs) -> str:
+            name = type(manager).__name__
+            directory = os.path.join(staging, _PACKAGES, name)
+            os.makedirs(directory)
+            if not manager.archive(specs, directory):
+                _logger.warning(
+                    f"{name} cannot archive packages, they will be installed online"
+                    f" - {[spec.package for spec in specs]}"
+                )
+                os.rmdir(directory)
+            return name
+
+        # an incomplete bundle is useless offline, so any failure fails the bundling
+        with utils.ContextExecutor(max_workers=max_workers) as executor:
+            futures = [
+                *(executor.submit(pack_gitrepo, git) for git in gitrepos.values()),
+                *(executor.submit(pack_packages, *batch) for batch in batches.values()),
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                _logger.info(f"Packed {future.result()}")
+
+        if Options.instance().dry_run:
+            return
+
+        tmp = f"{output}.tmp"
+        with tarfile.open(tmp, "w") as tar:
+            for name in sorted(os.listdir(staging)):
+                tar.add(os.path.join(staging, name), arcname=name)
+        os.replace(tmp, output)
+
+    _logger.info(
+        f"Bundled {len(plan.modules)} modules with {len(gitrepos)} gitrepos"
+        f" into {output}"
+    )
+
+
+@contextlib.contextmanager
+def extracted(path: os.PathLike) -> t.Iterator[CompiledPlan]:
+    """
+    Extract a bundle made by `create_bundle` and install its package archives.
+
+    In the context, the git repos are cloned and fetched from the bundle,
+    so that applying the yielded plan needs no network.
+
+    :param path: path of the tar file.
+    :return: context manager yielding the compiled plan in the bundle.
+    """
+    with tempfile.TemporaryDirectory(dir=env.cache_root()) as root:
+        with tarfile.open(path, "r") as tar:
+            _extract(tar, root)
+
+        plan = CompiledPlan.load(os.path.join(root, _PLAN))
+
+        packages_root = os.path.join(root, _PACKAGES)
+        if os.path.isdir(packages_root):
+            for name in sorted(os.listdir(packages_root)):
+                _logger.info(f"Installing the package archives of {name}")
+                manager = getattr(pms, name)()
+                manager.install_archives(os.path.join(packages_root, name))
+
+        bundles = {}
+        for module in plan.modules:
+            for git in module.gitrepos:
+                file = _bundle_file(root, git.url)
+                if os.path.isfile(file):
+                    bundles[git.url] = file
+                else:
+                    _logger.warning(f"Gitrepo {git.url} is not in the bundle")
+
+        with mirrors.using(bundles):
+            yield plan
+
+
+def _bundle_file(root: str, url: str) -> str:
+    """
+    Get the path of the git bundle file of a repo in a bundle.
+    """
+    name = os.path.basename(mirrors.mirror_path(url))
+    return os.path.join(root, _GITREPOS, f"{os.path.splitext(name)[0]}.bundle")
+
+
+def _extract(tar: tarfile.TarFile, root: str):
+    """
+    Extract a tar file, refusing any member out of the root.
+    """
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(root, filter="data")
+        return
+
+    for member in tar.getmembers():
+        if not utils.is_subpath(os.path.join(root, member.name), root):
+            raise ValueError(f"member {member.name} is out of the bundle")
+    tar.extractall(root)
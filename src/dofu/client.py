@@ -0,0 +1,232 @@
+import json
+import os
+import shutil
+import socket
+import sys
+import typing as t
+
+from dofu import env
+
+NO_DAEMON_ENV_VAR = "DOFU_NO_DAEMON"
+
+queries = ("list", "plan", "owns", "verify", "conflicts", "generations")
+"""
+Commands that never change anything, which are always forwarded to the daemon.
+"""
+
+mutations = ("equip", "install", "remove", "sync")
+"""
+Commands changing the equipment state, which are forwarded to the daemon
+only if they never prompt, that is,
+with the modules given and a non-interactive strategy.
+"""
+
+environment_vars = ("HOME", "PATH", env.CACHE_ROOT_ENV_VAR)
+"""
+Environment variables deciding what a command does, besides the XDG ones,
+which must be the same in the client and the daemon for a command to be forwarded.
+"""
+
+_valued_options = (
+    "strategy",
+    "loglevel",
+    "jobs",
+    "decisions",
+    "targets",
+    "fmt",
+    "output",
+    "from_bundle",
+    "from-bundle",
+)
+"""
+Options taking a value, which may be given as the next argument.
+"""
+
+
+def option_value(argv: t.List[str], name: str) -> t.Optional[str]:
+    """
+    Get the value of an option in the command line.
+
+    :param argv: the command line arguments.
+    :param name: name of the option.
+    :return: the value, or None if the option is not given.
+    """
+    for i, arg in enumerate(argv):
+        if arg == f"--{name}" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(f"--{name}="):
+            return arg.partition("=")[2]
+    return None
+
+
+def positionals(argv: t.List[str]) -> t.List[str]:
+    """
+    Get the positional arguments in the command line, including the command.
+
+    :param argv: the command line arguments.
+    :return: the positional arguments.
+    """
+    args, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg.startswith("-"):
+            skip = "=" not in arg and arg.lstrip("-") in _valued_options
+        else:
+            args.append(arg)
+    return args
+
+
+def forwardable(argv: t.List[str]) -> bool:
+    """
+    Check whether a command line can be run by the daemon.
+
+    :param argv: the command line arguments.
+    :return: True if the command neither prompts nor asks for help.
+    """
+    args = positionals(argv)
+    if not args or any(arg in ("-h", "--help") for arg in argv):
+        return False
+
+    if args[0] in queries:
+        return True
+
+    if args[0] in mutations:
+        strategy = (option_value(argv, "strategy") or "ask").lower()
+        return strategy != "ask" and len(args) > 1
+
+    return False
+
+
+def environment() -> t.Dict[str, str]:
+    """
+    Get the environment variables deciding what a command does in this process.
+
+    :return: the values of the variables that are set, keyed by their names.
+    """
+    return {
+        name: value
+        for name, value in os.environ.items()
+        if name in environment_vars or name.startswith("XDG_")
+    }
+
+
+def connect() -> t.Optional[socket.socket]:
+    """
+    Connect to the running daemon.
+
+    :return: the connected socket, or None if no daemon is running.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.fspath(env.daemon_socket_file()))
+
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+
+def request(sock: socket.socket, message: dict) -> t.Iterator[dict]:
+    """
+    Send a request to the daemon and iterate over its replies.
+
+    :param sock: the socket connected to the daemon.
+    :param message: the request.
+    :return: generator of the replies.
+    """
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+    with sock.makefile("r", encoding="utf-8") as replies:
+        for line in replies:
+            yield json.loads(line)
+
+
+def forward(argv: t.List[str]) -> t.Optional[int]:
+    """
+    Run a command line in the daemon, printing its output.
+
+    The command is run locally instead if no daemon is running,
+    or if the daemon declines it, being stale or having another environment.
+    Once the daemon has accepted the command, it might have changed things already,
+    so that losing the daemon is an error rather than a reason to run it again.
+
+    :param argv: the command line arguments.
+    :return: the exit code, or None if the command must be run locally.
+    :raise ConnectionError: if the daemon has gone away while running the command.
+    """
+    sock = connect()
+    if sock is None:
+        return None
+
+    message = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": environment(),
+        "tty": sys.stdout.isatty(),
+        "width": shutil.get_terminal_size().columns,
+    }
+    with sock:
+        accepted = False
+        try:
+            for reply in request(sock, message):
+                if "out" in reply:
+                    sys.stdout.write(reply["out"])
+                    sys.stdout.flush()
+                elif "err" in reply:
+                    sys.stderr.write(reply["err"])
+                    sys.stderr.flush()
+                elif "exit" in reply:
+                    return reply["exit"]
+                elif "local" in reply:
+                    return None
+                accepted = accepted or reply.get("accepted", False)
+
+        except OSError as e:
+            if accepted:
+                raise ConnectionError(
+                    f"the daemon has gone away while running the command - {e}"
+                ) from e
+
+    if accepted:
+        raise ConnectionError("the daemon has gone away while running the command")
+    # the daemon has gone away before taking the command
+    return None
+
+
+def stop() -> bool:
+    """
+    Stop the running daemon.
+
+    :return: True if a daemon was running.
+    """
+    sock = connect()
+    if sock is None:
+        return False
+
+    with sock:
+        for _ in request(sock, {"stop": True}):
+            pass
+    return True
+
+
+def main():
+    """
+    Entry point of the command line,
+    which runs the command in the daemon if possible and locally otherwise.
+
+    Neither the modules nor the equipment state are loaded
+    before a command is forwarded, so that a forwarded command starts fast.
+    """
+    argv = sys.argv[1:]
+    if not os.environ.get(NO_DAEMON_ENV_VAR) and forwardable(argv):
+        try:
+            retcode = forward(argv)
+        except ConnectionError as e:
+            sys.exit(f"dofu: {e}, check the state before running it again")
+        if retcode is not None:
+            sys.exit(retcode)
+
+    from dofu.__main__ import main as run_locally
+
+    run_locally()
@@ -0,0 +1,330 @@
+import contextlib
+import contextvars
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import typing as t
+
+import fire
+from rich.console import Console
+
+import dofu
+from dofu import client, env
+from dofu.equipment import ModuleEquipmentManager
+from dofu.logging import LogHandler
+from dofu.options import Options
+
+_logger = logging.getLogger(__name__)
+
+_streams: contextvars.ContextVar[t.Optional[t.Tuple["_Stream", "_Stream"]]] = (
+    contextvars.ContextVar("streams", default=None)
+)
+"""
+Output and error streams of the request served in the current context, if any.
+"""
+
+_log_handler: contextvars.ContextVar[t.Optional[logging.Handler]] = (
+    contextvars.ContextVar("log_handler", default=None)
+)
+"""
+Log handler of the request served in the current context, if any.
+"""
+
+
+class Daemon:
+    """
+    Resident dofu process serving command lines over a Unix socket.
+
+    The daemon keeps the module registry, the loaded equipment state and
+    the other process-wide caches warm between the commands it serves,
+    so that a query is answered without starting and initializing dofu again.
+    The output of each command is streamed back to the client.
+
+    Commands are served one at a time in the working directory of the client,
+    so that the mutating ones are serialized.
+    Clients whose home, path, cache root or XDG directories differ from the ones
+    of the daemon are left to run their commands locally.
+    The loaded equipment state is dropped whenever the persistence files are
+    changed by another process, and the daemon quits as soon as the code of dofu
+    changes, leaving the clients to run their commands locally.
+    """
+
+    def __init__(self, path: os.PathLike, app: t.Callable[[], object]):
+        """
+        :param path: path to the Unix socket.
+        :param app: factory of the command line application.
+        """
+        self.path = os.fspath(path)
+        self.app = app
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._environment = client.environment()
+        self._source_stamp = _source_stamp()
+        self._state_stamp = _state_stamp()
+
+    def serve(self):
+        """
+        Serve the clients until stopped.
+        """
+        if os.path.exists(self.path):
+            if client.connect() is not None:
+                raise RuntimeError(f"a daemon is already serving at {self.path}")
+            os.unlink(self.path)
+
+        _install_log_routing()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        server.settimeout(0.5)
+        _logger.info(f"Serving at {self.path}, press Ctrl-C to stop")
+
+        try:
+            while not self._stopped.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+        finally:
+            server.close()
+            os.unlink(self.path)
+            # never cut the command being served short
+            with self._lock:
+                _logger.info("Stopped serving")
+
+    def stop(self):
+        """
+        Stop serving once the command being served is done.
+        """
+        self._stopped.set()
+
+    def _handle(self, conn: socket.socket):
+        send = _Sender(conn)
+        with conn, conn.makefile("r", encoding="utf-8") as requests:
+            line = requests.readline()
+            if not line:
+                return
+
+            message = json.loads(line)
+            if message.get("stop"):
+                self.stop()
+                return
+
+            with self._lock:
+                if self._stopped.is_set():
+                    send({"local": True})
+                    return
+
+                if _source_stamp() != self._source_stamp:
+                    _logger.info("Quit since the code of dofu has changed")
+                    self.stop()
+                    send({"local": True})
+                    return
+
+                if message.get("env") != self._environment:
+                    _logger.debug("Decline a client with another environment")
+                    send({"local": True})
+                    return
+
+                # from now on, the client never runs the command again by itself
+                send({"accepted": True})
+                send({"exit": self._run(message, send)})
+
+    def _run(self, message: dict, send: "_Sender") -> int:
+        """
+        Run a command line of a client.
+
+        :param message: the request of the client.
+        :param send: sender of the replies to the client.
+        :return: the exit code of the command.
+        """
+        argv = message["argv"]
+        _logger.info(f"Running {' '.join(argv)}")
+
+        stamp = _state_stamp()
+        if stamp != self._state_stamp:
+            _logger.debug("Reload the equipment state changed by another process")
+            ModuleEquipmentManager.load.cache_clear()
+
+        out = _Stream(send, "out", message.get("tty", False))
+        err = _Stream(send, "err", message.get("tty", False))
+        console = Console(file=out, width=message.get("width"))
+        handler = LogHandler(console=console, rich_tracebacks=True, markup=True)
+        handler.setFormatter(
+            logging.Formatter("[dim]%(name)s[/] %(message)s", datefmt="%H:%M")
+        )
+        handler.setLevel((client.option_value(argv, "loglevel") or "info").upper())
+
+        retcode = 0
+        os.chdir(message["cwd"])
+        with Options.scoped() as options, _serving(out, err, handler):
+            try:
+                fire.Fire(self.app(), command=argv, name="dofu")
+
+            except SystemExit as e:
+                retcode = e.code if isinstance(e.code, int) else int(e.code is not None)
+
+            except Exception as e:
+                _logger.exception(f"Failed to run {' '.join(argv)} - {e}")
+                retcode = 1
+
+            dry_run = options.dry_run
+
+        if dry_run and client.positionals(argv)[0] in client.mutations:
+            # the loaded state has been changed by the simulation
+            ModuleEquipmentManager.load.cache_clear()
+        self._state_stamp = _state_stamp()
+
+        return retcode
+
+
+class _Sender:
+    """
+    Sender of the replies to a client, which never fails the command served.
+    """
+
+    def __init__(self, conn: socket.socket):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._gone = False
+
+    def __call__(self, reply: dict):
+        with self._lock:
+            if self._gone:
+                return
+            try:
+                self._conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            except OSError:
+                # keep running the command even if the client has gone
+                self._gone = True
+
+
+class _Stream(io.TextIOBase):
+    """
+    Text stream forwarding everything written to a client.
+    """
+
+    def __init__(self, send: _Sender, key: str, tty: bool):
+        self._send = send
+        self._key = key
+        self._tty = tty
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self._tty
+
+    def write(self, s: str) -> int:
+        if s:
+            self._send({self._key: s})
+        return len(s)
+
+
+class _RoutingStream(io.TextIOBase):
+    """
+    Standard stream writing to the client served in the current context,
+    or to the original stream otherwise.
+    """
+
+    def __init__(self, original: t.TextIO, index: int):
+        self._original = original
+        self._index = index
+
+    def _target(self) -> t.TextIO:
+        streams = _streams.get()
+        return self._original if streams is None else streams[self._index]
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self._target().isatty()
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    def fileno(self):
+        return self._original.fileno()
+
+
+class _RoutingHandler(logging.Handler):
+    """
+    Log handler passing the records to the client served in the current context.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        handler = _log_handler.get()
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def _install_log_routing():
+    """
+    Route the output and the logs of the commands to their clients.
+
+    The existing log handlers only handle the records of the daemon itself.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.setLevel(max(handler.level, root.level))
+        handler.addFilter(lambda _: _log_handler.get() is None)
+    root.addHandler(_RoutingHandler())
+    # the level of each client is decided by its own handler
+    root.setLevel(logging.DEBUG)
+
+    sys.stdout = _RoutingStream(sys.stdout, 0)
+    sys.stderr = _RoutingStream(sys.stderr, 1)
+
+
+@contextlib.contextmanager
+def _serving(out: _Stream, err: _Stream, handler: logging.Handler):
+    """
+    Route the output and the logs in the current context to a client.
+    """
+    streams_token = _streams.set((out, err))
+    handler_token = _log_handler.set(handler)
+    try:
+        yield
+    finally:
+        _log_handler.reset(handler_token)
+        _streams.reset(streams_token)
+
+
+def _source_stamp() -> int:
+    """
+    Get the latest modification time of the code of dofu.
+    """
+    stamp = 0
+    for directory, _, filenames in os.walk(os.path.dirname(dofu.__file__)):
+        for name in filenames:
+            if name.endswith(".py"):
+                stamp = max(stamp, os.stat(os.path.join(directory, name)).st_mtime_ns)
+    return stamp
+
+
+def _state_stamp() -> t.Tuple:
+    """
+    Get the modification times of the persisted equipment state.
+    """
+    stamps = []
+    for path in (env.equipment_persistence_file(), env.equipment_journal_file()):
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
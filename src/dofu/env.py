@@ -2,6 +2,8 @@ import functools
 import os.path
 import pathlib
 
+CACHE_ROOT_ENV_VAR = "DOFU_CACHE_ROOT"
+
 
 def dot_config_path(*nested: os.PathLike) -> os.PathLike:
     return os.path.join(project_root(), "xdg-config", *nested)
@@ -53,7 +55,13 @@ def project_root() -> os.PathLike:
 
 
 def cache_root() -> os.PathLike:
-    root = os.path.join(project_root(), ".cache")
+    """
+    The root of the caches and persisted states.
+
+    It can be redirected by the DOFU_CACHE_ROOT environment variable,
+    e.g. into a sandbox.
+    """
+    root = os.environ.get(CACHE_ROOT_ENV_VAR) or os.path.join(project_root(), ".cache")
     if not os.path.exists(root):
         os.makedirs(root)
     return root
@@ -68,3 +76,48 @@ def persistence_root() -> os.PathLike:
 
 def equipment_persistence_file() -> os.PathLike:
     return os.path.join(persistence_root(), "equipment.yaml")
+
+
+def timing_persistence_file() -> os.PathLike:
+    return os.path.join(cache_root(), "timing.yaml")
+
+
+def equipment_journal_file() -> os.PathLike:
+    return os.path.join(persistence_root(), "equipment.journal")
+
+
+def ownership_persistence_file() -> os.PathLike:
+    return os.path.join(persistence_root(), "ownership.json")
+
+
+def state_persistence_file() -> os.PathLike:
+    return os.path.join(persistence_root(), "states.json")
+
+
+def lock_file() -> os.PathLike:
+    return os.path.join(project_root(), "dofu.lock")
+
+
+def daemon_socket_file() -> os.PathLike:
+    return os.path.join(cache_root(), "daemon.sock")
+
+
+def generations_root() -> os.PathLike:
+    root = os.path.join(cache_root(), "generations")
+    if not os.path.exists(root):
+        os.makedirs(root)
+    return root
+
+
+def mirrors_root() -> os.PathLike:
+    root = os.path.join(cache_root(), "mirrors")
+    if not os.path.exists(root):
+        os.makedirs(root)
+    return root
+
+
+def sandboxes_root() -> os.PathLike:
+    root = os.path.join(cache_root(), "sandboxes")
+    if not os.path.exists(root):
+        os.makedirs(root)
+    return root
@@ -1,23 +1,37 @@
+import collections
 import contextlib
 import dataclasses
 import enum
 import functools
-import itertools
 import logging
 import os
+import threading
 import typing as t
 
 import autoserde
 
 from dofu import (
     env,
-    module as m,
+    fingerprint as fp,
+    journal as jnl,
+    lockfile as lf,
+    mirrors,
+    ownership as own,
     package_manager as pm,
+    prefetch as pft,
     requirement as req,
+    scheduler as sch,
+    sharing,
     shutils,
+    timing,
     undoable_command as uc,
     utils,
+    verification as vrf,
 )
+from dofu.options import Options, Strategy
+
+if t.TYPE_CHECKING:
+    from dofu import module as m
 
 _logger = logging.getLogger(__name__)
 
@@ -125,6 +139,27 @@ class ModuleEquipmentTransactionStatus(enum.Enum):
     """
 
 
+class ModuleEquipmentStage(enum.Enum):
+    """
+    Stage of equipping a module.
+    """
+
+    PACKAGES = enum.auto()
+    """
+    Sync the package requirements.
+    """
+
+    GITREPOS = enum.auto()
+    """
+    Sync the git repo requirements.
+    """
+
+    COMMANDS = enum.auto()
+    """
+    Sync the undoable command requirements.
+    """
+
+
 @dataclasses.dataclass
 class ModuleEquipmentTransaction(contextlib.AbstractContextManager):
     """
@@ -196,19 +231,67 @@ class ModuleEquipmentTransaction(contextlib.AbstractContextManager):
         """
         Rollback the transaction lazily.
 
-        :return: generator of the rollback process.
+        :return: generator of the indices of the records rolled back.
         """
         self.status = ModuleEquipmentTransactionStatus.ROLLED_BACK
         for i in range(self.effect_len)[::-1]:
-            ret = self.records[i].undo()
+            # a failure raises in the timing context so that it is never recorded
+            with _timing(timing.Action.UNDO, self.records[i].cmdline()):
+                ret = self.records[i].undo()
+                if ret is not None and ret.retcode != 0:
+                    self.status = ModuleEquipmentTransactionStatus.FAILED_ROLLBACK
+                    _logger.error(
+                        f"Failed to rollback command {self.records[i]} - {ret}"
+                    )
+
+                    raise ret.to_error()
+
+            self.rollback_cursor = i
+            yield i
+
+    def redo_record(self):
+        """
+        Execute the first rolled back record again.
+
+        The rollback cursor is moved forward over the record,
+        which is the inverse of a rollback step.
+        """
+        index = self.effect_len
+        command = self.records[index]
+        with _timing(timing.Action.EXEC, command.cmdline()):
+            ret = command.exec()
+            if ret.retcode != 0:
+                _logger.error(f"Failed to redo command {command} - {ret}")
+                raise ret.to_error()
+
+        self.rollback_cursor = index + 1 if index + 1 < self.len else -1
+
+    def undo_record(self, index: int):
+        """
+        Undo one effective record of the transaction.
+
+        If it is the last effective record, the rollback cursor is moved onto it
+        as rolling back does. Otherwise, it is dropped from the records,
+        since the records after it are still in effect.
+
+        :param index: index of the record to undo.
+        """
+        self.status = ModuleEquipmentTransactionStatus.ROLLED_BACK
+        command = self.records[index]
+        with _timing(timing.Action.UNDO, command.cmdline()):
+            ret = command.undo()
             if ret is not None and ret.retcode != 0:
                 self.status = ModuleEquipmentTransactionStatus.FAILED_ROLLBACK
-                _logger.error(f"Failed to rollback command {self.records[i]} - {ret}")
+                _logger.error(f"Failed to undo command {command} - {ret}")
 
                 raise ret.to_error()
 
-            self.rollback_cursor = i
-            yield
+        if index == self.effect_len - 1:
+            self.rollback_cursor = index
+        else:
+            self.records.pop(index)
+            if self.rollback_cursor != -1:
+                self.rollback_cursor -= 1
 
 
 @dataclasses.dataclass
@@ -245,6 +328,12 @@ class ModuleEquipmentMetaInfo:
     Whether the module is installed.
     """
 
+    fingerprint: t.Optional[str] = None
+    """
+    Fingerprint of the module when it was equipped last time,
+    None if the module has not been equipped successfully since then.
+    """
+
     @property
     def installed(self):
         """
@@ -267,18 +356,27 @@ class ModuleEquipmentMetaInfo:
         return self.transactions[-1].commit_id if self.transactions else None
 
     @contextlib.contextmanager
-    def transaction(self):
+    def transaction(self, commit_id: str = None):
         """
         Create a new transaction for applying undoable commands.
+
+        :param commit_id: hashcode of the commit where the module is defined.
+            If not given, it is resolved from the registered module.
         """
-        clazz = m.ModuleRegistrationManager.module_class_by_name(self.module_name)
-        with ModuleEquipmentTransaction(clazz.last_commit_id()) as transaction:
-            try:
+        if commit_id is None:
+            clazz = _registry().module_class_by_name(self.module_name)
+            commit_id = clazz.last_commit_id()
+
+        # append up front so that the ongoing transaction is journaled
+        transaction = ModuleEquipmentTransaction(commit_id)
+        self.transactions.append(transaction)
+        try:
+            with transaction:
                 yield transaction
 
-            finally:
-                if transaction.records:  # append only non-empty transaction
-                    self.transactions.append(transaction)
+        finally:
+            if not transaction.records:  # keep only non-empty transaction
+                self.transactions.remove(transaction)
 
     @property
     def len_commands(self):
@@ -305,10 +403,185 @@ class ModuleEquipmentMetaInfo:
         """
         Rollback the commands one by one lazily.
 
-        :return: generator of the rollback process.
+        :return: generator of the transactions and the indices of the records
+            rolled back.
+        """
+        for transaction in reversed(self.transactions):
+            for i in transaction.rollback_lazily():
+                yield transaction, i
+
+    def undo_commands(self, commands: t.List[uc.UndoableCommand]):
+        """
+        Undo the given effective commands one by one in reversed executing order.
+
+        Unlike rolling back, the other commands are kept in effect.
+
+        :param commands: the effective commands to undo.
+        """
+        for _ in self.undo_commands_lazily(commands):
+            pass
+
+    def undo_commands_lazily(self, commands: t.List[uc.UndoableCommand]):
         """
+        Undo the given effective commands one by one lazily.
+
+        :param commands: the effective commands to undo.
+        :return: generator of the transactions, the indices of the records
+            and the commands undone.
+        """
+        ids = set(map(id, commands))
         for transaction in reversed(self.transactions):
-            yield from transaction.rollback_lazily()
+            for i in reversed(range(transaction.effect_len)):
+                command = transaction.records[i]
+                if id(command) in ids:
+                    transaction.undo_record(i)
+                    yield transaction, i, command
+
+    @staticmethod
+    def empty(module_name: str) -> "ModuleEquipmentMetaInfo":
+        """
+        Create the meta information of a module that has not been equipped.
+
+        :param module_name: name of the module.
+        :return: the empty meta information.
+        """
+        return ModuleEquipmentMetaInfo(
+            module_name=module_name,
+            package_installations=[],
+            gitrepo_installations=[],
+            transactions=[],
+        )
+
+
+@autoserde.serdeable
+class ModuleEquipmentJournalStep(enum.Enum):
+    """
+    Kind of the step journaled by an entry.
+    """
+
+    META = enum.auto()
+    """
+    The meta information of the module is snapshotted, or the module is removed.
+    """
+
+    PACKAGE = enum.auto()
+    """
+    A package installation of the module is put or dropped.
+    """
+
+    GITREPO = enum.auto()
+    """
+    A gitrepo installation of the module is put or dropped.
+    """
+
+    TRANSACTION = enum.auto()
+    """
+    A transaction of the module is put or dropped,
+    together with the record of the command executed or undone, if any.
+    """
+
+
+@dataclasses.dataclass
+class ModuleEquipmentJournalEntry:
+    """
+    Entry of the equipment journal.
+
+    Each step of the equipment of a module is journaled as a delta,
+    which only holds the installation or the command changed by the step,
+    so that journaling a step costs the same however large the module is.
+    The whole meta information of the module is snapshotted
+    only once a stage of it is done, or it is removed.
+    """
+
+    module_name: str
+    """
+    Name of the module.
+    """
+
+    step: ModuleEquipmentJournalStep = ModuleEquipmentJournalStep.META
+    """
+    Kind of the step.
+    """
+
+    key: t.Optional[str] = None
+    """
+    Key of the installation before the step, or the index of the transaction.
+    """
+
+    meta: t.Optional[ModuleEquipmentMetaInfo] = None
+    """
+    Snapshot of the meta information of the module, None if the module is removed.
+    """
+
+    package: t.Optional[PackageInstallationMetaInfo] = None
+    """
+    The package installation put, None if dropped.
+    """
+
+    gitrepo: t.Optional[GitRepoInstallationMetaInfo] = None
+    """
+    The gitrepo installation put, None if dropped.
+    """
+
+    transaction: t.Optional[ModuleEquipmentTransaction] = None
+    """
+    The transaction put without its records, None if dropped.
+    """
+
+    record_index: t.Optional[int] = None
+    """
+    Index of the record of the command executed or undone, if any.
+    """
+
+    record: t.Optional[uc.UndoableCommand] = None
+    """
+    The command put at the record index, None if dropped from the records.
+    """
+
+    def replay(self, metas: t.Dict[str, ModuleEquipmentMetaInfo]):
+        """
+        Replay the step onto the meta information of the modules.
+
+        :param metas: meta information of the modules, keyed by their names.
+        """
+        if self.step == ModuleEquipmentJournalStep.META:
+            if self.meta is None:
+                metas.pop(self.module_name, None)
+            else:
+                metas[self.module_name] = self.meta
+            return
+
+        meta = metas.setdefault(
+            self.module_name, ModuleEquipmentMetaInfo.empty(self.module_name)
+        )
+        if self.step == ModuleEquipmentJournalStep.PACKAGE:
+            _put_installation(meta.package_installations, self.key, self.package)
+        elif self.step == ModuleEquipmentJournalStep.GITREPO:
+            _put_installation(meta.gitrepo_installations, self.key, self.gitrepo)
+        else:
+            self._replay_transaction(meta.transactions)
+
+    def _replay_transaction(self, transactions: t.List[ModuleEquipmentTransaction]):
+        index = int(self.key)
+        if self.transaction is None:
+            del transactions[index:]
+            return
+
+        if index == len(transactions):
+            transactions.append(dataclasses.replace(self.transaction, records=[]))
+        transaction = transactions[index]
+        transaction.commit_id = self.transaction.commit_id
+        transaction.status = self.transaction.status
+        transaction.rollback_cursor = self.transaction.rollback_cursor
+
+        if self.record_index is None:
+            return
+        if self.record is None:
+            transaction.records.pop(self.record_index)
+        elif self.record_index == len(transaction.records):
+            transaction.records.append(self.record)
+        else:
+            transaction.records[self.record_index] = self.record
 
 
 @dataclasses.dataclass
@@ -321,24 +594,64 @@ class ModuleEquipmentManager:
 
     meta: t.Dict[str, ModuleEquipmentMetaInfo] = dataclasses.field(default_factory=dict)
 
+    def __post_init__(self):
+        # runtime only, which are not fields so that they are never persisted
+        self._shared = sharing.SharedRequirementTable()
+        self._ownership = own.OwnershipIndex()
+        self._states = vrf.StateIndex()
+        self._meta_locks_lock = threading.Lock()
+        self._meta_locks: t.Dict[str, threading.RLock] = collections.defaultdict(
+            threading.RLock
+        )
+        # names of the modules being removed, which never inherit anything
+        self._removing: t.Set[str] = set()
+
     @staticmethod
     @functools.cache
     def load() -> "ModuleEquipmentManager":
         """
         Load the meta information from the persistence file.
+
+        The loaded manager is cached for the life of the process.
+        """
+        return ModuleEquipmentManager.reload()
+
+    @staticmethod
+    def reload() -> "ModuleEquipmentManager":
+        """
+        Load the meta information from the persistence file again,
+        bypassing the cache of `load`.
         """
         config_path = env.equipment_persistence_file()
         if not os.path.isfile(config_path):
-            return ModuleEquipmentManager()
+            manager = ModuleEquipmentManager()
 
-        options = autoserde.Options(recursively=True, strict=True)
-        return autoserde.AutoSerde.deserialize(
-            config_path, cls=ModuleEquipmentManager, options=options, fmt="yaml"
-        )
+        else:
+            options = autoserde.Options(recursively=True, strict=True)
+            manager = autoserde.AutoSerde.deserialize(
+                config_path, cls=ModuleEquipmentManager, options=options, fmt="yaml"
+            )
+
+        # replay the steps journaled by an interrupted run, if any
+        n_entries = 0
+        for entry in _journal().replay(ModuleEquipmentJournalEntry):
+            entry.replay(manager.meta)
+            n_entries += 1
+
+        if n_entries:
+            _logger.warning(
+                f"Recovered {n_entries} steps journaled by an interrupted run"
+            )
+
+        manager._ownership.rebuild(manager.meta.values())
+        manager._states = vrf.StateIndex.load(env.state_persistence_file())
+        return manager
 
     def save(self):
         """
         Save the meta information to the configuration file.
+
+        The journal is dropped since all the journaled steps are saved.
         """
         config_path = env.equipment_persistence_file()
         with shutils.file_update_guarder(config_path) as tmp_path:
@@ -347,12 +660,381 @@ class ModuleEquipmentManager:
                 self, tmp_path, options=options, fmt="yaml", sort_keys=False
             )
 
+        self._ownership.save(env.ownership_persistence_file())
+        self._states.save(env.state_persistence_file())
+        _journal().truncate()
+        timing.TimingStore.instance().save()
+
+    @property
+    def ownership(self) -> own.OwnershipIndex:
+        """
+        Index from the managed paths to the modules and commands managing them.
+        """
+        return self._ownership
+
+    @property
+    def states(self) -> vrf.StateIndex:
+        """
+        Index of the recorded states of the paths managed by each module.
+        """
+        return self._states
+
     def equipped_module_names(self):
         """
         Get the names of the equipped modules.
         """
         return [meta.module_name for meta in self.meta.values()]
 
+    def bisect(self, module_name: str, check: t.Callable[[], bool]) -> t.Optional[int]:
+        """
+        Find the command of a module that makes the check fail by binary search.
+
+        The module is moved between points in its history of commands,
+        by rolling back the commands after the point or executing them again.
+        The check is run at each point, which only takes O(log n) checks.
+        All the commands are applied again in the end.
+
+        :param module_name: name of the equipped module.
+        :param check: function returning whether the module works.
+        :return: index of the first effective command that makes the check fail,
+            or None if the check passes with all the commands applied,
+            or fails with no command applied.
+        """
+        meta = self.meta.get(module_name)
+        if meta is None:
+            raise ValueError(f"module {module_name} is not equipped")
+
+        points = [
+            (transaction, i)
+            for transaction in meta.transactions
+            for i in range(transaction.effect_len)
+        ]
+        statuses = [transaction.status for transaction in meta.transactions]
+        applied = len(points)
+
+        def move_to(n_applied: int):
+            nonlocal applied
+            steps = zip(range(applied - n_applied), meta.rollback_lazily())
+            for _, (transaction, index) in steps:
+                applied -= 1
+                self._checkpoint_transaction(
+                    meta,
+                    transaction,
+                    record_index=index,
+                    command=transaction.records[index],
+                )
+
+            while applied < n_applied:
+                transaction, index = points[applied]
+                assert transaction.effect_len == index
+                transaction.redo_record()
+                applied += 1
+                self._checkpoint_transaction(
+                    meta,
+                    transaction,
+                    record_index=index,
+                    command=transaction.records[index],
+                )
+
+        def check_at(n_applied: int) -> bool:
+            move_to(n_applied)
+            passed = check()
+            _logger.info(
+                f"Check {'passed' if passed else 'failed'}"
+                f" with {n_applied}/{len(points)} commands applied"
+            )
+            return passed
+
+        try:
+            if check_at(len(points)):
+                _logger.info(f"Module {module_name} is not broken by any command")
+                return None
+
+            if not check_at(0):
+                _logger.warning(f"Module {module_name} is broken by no command")
+                return None
+
+            # the check passes with `good` commands and fails with `bad` commands
+            good, bad = 0, len(points)
+            while bad - good > 1:
+                mid = (good + bad) // 2
+                if check_at(mid):
+                    good = mid
+                else:
+                    bad = mid
+
+            return bad - 1
+
+        finally:
+            move_to(len(points))
+            for transaction, status in zip(meta.transactions, statuses):
+                transaction.status = status
+            self.save()
+
+    def check_ownership(
+        self, blueprint: t.List[t.Type["m.Module"]], *, keep_others: bool = True
+    ):
+        """
+        Check up front that no two modules manage the same path differently.
+
+        The same repo cloned by several modules, or the same command run by them,
+        like creating the same directory, is not a clash.
+
+        :param blueprint: list of modules sorted topologically.
+        :param keep_others: whether the equipped modules out of the blueprint
+            are kept, whose owned paths are checked against as well.
+        :raise ValueError: if any path is managed by two modules differently.
+        """
+        claims: t.Dict[str, own.Owner] = {}
+        clashes = []
+
+        def claim(path: str, owner: own.Owner):
+            other = claims.setdefault(path, owner)
+            if (
+                other.module_name != owner.module_name
+                and other.cmdline != owner.cmdline
+            ):
+                clashes.append(
+                    f"{path} is managed by both {other.module_name} ({other.cmdline})"
+                    f" and {owner.module_name} ({owner.cmdline})"
+                )
+
+        names = set(module.name() for module in blueprint)
+        if keep_others:
+            for path, owner in self._ownership.items():
+                if owner.module_name not in names:
+                    claim(path, owner)
+
+        for module in blueprint:
+            for requirement in module.gitrepo_requirements():
+                claim(
+                    os.path.abspath(requirement.path),
+                    own.Owner(module.name(), f"git clone {requirement.url}"),
+                )
+            for command in module.command_requirements():
+                for path in own.command_paths(command):
+                    claim(path, own.Owner(module.name(), command.cmdline()))
+
+        if clashes:
+            for clash in clashes:
+                _logger.error(clash)
+            raise ValueError(f"{len(clashes)} paths are managed by multiple modules")
+
+    def scan_conflicts(
+        self,
+        blueprint: t.List[t.Type["m.Module"]],
+        unchanged: t.Set[t.Type["m.Module"]] = None,
+    ) -> t.List[shutils.Ensure]:
+        """
+        Find the conflicting destinations of equipping the modules ahead.
+
+        The repos to clone or move and the commands to execute are checked
+        against the paths as they are, without changing anything.
+        A destination moved away by an earlier command does not conflict.
+
+        :param blueprint: list of modules sorted topologically.
+        :param unchanged: modules skipped as unchanged in this run.
+            If not given, they are found from the fingerprints.
+        :return: list of the failing checks of the conflicting destinations.
+        """
+        if unchanged is None:
+            unchanged = self.unchanged_modules(blueprint)
+
+        conflicts: t.Dict[str, shutils.Ensure] = {}
+        vacated = set()
+
+        def add(ensure: shutils.Ensure):
+            key = ensure.decision_key()
+            if key not in vacated:
+                conflicts.setdefault(key, ensure)
+
+        for module in blueprint:
+            if module in unchanged:
+                continue
+
+            meta = self._equipment_meta(module.name())
+
+            for requirement in module.gitrepo_requirements():
+                installation = utils.find(
+                    meta.gitrepo_installations,
+                    pred=lambda x: sharing.normalize_url(x.requirement.url)
+                    == sharing.normalize_url(requirement.url),
+                    default=None,
+                )
+                if installation is None:
+                    if requirement.is_satisfied():
+                        continue
+                    action = "git clone"
+                elif installation.requirement.path != requirement.path:
+                    action = "mv"
+                else:
+                    continue
+
+                ensure = shutils.EnsurePathNotExists(
+                    action=action, path=requirement.path
+                )
+                if not ensure.condition():
+                    add(ensure)
+
+            _, fresh = diff_commands(
+                list(meta.commands()), module.command_requirements()
+            )
+            for command in fresh:
+                for ensure in command.conflicts():
+                    add(ensure)
+                vacated.update(map(os.path.abspath, command.vacated_paths()))
+
+        return list(conflicts.values())
+
+    def _decide_conflicts(
+        self,
+        blueprint: t.List[t.Type["m.Module"]],
+        unchanged: t.Set[t.Type["m.Module"]],
+    ):
+        """
+        Decide all the conflicts of equipping the modules in one batch up front.
+
+        Only the conflicts without a decision yet are asked for,
+        and only if the strategy is to ask,
+        so that the run is never blocked by a prompt halfway through.
+        """
+        options = Options.instance()
+        if options.strategy != Strategy.ASK:
+            return
+
+        conflicts = [
+            ensure
+            for ensure in self.scan_conflicts(blueprint, unchanged)
+            if ensure.decision_key() not in options.decisions
+        ]
+        if not conflicts:
+            return
+
+        _logger.warning(f"{len(conflicts)} conflicts found before equipping")
+        if options.dry_run:
+            for ensure in conflicts:
+                _logger.info(f" - {ensure.failure_message()}")
+            return
+
+        options.decisions.update(shutils.decide(conflicts))
+
+    def _meta_lock(self, module_name: str) -> threading.RLock:
+        """
+        Get the lock to hold while changing or journaling the meta info of a module,
+        whose stages are synced concurrently.
+
+        :param module_name: name of the module.
+        :return: the lock of the module.
+        """
+        with self._meta_locks_lock:
+            return self._meta_locks[module_name]
+
+    def _checkpoint(self, meta: ModuleEquipmentMetaInfo, *, removed: bool = False):
+        """
+        Journal a snapshot of the meta information of a module,
+        once a stage of it is done or it is removed.
+
+        :param meta: equipment meta info of the module.
+        :param removed: whether the module has been removed.
+        """
+        self._journal_step(
+            meta,
+            ModuleEquipmentJournalEntry(
+                module_name=meta.module_name, meta=None if removed else meta
+            ),
+            removed=removed,
+        )
+
+    def _checkpoint_installation(
+        self,
+        meta: ModuleEquipmentMetaInfo,
+        installation: t.Union[PackageInstallationMetaInfo, GitRepoInstallationMetaInfo],
+        *,
+        key: str = None,
+        dropped: bool = False,
+    ):
+        """
+        Journal a step putting or dropping an installation of a module.
+
+        :param meta: equipment meta info of the module.
+        :param installation: the package or gitrepo installation.
+        :param key: key of the installation before the step, if changed by it.
+        :param dropped: whether the installation has been dropped.
+        """
+        entry = ModuleEquipmentJournalEntry(
+            module_name=meta.module_name, key=key or _installation_key(installation)
+        )
+        if isinstance(installation, PackageInstallationMetaInfo):
+            entry.step = ModuleEquipmentJournalStep.PACKAGE
+            entry.package = None if dropped else installation
+        else:
+            entry.step = ModuleEquipmentJournalStep.GITREPO
+            entry.gitrepo = None if dropped else installation
+        self._journal_step(meta, entry)
+
+    def _checkpoint_transaction(
+        self,
+        meta: ModuleEquipmentMetaInfo,
+        transaction: t.Optional[ModuleEquipmentTransaction],
+        *,
+        record_index: int = None,
+        command: uc.UndoableCommand = None,
+    ):
+        """
+        Journal a step executing or undoing a command of a module.
+
+        :param meta: equipment meta info of the module.
+        :param transaction: the transaction of the command,
+            or None if the last transaction has been dropped.
+        :param record_index: index of the record of the command, if any.
+        :param command: the command executed or undone,
+            which is dropped from the records if not at the index any more.
+        """
+        with self._meta_lock(meta.module_name):
+            if transaction is None:
+                index, header, record = len(meta.transactions), None, None
+            else:
+                index = utils.find(
+                    range(len(meta.transactions)),
+                    pred=lambda i: meta.transactions[i] is transaction,
+                )
+                header = dataclasses.replace(transaction, records=[])
+                record = None
+                if record_index is not None and record_index < transaction.len:
+                    if transaction.records[record_index] is command:
+                        record = command
+
+            self._journal_step(
+                meta,
+                ModuleEquipmentJournalEntry(
+                    module_name=meta.module_name,
+                    step=ModuleEquipmentJournalStep.TRANSACTION,
+                    key=str(index),
+                    transaction=header,
+                    record_index=record_index,
+                    record=record,
+                ),
+            )
+
+    def _journal_step(
+        self,
+        meta: ModuleEquipmentMetaInfo,
+        entry: ModuleEquipmentJournalEntry,
+        *,
+        removed: bool = False,
+    ):
+        """
+        Journal a step of a module right after it is made.
+
+        The entry is serialized under the lock of the module,
+        so that the other stages of the module never change it meanwhile.
+        """
+        with self._meta_lock(meta.module_name):
+            _journal().append(entry)
+            if entry.step != ModuleEquipmentJournalStep.PACKAGE:
+                # packages own no path
+                self._ownership.update(meta, removed=removed)
+
     def _equipment_meta(self, module_name: str) -> ModuleEquipmentMetaInfo:
         """
         Get the meta information of an equipped module.
@@ -360,11 +1042,8 @@ class ModuleEquipmentManager:
         :param module_name: name of the module to get.
         :return: meta information of the module.
         """
-        return self.meta.get(module_name, None) or ModuleEquipmentMetaInfo(
-            module_name=module_name,
-            package_installations=[],
-            gitrepo_installations=[],
-            transactions=[],
+        return self.meta.get(module_name, None) or ModuleEquipmentMetaInfo.empty(
+            module_name
         )
 
     def sync(self, module_names: t.List[str]):
@@ -380,14 +1059,20 @@ class ModuleEquipmentManager:
 
         :param module_names: list of module names.
         """
-        blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
-        remove_blueprint = m.ModuleRegistrationManager.resolve_remove_blueprint(
+        blueprint = _registry().resolve_equip_blueprint(module_names)
+        remove_blueprint = _registry().resolve_remove_blueprint(
             set(self.meta) - set(module.name() for module in blueprint)
         )
 
+        self.check_ownership(blueprint, keep_others=False)
+        unchanged = self.unchanged_modules(blueprint)
+        self._decide_conflicts(blueprint, unchanged)
+
+        self._shared.reset()
         try:
-            self._remove_modules(remove_blueprint)
-            self._equip_modules(blueprint)
+            with self._prefetched(blueprint, unchanged):
+                self._remove_modules(remove_blueprint)
+                self._equip_modules(blueprint, unchanged=unchanged)
 
         finally:
             self.save()
@@ -404,8 +1089,9 @@ class ModuleEquipmentManager:
 
         :param module_names: list of module names.
         """
-        blueprint = m.ModuleRegistrationManager.resolve_remove_blueprint(module_names)
+        blueprint = _registry().resolve_remove_blueprint(module_names)
 
+        self._shared.reset()
         try:
             self._remove_modules(blueprint)
 
@@ -424,92 +1110,254 @@ class ModuleEquipmentManager:
 
         :param module_names: list of module names.
         """
-        blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+        blueprint = _registry().resolve_equip_blueprint(module_names)
+        self.check_ownership(blueprint)
+        unchanged = self.unchanged_modules(blueprint)
+        self._decide_conflicts(blueprint, unchanged)
+
+        self._shared.reset()
+        try:
+            with self._prefetched(blueprint, unchanged):
+                self._equip_modules(blueprint, unchanged=unchanged)
+
+        finally:
+            self.save()
+
+    def equip_resolved(
+        self,
+        blueprint: t.List[t.Type["m.Module"]],
+        dependencies: t.Dict[t.Type["m.Module"], t.List[t.Type["m.Module"]]],
+    ):
+        """
+        Equip the modules of a blueprint resolved ahead of time.
+
+        Unlike `equip`, this method consults no module registry,
+        so that it works with modules that are compiled into a plan.
+
+        :param blueprint: list of modules sorted topologically.
+        :param dependencies: mapping from each module to the modules it depends on.
+        """
+        unchanged = self.unchanged_modules(blueprint)
 
+        self._shared.reset()
         try:
-            self._equip_modules(blueprint)
+            with self._prefetched(blueprint, unchanged):
+                self._equip_modules(blueprint, dependencies, unchanged)
 
         finally:
             self.save()
 
+    def unchanged_modules(
+        self, blueprint: t.List[t.Type["m.Module"]]
+    ) -> t.Set[t.Type["m.Module"]]:
+        """
+        Find the modules to skip in this run, as their fingerprint is unchanged
+        since equipped last time.
+
+        The fingerprints are computed once per run, since they probe every path
+        the modules manage.
+
+        :param blueprint: list of modules to equip.
+        :return: set of the unchanged modules, empty if asked to refresh.
+        """
+        if Options.instance().refresh:
+            return set()
+        return {
+            module
+            for module in blueprint
+            if _unchanged(self._equipment_meta(module.name()), module)
+        }
+
+    @contextlib.contextmanager
+    def _prefetched(
+        self,
+        blueprint: t.List[t.Type["m.Module"]],
+        unchanged: t.Set[t.Type["m.Module"]],
+    ) -> t.Iterator[None]:
+        """
+        Prefetch the modules to sync if asked, and sync them from the local data.
+
+        The unchanged modules are skipped, as they are never synced.
+
+        :param blueprint: list of modules to equip.
+        :param unchanged: modules skipped as unchanged in this run.
+        :return: context manager.
+        """
+        if not Options.instance().prefetch:
+            yield
+            return
+
+        changed = [module for module in blueprint if module not in unchanged]
+        with mirrors.using(pft.prefetch(changed)):
+            yield
+
     def _remove_modules(self, blueprint):
         """
         Remove modules.
 
+        Independent modules are removed concurrently,
+        where each module is removed after all the modules depending on it.
+
         :param blueprint: A list of modules to remove sorted topologically.
         """
         _logger.info(
             f"{len(blueprint)} modules to be removed"
             f" - {[module.name() for module in blueprint]}"
         )
-
         # remove modules that are not required any more
-        for module in blueprint:
-            _logger.info(f"Removing module {module.name()}")
-
-            meta = self._equipment_meta(module.name())
-            try:
-                self._remove_one_step(meta)
-                meta.status = ModuleEquipmentStatus.REMOVED
-                _logger.info(f"Removed!")
+        scheduler = sch.DagScheduler(
+            _registry().resolve_dependencies(blueprint, reverse=True),
+            jobs=Options.instance().jobs,
+            costs={
+                module: _estimate_removal(self._equipment_meta(module.name()))
+                for module in blueprint
+            },
+        )
+        self._removing = {module.name() for module in blueprint}
+        try:
+            scheduler.run(self._remove_module, on_progress=_log_progress)
+        finally:
+            self._removing = set()
 
-            except Exception:
-                meta.status = ModuleEquipmentStatus.BROKEN
-                _logger.error(f"Failed to remove Module {module.name()}")
-                raise
+    def _remove_module(self, module: t.Type["m.Module"]):
+        """
+        Remove one module and forget its meta if removed successfully.
 
-            else:  # remove the meta only if the module is removed successfully
-                del self.meta[meta.module_name]
+        :param module: module to remove.
+        """
+        _logger.info(f"Removing module {module.name()}")
 
-    def _equip_modules(self, blueprint: t.List[t.Type["m.Module"]]):
+        meta = self._equipment_meta(module.name())
+        try:
+            self._remove_one_step(meta)
+            meta.status = ModuleEquipmentStatus.REMOVED
+            _logger.info(f"Removed {module.name()}!")
+
+        except Exception:
+            meta.status = ModuleEquipmentStatus.BROKEN
+            _logger.error(f"Failed to remove Module {module.name()}")
+            self._checkpoint(meta)
+            raise
+
+        else:  # remove the meta only if the module is removed successfully
+            self.meta.pop(meta.module_name, None)
+            self._checkpoint(meta, removed=True)
+            self._states.forget(meta.module_name)
+
+    def _equip_modules(
+        self,
+        blueprint: t.List[t.Type["m.Module"]],
+        dependencies: t.Dict[t.Type["m.Module"], t.List[t.Type["m.Module"]]] = None,
+        unchanged: t.Set[t.Type["m.Module"]] = None,
+    ):
         """
         Equip modules.
 
+        Each module is equipped in three pipeline stages,
+        which are syncing packages, gitrepos and commands respectively.
+        Packages and gitrepos of all the modules are synced concurrently
+        right away, since they do not rely on any other module.
+        Commands of a module are synced after its packages and gitrepos,
+        as well as the commands of all its dependencies.
+
         :param blueprint: A list of modules to equip sorted topologically.
+        :param dependencies: mapping from each module to the modules it depends on.
+            If not given, it is resolved from the module registry.
+        :param unchanged: modules to skip as unchanged since equipped last time.
+            If not given, they are found from the fingerprints.
         :return:
         """
         _logger.info(
             f"{len(blueprint)} modules to be equipped"
             f" - {[module.name() for module in blueprint]}"
         )
+        if dependencies is None:
+            dependencies = _registry().resolve_dependencies(blueprint)
 
-        # equip modules that are required
-        for module in blueprint:
-            _logger.info(f"Synchronizing module {module.name()}")
-
-            meta = self._equipment_meta(module.name())
-            try:
-                self._equip_one_step(module, meta)
-                meta.status = ModuleEquipmentStatus.INSTALLED
-                _logger.info(f"Equipped!")
+        metas = {module: self._equipment_meta(module.name()) for module in blueprint}
 
-            except Exception:
-                meta.status = ModuleEquipmentStatus.BROKEN
-                _logger.error(f"Failed to equip Module {module.name()}")
-                raise
+        # skip the modules whose fingerprint is unchanged since equipped last time
+        if unchanged is None:
+            unchanged = self.unchanged_modules(blueprint)
+        skipped = [module for module in blueprint if module in unchanged]
+        if skipped:
+            _logger.info(
+                f"{len(skipped)} modules are unchanged and skipped"
+                f" - {[module.name() for module in skipped]}"
+            )
+        blueprint = [module for module in blueprint if module not in unchanged]
 
-            finally:  # save the meta even if the module is broken
-                self.meta[meta.module_name] = meta
+        # the pipeline is ordered by module first so that equipping with
+        # a single job is exactly the same as equipping one module by one
+        pipeline = {}
+        for module in blueprint:
+            pipeline[module, ModuleEquipmentStage.PACKAGES] = []
+            pipeline[module, ModuleEquipmentStage.GITREPOS] = []
+            pipeline[module, ModuleEquipmentStage.COMMANDS] = [
+                (module, ModuleEquipmentStage.PACKAGES),
+                (module, ModuleEquipmentStage.GITREPOS),
+                *((dep, ModuleEquipmentStage.COMMANDS) for dep in dependencies[module]),
+            ]
+
+        # equip modules that are required, starting the most expensive chains first
+        scheduler = sch.DagScheduler(
+            pipeline,
+            jobs=Options.instance().jobs,
+            costs={node: _estimate_stage(*node, metas[node[0]]) for node in pipeline},
+        )
+        _logger.info(f"Estimated to take {timing.repr_seconds(scheduler.estimate())}")
+        scheduler.run(
+            lambda node: self._equip_stage(*node, metas[node[0]]),
+            on_progress=_log_progress,
+        )
 
-    def _equip_one_step(
-        self, module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo
+    def _equip_stage(
+        self,
+        module: t.Type["m.Module"],
+        stage: "ModuleEquipmentStage",
+        meta: ModuleEquipmentMetaInfo,
     ):
         """
-        Equip a module.
+        Equip one stage of a module and keep its meta even if it is broken.
 
-        This method is just one step of the whole equip process.
-        It assumes that all the dependencies of the module have been equipped.
-        To equip a module, please use the `equip` method.
+        The module is marked as installed once its commands stage is done.
 
         :param module: module to equip.
+        :param stage: stage of the module to equip.
         :param meta: equipment meta info of the module.
         """
-        self._sync_packages_step(module, meta)
-        self._sync_gitrepos_step(module, meta)
-        self._sync_commands_step(module, meta)
+        _logger.info(f"Synchronizing {stage.name.lower()} of module {module.name()}")
+
+        steps = {
+            ModuleEquipmentStage.PACKAGES: self._sync_packages_step,
+            ModuleEquipmentStage.GITREPOS: self._sync_gitrepos_step,
+            ModuleEquipmentStage.COMMANDS: self._sync_commands_step,
+        }
+        # forget the fingerprint as the targets are going to change
+        meta.fingerprint = None
+        try:
+            steps[stage](module, meta)
+            if stage == ModuleEquipmentStage.COMMANDS:
+                meta.status = ModuleEquipmentStatus.INSTALLED
+                if not Options.instance().dry_run:
+                    meta.fingerprint = fp.module_fingerprint(module)
+                    self._states.record(
+                        meta.module_name, (path for path, _ in own.owned_paths(meta))
+                    )
+                _logger.info(f"Equipped {module.name()}!")
 
-    @staticmethod
-    def _sync_packages_step(module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo):
+        except Exception:
+            meta.status = ModuleEquipmentStatus.BROKEN
+            _logger.error(f"Failed to equip Module {module.name()}")
+            raise
+
+        finally:  # save the meta even if the module is broken
+            self.meta[meta.module_name] = meta
+            self._checkpoint(meta)
+
+    def _sync_packages_step(
+        self, module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo
+    ):
         """
         Sync package requirements.
 
@@ -520,7 +1368,7 @@ class ModuleEquipmentManager:
         for installation in list(meta.package_installations):
             _logger.info(
                 f"Syncing installed package"
-                f" - {_repr_pkg_requirement(installation.requirement)}"
+                f" - {repr_pkg_requirement(installation.requirement)}"
             )
 
             required = utils.find(
@@ -530,18 +1378,19 @@ class ModuleEquipmentManager:
             )
 
             # not required any more, remove the installation
-            if required is None or not installation.requirement.is_satisfied():
+            if required is None or not self._shared.is_satisfied(
+                installation.requirement
+            ):
                 _logger.debug(f" - package is not required any more, uninstalling it")
 
-                if not installation.used_existing and installation.manager:
-                    installation.requirement.uninstall(installation.manager)
-                meta.package_installations.remove(installation)
+                self._release_package(meta, installation)
+                with self._meta_lock(meta.module_name):
+                    meta.package_installations.remove(installation)
+                    self._checkpoint_installation(meta, installation, dropped=True)
 
         # install packages that are required but not installed
         for requirement in module.package_requirements():
-            _logger.info(
-                f"Equipping package" f" - {_repr_pkg_requirement(requirement)}"
-            )
+            _logger.info(f"Equipping package" f" - {repr_pkg_requirement(requirement)}")
 
             installation = utils.find(
                 meta.package_installations,
@@ -553,45 +1402,85 @@ class ModuleEquipmentManager:
             if installation is not None:
                 _logger.debug(f" - reinstall package since having been installed")
 
-                if not requirement.is_satisfied():
-                    _logger.warning(f" - reinstalling package as seemed broken")
-
-                    # reinstall since the package is broken
-                    installation.manager = requirement.install()
-                    installation.used_existing = False
-                else:
+                # the lock makes sure a shared package is installed only once
+                with self._shared.lock(requirement):
+                    satisfied = self._shared.is_satisfied(requirement)
+                    if not satisfied:
+                        _logger.warning(f" - reinstalling package as seemed broken")
+
+                        # reinstall since the package is broken
+                        with _timing(
+                            timing.Action.INSTALL, repr_pkg_requirement(requirement)
+                        ):
+                            installation.manager = lf.pinned(requirement).install()
+                        installation.used_existing = False
+                        self._shared.mark_satisfied(requirement, True)
+                        self._checkpoint_installation(meta, installation)
+
+                if satisfied:
                     _logger.debug(f" - updating package...")
 
                     # update?
                     # Currently, the installed package with different version will
                     # be uninstalled and reinstalled with the new version. It seems
                     # that there is no need to run update again.
-                    pass
+                    # Only a package pinned to another version is reinstalled.
+                    with self._shared.lock(requirement):
+                        self._sync_pinned_package(installation)
 
             # install for the first time
             else:
-                if not requirement.is_satisfied():
-                    _logger.debug(f" - installing package")
+                # the lock makes sure a shared package is installed only once
+                with self._shared.lock(requirement):
+                    if not self._shared.is_satisfied(requirement):
+                        _logger.debug(f" - installing package")
+
+                        # install if the package is not installed
+                        with _timing(
+                            timing.Action.INSTALL, repr_pkg_requirement(requirement)
+                        ):
+                            manager = lf.pinned(requirement).install()
+                        used_existing = False
+                        self._shared.mark_satisfied(requirement, True)
+                    else:
+                        manager = self._shared.take_over(requirement)
+                        used_existing = manager is None
+                        if used_existing:
+                            _logger.debug(
+                                f" - using existing package installed by other"
+                            )
+                        else:
+                            _logger.debug(
+                                f" - taking over package installed for targets"
+                            )
+
+                installation = PackageInstallationMetaInfo(
+                    requirement=requirement,
+                    manager=manager,
+                    used_existing=used_existing,
+                )
+                with self._meta_lock(meta.module_name):
+                    meta.package_installations.append(installation)
+                    self._checkpoint_installation(meta, installation)
 
-                    # install if the package is not installed
-                    manager = requirement.install()
-                    used_existing = False
-                else:
-                    _logger.debug(f" - using existing package installed by other")
+    def _sync_pinned_package(self, installation: PackageInstallationMetaInfo):
+        """
+        Reinstall a package installed by dofu at its pinned version if it differs.
+        """
+        pinned = lf.pinned(installation.requirement)
+        if pinned is installation.requirement or installation.manager is None:
+            return
 
-                    manager = None
-                    used_existing = True
+        version = installation.manager.installed_version(pinned.spec)
+        if version is not None and version != pinned.spec.version:
+            _logger.debug(f" - reinstalling package at pinned {pinned.spec.version}")
 
-                meta.package_installations.append(
-                    PackageInstallationMetaInfo(
-                        requirement=requirement,
-                        manager=manager,
-                        used_existing=used_existing,
-                    )
-                )
+            with _timing(timing.Action.INSTALL, repr_pkg_requirement(pinned)):
+                installation.manager.install(pinned.spec)
 
-    @staticmethod
-    def _sync_gitrepos_step(module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo):
+    def _sync_gitrepos_step(
+        self, module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo
+    ):
         """
         Sync git repo requirements.
 
@@ -609,23 +1498,46 @@ class ModuleEquipmentManager:
             required = utils.find(
                 module.gitrepo_requirements(),
                 value=installation.requirement,
-                key=lambda x: x.url,
+                key=lambda x: sharing.normalize_url(x.url),
                 default=None,
             )
 
             # not required any more or broken, remove the installation
-            if required is None or not installation.requirement.is_satisfied():
+            if required is None or not self._shared.is_satisfied(
+                installation.requirement
+            ):
                 _logger.debug(f" - removing gitrepo as not being required any more")
 
-                installation.requirement.uninstall()
-                meta.gitrepo_installations.remove(installation)
+                self._release_gitrepo(meta, installation)
+                with self._meta_lock(meta.module_name):
+                    meta.gitrepo_installations.remove(installation)
+                    self._checkpoint_installation(meta, installation, dropped=True)
 
             # required but the local path has changed, move to the new dst
             elif required.path != installation.requirement.path:
-                _logger.debug(f" - moving gitrepo to new dst {required.path}")
-
-                shutils.move(installation.requirement.path, required.path)
-                installation.requirement.path = required.path
+                key = _installation_key(installation)
+                with self._shared.lock(installation.requirement):
+                    shared = bool(
+                        self._shared.holders(
+                            self.meta.values(), installation.requirement, excluded=meta
+                        )
+                    )
+                    if shared:
+                        # leave the clone to the other holders, and clone a new one
+                        _logger.debug(f" - leaving gitrepo shared with other modules")
+
+                        with self._meta_lock(meta.module_name):
+                            meta.gitrepo_installations.remove(installation)
+                    else:
+                        _logger.debug(f" - moving gitrepo to new dst {required.path}")
+
+                        with _timing(timing.Action.MOVE, installation.requirement.url):
+                            shutils.move(installation.requirement.path, required.path)
+                        self._shared.mark_satisfied(installation.requirement, False)
+                        installation.requirement.path = required.path
+                self._checkpoint_installation(
+                    meta, installation, key=key, dropped=shared
+                )
 
         # install requirements that are required but not installed
         for requirement in module.gitrepo_requirements():
@@ -633,83 +1545,116 @@ class ModuleEquipmentManager:
 
             installation = utils.find(
                 meta.gitrepo_installations,
-                pred=lambda x: x.requirement.url == requirement.url,
+                pred=lambda x: sharing.normalize_url(x.requirement.url)
+                == sharing.normalize_url(requirement.url),
                 default=None,
             )
 
             # installed already
             if installation is not None:
-                if not requirement.is_satisfied():
-                    _logger.warning(f" - re-cloning gitrepo as seemed broken")
-
-                    # reinstall since the gitrepo is broken
-                    requirement.install()
-                    installation.used_existing = False
-                else:
-                    _logger.debug(f" - updating existing gitrepo")
-
-                    requirement.update()
+                # the lock makes sure a shared gitrepo is synced only once
+                with self._shared.lock(requirement):
+                    if not self._shared.is_satisfied(requirement):
+                        _logger.warning(f" - re-cloning gitrepo as seemed broken")
+
+                        # reinstall since the gitrepo is broken
+                        with _timing(timing.Action.CLONE, requirement.url):
+                            lf.pinned(requirement).install()
+                        installation.used_existing = False
+                        self._shared.mark_satisfied(requirement, True)
+                        self._shared.mark_updated(requirement)
+                        self._checkpoint_installation(meta, installation)
+                    elif self._shared.mark_updated(requirement):
+                        _logger.debug(f" - updating existing gitrepo")
+
+                        with _timing(timing.Action.FETCH, requirement.url):
+                            lf.pinned(requirement).update()
+                    else:
+                        _logger.debug(f" - gitrepo has been updated in this run")
 
             # install for the first time
             else:
-                if not requirement.is_satisfied():
-                    _logger.debug(f" - cloning gitrepo")
-
-                    # install if the package is not installed
-                    requirement.install()
-                    used_existing = False
-                else:
-                    _logger.debug(f" - using existing gitrepo")
-
-                    used_existing = True
-
-                meta.gitrepo_installations.append(
-                    GitRepoInstallationMetaInfo(
-                        requirement=requirement,
-                        used_existing=used_existing,
-                    )
+                # the lock makes sure a shared gitrepo is cloned only once
+                with self._shared.lock(requirement):
+                    if not self._shared.is_satisfied(requirement):
+                        _logger.debug(f" - cloning gitrepo")
+
+                        # install if the package is not installed
+                        with _timing(timing.Action.CLONE, requirement.url):
+                            lf.pinned(requirement).install()
+                        used_existing = False
+                        self._shared.mark_satisfied(requirement, True)
+                        self._shared.mark_updated(requirement)
+                    else:
+                        _logger.debug(f" - using existing gitrepo")
+
+                        used_existing = True
+
+                installation = GitRepoInstallationMetaInfo(
+                    requirement=requirement,
+                    used_existing=used_existing,
                 )
+                with self._meta_lock(meta.module_name):
+                    meta.gitrepo_installations.append(installation)
+                    self._checkpoint_installation(meta, installation)
 
-    @staticmethod
-    def _sync_commands_step(module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo):
+    def _sync_commands_step(
+        self, module: t.Type["m.Module"], meta: ModuleEquipmentMetaInfo
+    ):
         """
         Sync undoable commands sequences.
 
-        This method will keep the common prefix steps,
-        and undo all the executed steps after the common prefix steps.
-        Then, it will execute the remaining steps.
+        This method will keep the executed steps that are still required,
+        and undo only the executed steps that are withdrawn or changed.
+        Then, it will repair the kept steps whose effect has drifted,
+        and execute the new steps.
         """
         _logger.info(f"Syncing commands")
 
-        itr_installed_cmds = iter(meta.commands())
-        itr_required_cmds = iter(module.command_requirements())
-        for installed, required in zip(itr_installed_cmds, itr_required_cmds):
-            # skip the foremost steps that have been executed by checking spec identity
-            if installed.spec_tuple() != required.spec_tuple():
-                itr_installed_cmds = itertools.chain([installed], itr_installed_cmds)
-                itr_required_cmds = itertools.chain([required], itr_required_cmds)
-                break
+        installed = list(meta.commands())
+        withdrawn, fresh = diff_commands(installed, module.command_requirements())
+        withdrawn_ids = set(map(id, withdrawn))
+        kept = [command for command in installed if id(command) not in withdrawn_ids]
 
         _logger.debug(f" - rolling back withdrawn config commands if any")
 
-        # rollback the executed commands after index i
-        for _ in zip(itr_installed_cmds, meta.rollback_lazily()):
-            pass
+        # undo only the withdrawn commands in reversed executing order
+        for transaction, index, command in meta.undo_commands_lazily(withdrawn):
+            self._checkpoint_transaction(
+                meta, transaction, record_index=index, command=command
+            )
+
+        _logger.debug(f" - repairing drifted config commands if any")
+
+        # repair the kept commands whose effect is not in place any more,
+        # keeping what undoing them restores
+        for command, applied in zip(kept, uc.probe_applied(kept)):
+            if applied is False:
+                _logger.warning(f" - repairing drifted command {command.cmdline()}")
+
+                with _timing(timing.Action.EXEC, command.cmdline()):
+                    ret = command.repair()
+                    if ret.retcode != 0:
+                        _logger.error(f"Failed to repair command {command} - {ret}")
+                        raise ret.to_error()
 
         _logger.debug(f" - executing new config commands if any")
 
         # execute the remaining configuring commands
-        with meta.transaction() as transaction:
-            for command in itr_required_cmds:
-                ret = command.exec()
-                if ret.retcode != 0:
-                    _logger.error(f"Failed to execute command {command} - {ret}")
-                    raise ret.to_error()
+        with meta.transaction(module.last_commit_id()) as transaction:
+            for command in fresh:
+                with _timing(timing.Action.EXEC, command.cmdline()):
+                    ret = command.exec()
+                    if ret.retcode != 0:
+                        _logger.error(f"Failed to execute command {command} - {ret}")
+                        raise ret.to_error()
 
                 transaction.records.append(command)
+                self._checkpoint_transaction(
+                    meta, transaction, record_index=transaction.len - 1, command=command
+                )
 
-    @staticmethod
-    def _remove_one_step(meta: ModuleEquipmentMetaInfo):
+    def _remove_one_step(self, meta: ModuleEquipmentMetaInfo):
         """
         Remove a module.
 
@@ -719,28 +1664,354 @@ class ModuleEquipmentManager:
 
         # undo commands
         while meta.transactions:
-            meta.transactions[-1].rollback()
+            transaction = meta.transactions[-1]
+            for index in transaction.rollback_lazily():
+                self._checkpoint_transaction(
+                    meta,
+                    transaction,
+                    record_index=index,
+                    command=transaction.records[index],
+                )
             meta.transactions.pop()
+            self._checkpoint_transaction(meta, None)
 
         _logger.info("Removing gitrepos")
 
         # remove gitrepos
         while meta.gitrepo_installations:
-            meta.gitrepo_installations[-1].requirement.uninstall()
-            meta.gitrepo_installations.pop()
+            self._release_gitrepo(meta, meta.gitrepo_installations[-1])
+            installation = meta.gitrepo_installations.pop()
+            self._checkpoint_installation(meta, installation, dropped=True)
 
         _logger.info("Uninstalling packages")
 
         # uninstall packages
         while meta.package_installations:
-            if meta.package_installations[-1].manager is not None:
-                meta.package_installations[-1].requirement.uninstall(
-                    meta.package_installations[-1].manager
+            self._release_package(meta, meta.package_installations[-1])
+            installation = meta.package_installations.pop()
+            self._checkpoint_installation(meta, installation, dropped=True)
+
+    def _release_package(
+        self, meta: ModuleEquipmentMetaInfo, installation: PackageInstallationMetaInfo
+    ):
+        """
+        Release a package installation of a module.
+
+        The package is uninstalled only if it was installed by the module,
+        and no other module holds it. If any other module holds it,
+        the ownership is transferred to that module instead.
+
+        :param meta: equipment meta info of the releasing module.
+        :param installation: the package installation to release.
+        """
+        requirement = installation.requirement
+        with self._shared.lock(requirement):
+            if installation.manager is None:
+                return
+
+            holders = self._heirs(meta, requirement)
+            if holders:
+                heir_meta, heir = holders[0]
+                _logger.debug(
+                    f" - package is still used by {heir_meta.module_name}, handing over"
+                )
+
+                with self._meta_lock(heir_meta.module_name):
+                    heir.manager = installation.manager
+                    heir.used_existing = False
+                    self._checkpoint_installation(heir_meta, heir)
+                return
+
+            with _timing(timing.Action.UNINSTALL, repr_pkg_requirement(requirement)):
+                requirement.uninstall(installation.manager)
+            self._shared.mark_satisfied(requirement, False)
+
+    def _heirs(
+        self, meta: ModuleEquipmentMetaInfo, requirement: req.Requirement
+    ) -> t.List[t.Tuple[ModuleEquipmentMetaInfo, t.Any]]:
+        """
+        Find the modules to hand over an installation released by a module.
+
+        The modules being removed are never heirs, even if they are not removed yet,
+        since their installations are going to be released as well.
+
+        :param meta: equipment meta info of the releasing module.
+        :param requirement: the package or git repo requirement released.
+        :return: list of the heir modules and their installations.
+        """
+        return self._shared.holders(
+            (
+                other
+                for other in self.meta.values()
+                if other.module_name not in self._removing
+            ),
+            requirement,
+            excluded=meta,
+        )
+
+    def _release_gitrepo(
+        self, meta: ModuleEquipmentMetaInfo, installation: GitRepoInstallationMetaInfo
+    ):
+        """
+        Release a gitrepo installation of a module.
+
+        The gitrepo is removed only if no other module holds it.
+        If any other module holds it, the ownership is transferred to that module.
+
+        :param meta: equipment meta info of the releasing module.
+        :param installation: the gitrepo installation to release.
+        """
+        requirement = installation.requirement
+        with self._shared.lock(requirement):
+            holders = self._heirs(meta, requirement)
+            if holders:
+                heir_meta, heir = holders[0]
+                _logger.debug(
+                    f" - gitrepo is still used by {heir_meta.module_name}, handing over"
                 )
-            meta.package_installations.pop()
+
+                with self._meta_lock(heir_meta.module_name):
+                    heir.used_existing = (
+                        heir.used_existing and installation.used_existing
+                    )
+                    self._checkpoint_installation(heir_meta, heir)
+                return
+
+            with _timing(timing.Action.REMOVE, requirement.url):
+                requirement.uninstall()
+            self._shared.mark_satisfied(requirement, False)
+
+
+def diff_commands(
+    installed: t.List[uc.UndoableCommand], required: t.List[uc.UndoableCommand]
+) -> t.Tuple[t.List[uc.UndoableCommand], t.List[uc.UndoableCommand]]:
+    """
+    Diff the installed commands of a module against the required ones.
+
+    Commands are matched by their class and spec,
+    so that the installed commands matching a required one are kept
+    wherever they are, and only the others are withdrawn or fresh to execute.
+
+    Since the kept commands are not executed again, a kept command is withdrawn
+    and executed again if its order matters, that is, it manages a path
+    overlapping with the managed paths of:
+    - a withdrawn command executed before it;
+    - a fresh command required before it;
+    - a kept command required before it but executed after it.
+
+    :param installed: the effective installed commands in executed order.
+    :param required: the required commands in order.
+    :return: tuple of the withdrawn installed commands in executed order,
+        and the fresh required commands in order.
+    """
+    # match each required command with the foremost installed one of the same key
+    candidates: t.Dict[t.Tuple, t.List[int]] = {}
+    for i, command in enumerate(installed):
+        candidates.setdefault(_command_key(command), []).append(i)
+
+    matches: t.Dict[int, int] = {}  # required index -> installed index
+    for j, command in enumerate(required):
+        indices = candidates.get(_command_key(command))
+        if indices:
+            matches[j] = indices.pop(0)
+
+    installed_paths = [_normalized_paths(command) for command in installed]
+    required_paths = [_normalized_paths(command) for command in required]
+
+    # withdraw the kept commands whose order matters until nothing changes
+    while True:
+        matched = set(matches.values())
+        withdrawn = [i for i in range(len(installed)) if i not in matched]
+        fresh = [j for j in range(len(required)) if j not in matches]
+
+        disordered = [
+            j
+            for j, i in matches.items()
+            if installed_paths[i]
+            and (
+                any(
+                    w < i and _overlaps(installed_paths[w], installed_paths[i])
+                    for w in withdrawn
+                )
+                or any(
+                    f < j and _overlaps(required_paths[f], installed_paths[i])
+                    for f in fresh
+                )
+                or any(
+                    other_j < j
+                    and other_i > i
+                    and _overlaps(installed_paths[other_i], installed_paths[i])
+                    for other_j, other_i in matches.items()
+                )
+            )
+        ]
+        if not disordered:
+            break
+
+        for j in disordered:
+            del matches[j]
+
+    return [installed[i] for i in withdrawn], [required[j] for j in fresh]
+
+
+def _command_key(command: uc.UndoableCommand) -> t.Tuple:
+    return type(command).__qualname__, command.spec_tuple()
+
+
+def _normalized_paths(command: uc.UndoableCommand) -> t.List[str]:
+    return [
+        os.path.abspath(os.path.expanduser(os.fspath(path)))
+        for path in command.managed_paths()
+    ]
+
+
+def _overlaps(paths: t.List[str], others: t.List[str]) -> bool:
+    """
+    Check whether any of the paths is the same as, or nested in, any of the others.
+    """
+    return any(
+        path == other
+        or path.startswith(other.rstrip(os.sep) + os.sep)
+        or other.startswith(path.rstrip(os.sep) + os.sep)
+        for path in paths
+        for other in others
+    )
+
+
+def _unchanged(meta: ModuleEquipmentMetaInfo, module: t.Type["m.Module"]) -> bool:
+    return (
+        meta.installed
+        and meta.fingerprint is not None
+        and meta.fingerprint == fp.module_fingerprint(module)
+    )
+
+
+def _estimate_stage(
+    module: t.Type["m.Module"],
+    stage: ModuleEquipmentStage,
+    meta: ModuleEquipmentMetaInfo,
+) -> float:
+    """
+    Estimate the seconds to equip one stage of a module from the past timings.
+
+    Actions that have never been recorded are regarded as costing nothing.
+    """
+    if stage == ModuleEquipmentStage.PACKAGES:
+        installed = [x.requirement for x in meta.package_installations]
+        keys = [
+            timing.action_key(timing.Action.INSTALL, repr_pkg_requirement(requirement))
+            for requirement in module.package_requirements()
+            if requirement not in installed
+        ]
+
+    elif stage == ModuleEquipmentStage.GITREPOS:
+        cloned = [
+            sharing.normalize_url(x.requirement.url) for x in meta.gitrepo_installations
+        ]
+        keys = [
+            timing.action_key(
+                (
+                    timing.Action.FETCH
+                    if sharing.normalize_url(requirement.url) in cloned
+                    else timing.Action.CLONE
+                ),
+                requirement.url,
+            )
+            for requirement in module.gitrepo_requirements()
+        ]
+
+    else:
+        _, fresh = diff_commands(list(meta.commands()), module.command_requirements())
+        keys = [
+            timing.action_key(timing.Action.EXEC, command.cmdline())
+            for command in fresh
+        ]
+
+    store = timing.TimingStore.instance()
+    return sum(store.estimate(key) or 0.0 for key in keys)
+
+
+def _estimate_removal(meta: ModuleEquipmentMetaInfo) -> float:
+    """
+    Estimate the seconds to remove a module from the past timings.
+    """
+    keys = [
+        *(
+            timing.action_key(timing.Action.UNDO, command.cmdline())
+            for command in meta.commands()
+        ),
+        *(
+            timing.action_key(timing.Action.REMOVE, installation.requirement.url)
+            for installation in meta.gitrepo_installations
+        ),
+        *(
+            timing.action_key(
+                timing.Action.UNINSTALL,
+                repr_pkg_requirement(installation.requirement),
+            )
+            for installation in meta.package_installations
+            if installation.manager is not None
+        ),
+    ]
+    store = timing.TimingStore.instance()
+    return sum(store.estimate(key) or 0.0 for key in keys)
+
+
+def _log_progress(done: int, total: int, eta: float):
+    _logger.info(f"Progress {done}/{total}, ETA {timing.repr_seconds(eta)}")
+
+
+def _installation_key(
+    installation: t.Union[PackageInstallationMetaInfo, GitRepoInstallationMetaInfo],
+) -> str:
+    """
+    Get the key of an installation in the journal.
+    """
+    return repr(sharing.requirement_key(installation.requirement))
+
+
+def _put_installation(installations: t.List, key: str, installation):
+    """
+    Put an installation in place of the one with the key, or drop it if None.
+
+    A new installation is appended as syncing does.
+    """
+    index = utils.find(
+        range(len(installations)),
+        pred=lambda i: _installation_key(installations[i]) == key,
+        default=None,
+    )
+    if installation is None:
+        if index is not None:
+            installations.pop(index)
+    elif index is None:
+        installations.append(installation)
+    else:
+        installations[index] = installation
+
+
+@functools.cache
+def _journal_of(path: os.PathLike) -> jnl.Journal:
+    return jnl.Journal(path)
+
+
+def _journal() -> jnl.Journal:
+    return _journal_of(env.equipment_journal_file())
+
+
+def _registry() -> t.Type["m.ModuleRegistrationManager"]:
+    # import the module registry lazily,
+    # so that applying a compiled plan requires no registry
+    from dofu import module
+
+    return module.ModuleRegistrationManager
+
+
+def _timing(action: timing.Action, target: str):
+    return timing.TimingStore.instance().timing(timing.action_key(action, target))
 
 
-def _repr_pkg_requirement(requirement: req.PackageRequirement):
+def repr_pkg_requirement(requirement: req.PackageRequirement):
     return f"{requirement.spec.package}:{requirement.spec.version}"
 
 
@@ -0,0 +1,247 @@
+import heapq
+import logging
+import os
+import shlex
+import subprocess
+import time
+import typing as t
+
+from dofu import (
+    env,
+    package_managers as pms,
+    platform as pf,
+    requirement as req,
+    undoable_command as uc,
+    utils,
+    version_control as vc,
+)
+from dofu.runner import CompiledModule, CompiledPlan
+
+_logger = logging.getLogger(__name__)
+
+_base_packages = ("ca-certificates", "curl", "git", "sudo")
+"""
+System packages the image needs to clone the repos and run dofu.
+"""
+
+_build_files = ("pyproject.toml", "uv.lock", "README.md", "LICENSE")
+"""
+Files in the project root that installing dofu from the project needs,
+including the readme and the license the build backend reads.
+"""
+
+
+def export_dockerfile(
+    module_names: t.List[str],
+    output: os.PathLike,
+    *,
+    base: str = "ubuntu:22.04",
+) -> str:
+    """
+    Export the blueprint of equipping the modules as a layer-cached Dockerfile.
+
+    The image mirrors the layout of this machine, that is,
+    the project and the home are at the same paths, so that the compiled plans
+    apply in the image as they do here.
+    The layers go from the least to the most frequently changed:
+
+    - the system packages of all the modules in one batch,
+    - the git repos, each cloned and pinned to a commit id,
+    - dofu itself,
+    - the config of each module, compiled into a plan and applied by `dofu-run`,
+      from the least to the most recently changed module.
+
+    A config tweak then only rebuilds the layers of the modules from the tweaked one.
+    The compiled plans are written next to the Dockerfile,
+    which has to be in the project as the project is the build context.
+
+    :param module_names: names of the modules.
+    :param output: path of the Dockerfile.
+    :param base: the base image, which should be based on apt.
+    :return: the content of the Dockerfile.
+    """
+    root = os.fspath(env.project_root())
+    output = os.path.abspath(output)
+    if not utils.is_subpath(output, root):
+        raise ValueError(f"the Dockerfile must be in the project {root}")
+
+    plan = CompiledPlan.compile(module_names)
+    modules = _order_by_change(plan)
+    plans_dir = f"{output}.d"
+    os.makedirs(plans_dir, exist_ok=True)
+
+    home = os.fspath(env.user_home())
+    lines = [
+        f"# Generated by `dofu export dockerfile {' '.join(module_names)}`",
+        f"FROM {base}",
+        "ENV LC_ALL=C.UTF-8 LC_CTYPE=C.UTF-8 DEBIAN_FRONTEND=noninteractive",
+        f"ENV HOME={home} PATH={home}/.local/bin:$PATH",
+        f"WORKDIR {home}",
+        "",
+        "# system packages of all the modules",
+        _run(
+            "apt-get update",
+            "apt-get install -y --no-install-recommends "
+            + " ".join(_apt_packages(plan.modules)),
+            "rm -rf /var/lib/apt/lists/*",
+        ),
+    ]
+
+    gitrepos = [git for module in modules for git in module.gitrepos]
+    if gitrepos:
+        lines += ["", "# git repos pinned to their commit ids"]
+        lines += [_run(*_clone(git)) for git in gitrepos]
+
+    lines += [
+        "",
+        "# dofu itself",
+        _run("curl -LsSf https://astral.sh/uv/install.sh | sh"),
+        f"COPY {' '.join(_build_files)} {root}/",
+        f"COPY src {root}/src",
+        _run(f"uv tool install --editable {shlex.quote(root)}"),
+    ]
+
+    for module in modules:
+        plan_path = os.path.join(plans_dir, f"{module.name()}.yaml")
+        CompiledPlan(modules=[module]).save(plan_path)
+
+        lines += ["", f"# config of module {module.name()}"]
+        for source in _project_sources(module, root):
+            rel = os.path.relpath(source, root)
+            lines.append(f"COPY {rel} {os.path.join(root, rel)}")
+        lines += [
+            f"COPY {os.path.relpath(plan_path, root)} /tmp/dofu/{module.name()}.yaml",
+            _run(f"dofu-run /tmp/dofu/{module.name()}.yaml --strategy force"),
+        ]
+
+    content = "\n".join(lines) + "\n"
+    with open(output, "w") as file:
+        file.write(content)
+
+    _logger.info(
+        f"Exported {len(modules)} modules into {output}"
+        f" with their compiled plans in {plans_dir}"
+    )
+    return content
+
+
+def _order_by_change(plan: CompiledPlan) -> t.List[CompiledModule]:
+    """
+    Order the modules from the least to the most recently changed,
+    while keeping each module after the ones it depends on.
+    """
+    root = env.project_root()
+    now = int(time.time())
+
+    def changed_at(module: CompiledModule) -> int:
+        if not module.commit_id:
+            return now  # never committed, regarded as changed right now
+        return vc.commit_time(repo_path=root, revision=module.commit_id)
+
+    dependencies = plan.dependencies()
+    times = {module: changed_at(module) for module in plan.modules}
+    index = {module: i for i, module in enumerate(plan.modules)}
+    waiting = {module: len(deps) for module, deps in dependencies.items()}
+    dependents = {module: [] for module in plan.modules}
+    for module, deps in dependencies.items():
+        for dep in deps:
+            dependents[dep].append(module)
+
+    ready = [(times[m], index[m], m) for m, n in waiting.items() if n == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        *_, module = heapq.heappop(ready)
+        ordered.append(module)
+        for dependent in dependents[module]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                heapq.heappush(ready, (times[dependent], index[dependent], dependent))
+
+    return ordered
+
+
+def _apt_packages(modules: t.List[CompiledModule]) -> t.List[str]:
+    """
+    Collect the packages installed by apt, with their versions pinned if given.
+    """
+    packages = set(_base_packages)
+    for module in modules:
+        for requirement in module.packages:
+            if not _installed_by_apt(requirement):
+                _logger.debug(
+                    f"Leave {requirement.spec.package} to module {module.name()}"
+                    " as it is not installed by apt"
+                )
+                continue
+
+            spec = requirement.spec
+            if not spec.version or spec.version == "latest":
+                packages.add(spec.package)
+            else:
+                packages.add(f"{spec.package}={spec.version}")
+
+    return sorted(packages)
+
+
+def _installed_by_apt(requirement: req.PackageRequirement) -> bool:
+    """
+    Check whether a package is installed by apt on linux.
+    """
+    return any(
+        isinstance(manager, pms.AptPackageManager)
+        for manager in requirement.candidate_managers(pf.LINUX)
+    )
+
+
+def _clone(git: req.GitRepoRequirement) -> t.List[str]:
+    """
+    Get the commands cloning a repo and pinning it to a commit id.
+    """
+    opts = [f"--branch={git.branch}"] if git.branch else []
+    if git.submodule:
+        opts.append("--recurse-submodules")
+
+    path = os.fspath(git.path)
+    return [
+        f"git clone {vc.shc([*opts, git.url, path])}",
+        f"git -C {shlex.quote(path)} checkout --detach {_pinned_commit_id(git)}",
+    ]
+
+
+def _pinned_commit_id(git: req.GitRepoRequirement) -> str:
+    """
+    Get the commit id to pin a repo to, preferring the one checked out here.
+    """
+    if git.commit_id:
+        return git.commit_id
+
+    if os.path.isdir(os.path.join(git.path, ".git")):
+        with utils.supress(subprocess.CalledProcessError):
+            return vc.current_commit_id(git.path)
+
+    return vc.remote_commit_id(git.url, git.branch or "HEAD")
+
+
+def _project_sources(module: CompiledModule, root: str) -> t.List[str]:
+    """
+    Collect the paths in the project the commands of a module refer to.
+    """
+    sources = []
+    for command in module.commands:
+        for path in uc.spec_paths(command):
+            if (
+                utils.is_subpath(path, root)
+                and os.path.exists(path)
+                and not utils.is_subpath(path, os.path.join(root, "src"))
+                and path not in sources
+            ):
+                sources.append(path)
+    return sources
+
+
+def _run(*commands: str) -> str:
+    """
+    Format a RUN instruction of several commands.
+    """
+    return "RUN " + " \\\n    && ".join(commands)
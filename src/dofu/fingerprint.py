@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import shutil
+import typing as t
+
+from dofu import lockfile as lf
+
+if t.TYPE_CHECKING:
+    from dofu import module as m
+
+
+def module_fingerprint(module: t.Type["m.Module"]) -> str:
+    """
+    Compute the fingerprint of a module.
+
+    The fingerprint covers the last commit id of the module,
+    the specs of all its requirements,
+    and the state of all the targets managed by the module.
+    Hence, two equal fingerprints mean that syncing the module would change nothing.
+    Computing the fingerprint spawns no other process but `git log`.
+
+    :param module: the module to compute the fingerprint for.
+    :return: the fingerprint in hex.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(module.last_commit_id()).encode("utf-8"))
+    digest.update(spec_digest(module).encode("utf-8"))
+    digest.update(_dumps(targets_state(module)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def spec_digest(module: t.Type["m.Module"]) -> str:
+    """
+    Compute the digest of the specs of all the requirements of a module.
+
+    The requirements are pinned to the lock file synced with, if any,
+    so that syncing to other pins is never skipped.
+
+    :param module: the module to compute the digest for.
+    :return: the digest in hex.
+    """
+    specs = [
+        *(
+            ("package", type(pkg).__qualname__, pkg.spec.package, pkg.spec.version)
+            for pkg in map(lf.pinned, module.package_requirements())
+        ),
+        *(
+            ("gitrepo", git.url, git.path, git.submodule, git.branch, git.commit_id)
+            for git in map(lf.pinned, module.gitrepo_requirements())
+        ),
+        *(
+            ("command", type(cmd).__qualname__, cmd.spec_tuple())
+            for cmd in module.command_requirements()
+        ),
+    ]
+    return hashlib.sha256(_dumps(specs).encode("utf-8")).hexdigest()
+
+
+def targets_state(module: t.Type["m.Module"]) -> t.List[t.Tuple]:
+    """
+    Collect the state of all the targets managed by a module.
+
+    The targets are the commands provided by the packages,
+    the local paths of the git repos, together with their checked out HEAD,
+    and the paths managed by the undoable commands.
+
+    :param module: the module to collect the state for.
+    :return: list of the states in a stable order.
+    """
+    states = []
+    for pkg in module.package_requirements():
+        states.append(("package", pkg.command, shutil.which(pkg.command)))
+
+    for git in module.gitrepo_requirements():
+        states.append(path_state(git.path))
+        states.append(path_state(os.path.join(git.path, ".git", "HEAD")))
+
+    for cmd in module.command_requirements():
+        states.extend(map(path_state, cmd.managed_paths()))
+
+    return states
+
+
+def path_state(path: os.PathLike) -> t.Tuple:
+    """
+    Get the state of a path by `lstat`, without following symlinks.
+
+    :param path: the path to get the state for.
+    :return: tuple of the path, and its type, mode, size, mtime and link target.
+    """
+    path = os.fspath(path)
+    try:
+        stat = os.lstat(path)
+
+    except OSError:
+        return path, None
+
+    link = os.readlink(path) if os.path.islink(path) else None
+    return path, stat.st_mode, stat.st_size, stat.st_mtime_ns, link
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, default=os.fspath, sort_keys=True)
@@ -0,0 +1,361 @@
+import dataclasses
+import logging
+import os
+import shutil
+import typing as t
+
+import yaml
+
+from dofu import env, module as m, shutils, undoable_commands as ucs
+from dofu.options import Options
+
+_logger = logging.getLogger(__name__)
+
+_current = "current"
+"""
+Name of the pointer to the live generation.
+"""
+
+_previous = "previous"
+"""
+Name of the pointer to the generation that was live before the current one.
+"""
+
+_manifest = "generation.yaml"
+"""
+Name of the manifest file in a generation.
+"""
+
+_tree = "tree"
+"""
+Name of the directory mirroring the user home in a generation.
+"""
+
+
+@dataclasses.dataclass
+class Generation:
+    """
+    A fully materialized set of the managed symlinks and directories of modules.
+
+    A generation is built ahead of time under the generations root,
+    mirroring the layout of the user home in its tree.
+    The user home only holds anchors, which are symlinks into the tree
+    of the live generation through the `current` pointer.
+    Switching generations is then a single atomic swap of the pointer,
+    plus linking or unlinking the few anchors that only one of them has.
+
+    Only the symlinks and directories under the user home are materialized.
+    Other requirements of the modules, like packages, repos or appended lines,
+    are still equipped as usual.
+    """
+
+    name: str
+    """
+    Name of the generation.
+    """
+
+    module_names: t.List[str] = dataclasses.field(default_factory=list)
+    """
+    Names of the modules materialized in the generation, in equipping order.
+    """
+
+    anchors: t.List[str] = dataclasses.field(default_factory=list)
+    """
+    Paths relative to the user home, which are linked into the tree.
+    """
+
+    @property
+    def path(self):
+        """
+        Path to the generation.
+        """
+        return os.path.join(env.generations_root(), self.name)
+
+    def tree_path(self, *nested: os.PathLike) -> os.PathLike:
+        """
+        Path to the materialized tree of the generation.
+        """
+        return os.path.join(self.path, _tree, *nested)
+
+    @staticmethod
+    def names() -> t.List[str]:
+        """
+        Get the names of all the built generations.
+        """
+        root = env.generations_root()
+        return sorted(
+            name
+            for name in os.listdir(root)
+            if not name.startswith(".")
+            and name not in (_current, _previous)
+            and os.path.isfile(os.path.join(root, name, _manifest))
+        )
+
+    @staticmethod
+    def load(name: str) -> "Generation":
+        """
+        Load a built generation.
+
+        :param name: name of the generation.
+        :return: the generation.
+        """
+        path = os.path.join(env.generations_root(), name, _manifest)
+        if not os.path.isfile(path):
+            raise ValueError(f"generation {name} is not built")
+
+        with open(path, "r") as file:
+            manifest = yaml.safe_load(file) or {}
+
+        return Generation(name=name, **manifest)
+
+    @staticmethod
+    def current() -> t.Optional["Generation"]:
+        """
+        Get the live generation, or None if no generation has been switched to.
+        """
+        return _pointed(_current)
+
+    @staticmethod
+    def previous() -> t.Optional["Generation"]:
+        """
+        Get the generation that was live before the current one, if any.
+        """
+        return _pointed(_previous)
+
+    @staticmethod
+    def build(name: str, module_names: t.Iterable[str]) -> "Generation":
+        """
+        Build a generation of the modules in a staging area.
+
+        The modules and all their dependencies are materialized.
+        A built generation with the same name is replaced,
+        unless it is the live one.
+        Nothing is built in dry run mode.
+
+        :param name: name of the generation.
+        :param module_names: names of the modules.
+        :return: the built generation.
+        """
+        if not name or name.startswith(".") or os.sep in name:
+            raise ValueError(f"invalid generation name {name!r}")
+        if name in (_current, _previous):
+            raise ValueError(f"generation name {name!r} is reserved")
+
+        current = Generation.current()
+        if current is not None and current.name == name:
+            raise ValueError(f"cannot rebuild the live generation {name}")
+
+        blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+        entries = _materialized_entries(blueprint)
+        generation = Generation(
+            name=name,
+            module_names=[module.name() for module in blueprint],
+            anchors=_anchors(entries),
+        )
+
+        if Options.instance().dry_run:
+            for rel, src in entries.items():
+                _logger.info(f"Would materialize {rel}" + (f" -> {src}" if src else ""))
+            return generation
+
+        staging = os.path.join(env.generations_root(), f".staging-{name}-{os.getpid()}")
+        try:
+            # parents are sorted before their children
+            for rel, src in sorted(entries.items()):
+                path = os.path.join(staging, _tree, rel)
+                if src is None:
+                    os.makedirs(path, exist_ok=True)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.symlink(src, path)
+
+            manifest = dataclasses.asdict(generation)
+            manifest.pop("name")
+            with open(os.path.join(staging, _manifest), "w") as file:
+                yaml.safe_dump(manifest, file, sort_keys=False)
+
+            if os.path.exists(generation.path):
+                shutil.rmtree(generation.path)
+            os.replace(staging, generation.path)
+
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        _logger.info(
+            f"Built generation {name} of {len(generation.module_names)} modules"
+            f" with {len(entries)} paths"
+        )
+        return generation
+
+    def switch(self):
+        """
+        Make this generation the live one.
+
+        The pointer to the live generation is swapped atomically,
+        and the previous one is kept for switching back.
+        If linking any new anchor fails, the anchors linked so far are unlinked
+        and the pointers are swapped back, so the old generation stays live.
+        """
+        current = Generation.current()
+        if current is not None and current.name == self.name:
+            _logger.info(f"Generation {self.name} is already live")
+            return
+
+        old_anchors = set(current.anchors) if current is not None else set()
+        new_anchors = set(self.anchors)
+        pointers = {pointer: _pointee(pointer) for pointer in (_current, _previous)}
+
+        if current is not None:
+            _point(_previous, current.name)
+        _point(_current, self.name)
+
+        home = env.user_home()
+        linked = []
+        try:
+            for rel in sorted(new_anchors - old_anchors):
+                path, target = os.path.join(home, rel), _anchor_target(rel)
+                if os.path.islink(path) and os.readlink(path) == target:
+                    continue
+
+                shutils.mkdirs(os.path.dirname(path), exist_ok=True)
+                shutils.symlink(target, path)
+                if not Options.instance().dry_run:
+                    linked.append(path)
+
+        except BaseException:
+            _logger.error(f"Failed to switch to generation {self.name}, rolling back")
+            for path in reversed(linked):
+                _logger.info(f"unlink {path}")
+                os.unlink(path)
+            for pointer, name in pointers.items():
+                _point(pointer, name)
+            raise
+
+        for rel in sorted(old_anchors - new_anchors, reverse=True):
+            path = os.path.join(home, rel)
+            if os.path.islink(path) and os.readlink(path) == _anchor_target(rel):
+                shutils.unlink(path)
+
+        _logger.info(f"Switched to generation {self.name}")
+
+
+def _anchor_target(rel: str) -> str:
+    """
+    Get the target of an anchor, which resolves through the `current` pointer.
+    """
+    return os.path.join(env.generations_root(), _current, _tree, rel)
+
+
+def _pointed(pointer: str) -> t.Optional[Generation]:
+    """
+    Load the generation a pointer points to, if any.
+    """
+    name = _pointee(pointer)
+    return Generation.load(name) if name is not None else None
+
+
+def _pointee(pointer: str) -> t.Optional[str]:
+    """
+    Get the name of the generation a pointer points to, if any.
+    """
+    path = os.path.join(env.generations_root(), pointer)
+    return os.readlink(path) if os.path.islink(path) else None
+
+
+def _point(pointer: str, name: t.Optional[str]):
+    """
+    Swap a pointer to a generation atomically, or remove it if no name is given.
+
+    The pointer is not swapped in dry run mode.
+    """
+    path = os.path.join(env.generations_root(), pointer)
+    if Options.instance().dry_run:
+        _logger.info(f"Would point {pointer} to generation {name}")
+        return
+
+    if name is None:
+        if os.path.lexists(path):
+            os.unlink(path)
+        return
+
+    tmp_path = f"{path}.dofu.tmp"
+    if os.path.lexists(tmp_path):
+        os.unlink(tmp_path)
+    os.symlink(name, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _materialized_entries(
+    blueprint: t.List[t.Type["m.Module"]],
+) -> t.Dict[str, t.Optional[str]]:
+    """
+    Collect the symlinks and directories under the user home to materialize.
+
+    :param blueprint: the modules in equipping order.
+    :return: mapping from the paths relative to the user home
+        to the symlink sources, or None for directories.
+    """
+    home = env.user_home()
+    entries: t.Dict[str, t.Optional[str]] = {}
+    for module in blueprint:
+        for command in module.command_requirements():
+            if isinstance(command, ucs.UCSymlink):
+                path, src = command.dst, os.fspath(command.src)
+            elif isinstance(command, ucs.UCMkdir):
+                path, src = command.path, None
+            else:
+                continue
+
+            rel = os.path.relpath(os.path.abspath(path), home)
+            if rel == os.curdir or rel.startswith(os.pardir):
+                _logger.debug(f"Skip materializing {path} out of the user home")
+                continue
+
+            if entries.get(rel, src) != src:
+                raise ValueError(
+                    f"{path} is materialized differently by module {module.name()}"
+                )
+            entries[rel] = src
+
+    # nothing can be materialized through a symlink
+    symlinks = {rel for rel, src in entries.items() if src is not None}
+    for rel in list(entries):
+        if any(parent in symlinks for parent in _parents(rel)):
+            _logger.warning(f"Skip materializing {rel} inside a symlink")
+            del entries[rel]
+
+    return entries
+
+
+def _anchors(entries: t.Dict[str, t.Optional[str]]) -> t.List[str]:
+    """
+    Find the paths to link from the user home into the materialized tree.
+
+    The outermost materialized paths are anchors,
+    except the directories that are real in the user home,
+    which are kept while their materialized children become anchors instead.
+    """
+    home = env.user_home()
+    anchors = set()
+    for rel in sorted(entries):
+        if any(parent in anchors for parent in _parents(rel)):
+            continue
+
+        path = os.path.join(home, rel)
+        if entries[rel] is None and os.path.isdir(path) and not os.path.islink(path):
+            continue
+
+        anchors.add(rel)
+
+    return sorted(anchors)
+
+
+def _parents(rel: str) -> t.Iterator[str]:
+    """
+    Iterate over the parents of a relative path, from the nearest one.
+    """
+    parent = os.path.dirname(rel)
+    while parent:
+        yield parent
+        parent = os.path.dirname(parent)
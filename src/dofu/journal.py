@@ -0,0 +1,103 @@
+import io
+import logging
+import os
+import threading
+import typing as t
+
+import autoserde
+
+from dofu.options import Options
+
+_logger = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+
+_separator = "\n---\n"
+"""
+Separator between two entries, which is also the yaml document separator.
+"""
+
+
+class Journal:
+    """
+    Append-only journal of serdeable entries.
+
+    Each entry is appended as a yaml document and synced to the disk at once,
+    so that every entry appended before a crash survives it.
+    An entry torn by a crash is dropped when replaying.
+    """
+
+    def __init__(self, path: os.PathLike):
+        """
+        :param path: path to the journal file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """
+        Append an entry to the journal and sync it to the disk.
+
+        Nothing is appended in dry run mode.
+
+        :param entry: the entry to append.
+        """
+        if Options.instance().dry_run:
+            return
+
+        options = autoserde.Options(recursively=True, strict=True, with_cls=True)
+        buffer = io.StringIO()
+        autoserde.AutoSerde.serialize(
+            entry, buffer, options=options, fmt="yaml", sort_keys=False
+        )
+
+        with self._lock:
+            with open(self.path, "a") as file:
+                file.write(buffer.getvalue().rstrip("\n") + _separator)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def replay(self, cls: t.Type[T]) -> t.Iterator[T]:
+        """
+        Replay the entries in the appended order.
+
+        :param cls: class of the entries.
+        :return: generator of the entries.
+        """
+        if not os.path.isfile(self.path):
+            return
+
+        with self._lock:
+            with open(self.path, "r") as file:
+                content = file.read()
+
+        options = autoserde.Options(recursively=True, strict=True)
+        documents = content.split(_separator)
+        for i, document in enumerate(documents):
+            if not document.strip():
+                continue
+
+            try:
+                yield autoserde.AutoSerde.deserialize(
+                    io.StringIO(document), cls=cls, options=options, fmt="yaml"
+                )
+
+            except Exception as e:
+                # only the last entry can be torn by a crash
+                if i == len(documents) - 1:
+                    _logger.warning(f"Drop torn journal entry in {self.path} - {e}")
+                    return
+                raise
+
+    def truncate(self):
+        """
+        Drop all the entries, once they are persisted elsewhere.
+
+        Nothing is dropped in dry run mode.
+        """
+        if Options.instance().dry_run:
+            return
+
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,174 @@
+import dataclasses
+import logging
+import os
+import subprocess
+import typing as t
+
+import yaml
+
+from dofu import env, requirement as req, sharing, utils, version_control as vc
+from dofu.options import Options
+
+if t.TYPE_CHECKING:
+    from dofu import equipment as eqp
+
+_logger = logging.getLogger(__name__)
+
+R = t.TypeVar("R", bound=req.Requirement)
+
+
+@dataclasses.dataclass
+class LockFile:
+    """
+    Pins of the git repos and the packages of the equipped modules.
+
+    Syncing with the pins checks out each git repo at its pinned commit id
+    instead of the head of its branch, and installs each package at its
+    pinned version instead of the latest one, so that a machine provisioned
+    from the same lock file ends up exactly the same.
+    """
+
+    gitrepos: t.Dict[str, t.Dict[str, str]] = dataclasses.field(default_factory=dict)
+    """
+    Pinned commit ids keyed by the normalized repo url and then by the local path,
+    written relative to the home as "~/..." if under it.
+    """
+
+    packages: t.Dict[str, t.Dict[str, str]] = dataclasses.field(default_factory=dict)
+    """
+    Pinned versions keyed by the kind of the package requirement
+    and then by the package name.
+    """
+
+    @staticmethod
+    def capture(metas: t.Iterable["eqp.ModuleEquipmentMetaInfo"]) -> "LockFile":
+        """
+        Capture the commit ids and the versions installed on this machine.
+
+        Git repos that are not cloned and packages whose version is unknown
+        to their package managers are left unpinned.
+
+        :param metas: equipment meta info of the modules to pin.
+        :return: the captured pins.
+        """
+        lock = LockFile()
+        for meta in metas:
+            for installation in meta.gitrepo_installations:
+                git = installation.requirement
+                if os.path.isdir(git.path):
+                    with utils.supress(subprocess.CalledProcessError):
+                        commit_id = vc.current_commit_id(git.path)
+                        paths = lock.gitrepos.setdefault(
+                            sharing.normalize_url(git.url), {}
+                        )
+                        paths[_path_key(git.path)] = commit_id
+
+            for installation in meta.package_installations:
+                pkg = installation.requirement
+                version = None
+                if installation.manager is not None:
+                    version = installation.manager.installed_version(pkg.spec)
+                if version is None:
+                    version = pkg.installed_version()
+
+                if version is not None:
+                    kind = lock.packages.setdefault(type(pkg).__qualname__, {})
+                    kind[pkg.spec.package] = version
+                else:
+                    _logger.debug(f"Leave package {pkg.spec.package} unpinned")
+
+        return lock
+
+    @staticmethod
+    def load(path: os.PathLike) -> "LockFile":
+        """
+        Load the pins from a yaml file.
+
+        :param path: path to the lock file.
+        :return: the loaded pins.
+        """
+        with open(path, "r") as file:
+            content = yaml.safe_load(file) or {}
+
+        return LockFile(
+            gitrepos={
+                url: dict(commit_ids)
+                for url, commit_ids in (content.get("gitrepos") or {}).items()
+            },
+            packages={
+                kind: dict(versions)
+                for kind, versions in (content.get("packages") or {}).items()
+            },
+        )
+
+    def save(self, path: os.PathLike):
+        """
+        Save the pins into a yaml file, which is skipped in dry run mode.
+
+        :param path: path to the lock file.
+        """
+        if Options.instance().dry_run:
+            return
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as file:
+            yaml.safe_dump(
+                {
+                    "gitrepos": {
+                        url: dict(sorted(commit_ids.items()))
+                        for url, commit_ids in sorted(self.gitrepos.items())
+                    },
+                    "packages": {
+                        kind: dict(sorted(versions.items()))
+                        for kind, versions in sorted(self.packages.items())
+                    },
+                },
+                file,
+                sort_keys=False,
+            )
+        os.replace(tmp, path)
+
+    def pin(self, requirement: R) -> R:
+        """
+        Pin a requirement to its commit id or version.
+
+        :param requirement: the git repo or package requirement.
+        :return: a pinned copy of the requirement,
+            or the requirement itself if it is not pinned.
+        """
+        if isinstance(requirement, req.GitRepoRequirement):
+            commit_ids = self.gitrepos.get(sharing.normalize_url(requirement.url), {})
+            commit_id = commit_ids.get(_path_key(requirement.path))
+            if commit_id is None or commit_id == requirement.commit_id:
+                return requirement
+            return dataclasses.replace(requirement, commit_id=commit_id)
+
+        versions = self.packages.get(type(requirement).__qualname__, {})
+        version = versions.get(requirement.spec.package)
+        if version is None or version == requirement.spec.version:
+            return requirement
+        return dataclasses.replace(
+            requirement, spec=dataclasses.replace(requirement.spec, version=version)
+        )
+
+
+def pinned(requirement: R) -> R:
+    """
+    Pin a requirement to the lock file synced with in the current context, if any.
+
+    :param requirement: the git repo or package requirement.
+    :return: the pinned requirement, or the requirement itself if not locked.
+    """
+    pins = Options.instance().pins
+    return requirement if pins is None else pins.pin(requirement)
+
+
+def _path_key(path: str) -> str:
+    """
+    Get the key of the local path of a git repo in a lock file,
+    which is relative to the home if under it, so that it holds on any machine.
+    """
+    path = os.path.abspath(path)
+    if utils.is_subpath(path, env.user_home()):
+        return os.path.join("~", os.path.relpath(path, env.user_home()))
+    return path
@@ -0,0 +1,82 @@
+import contextlib
+import contextvars
+import hashlib
+import os
+import pathlib
+import re
+import typing as t
+
+from dofu import env, version_control as vc
+
+_mirrors: contextvars.ContextVar[t.Optional[t.Dict[str, str]]] = contextvars.ContextVar(
+    "mirrors", default=None
+)
+"""
+Local mirrors to clone and fetch from in the current context, keyed by repo url.
+"""
+
+
+def mirror_path(url: str) -> str:
+    """
+    Get the path of the bare mirror of a repo in the cache.
+
+    :param url: the normalized url of the repo.
+    :return: the path of the mirror.
+    """
+    name = re.sub(r"[^\w.-]+", "_", url.split("://")[-1]).strip("_")
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(env.mirrors_root(), f"{name}-{digest}.git")
+
+
+def update_mirror(url: str, *, reference: os.PathLike = None) -> str:
+    """
+    Clone or update the bare mirror of a repo in the cache.
+
+    :param url: the normalized url of the repo.
+    :param reference: a local clone of the repo, if any,
+        whose objects are copied instead of being downloaded again.
+    :return: the path of the mirror.
+    """
+    path = mirror_path(url)
+    if os.path.isdir(path):
+        vc.remote("update", "--prune", repo_path=path)
+    else:
+        opts = ["--mirror"]
+        if reference is not None and os.path.isdir(os.path.join(reference, ".git")):
+            opts += [f"--reference={os.fspath(reference)}", "--dissociate"]
+        vc.clone(*opts, repo=url, repo_path=path)
+    return path
+
+
+@contextlib.contextmanager
+def using(mirrors: t.Dict[str, str]) -> t.Iterator[None]:
+    """
+    Clone and fetch the repos from their local mirrors in the current context.
+
+    The mirrors are added to the ones already in use, if any.
+
+    :param mirrors: paths of the mirrors or git bundle files keyed by repo url.
+    :return: context manager.
+    """
+    token = _mirrors.set({**(_mirrors.get() or {}), **mirrors})
+    try:
+        yield
+    finally:
+        _mirrors.reset(token)
+
+
+def local_url(url: str) -> t.Optional[str]:
+    """
+    Get the url of the local mirror of a repo to use in the current context.
+
+    :param url: the normalized url of the repo.
+    :return: the file url of the mirror, the path of the git bundle file,
+        or None if the repo is not mirrored.
+    """
+    path = (_mirrors.get() or {}).get(url)
+    if path is None:
+        return None
+    if os.path.isfile(path):
+        # git only reads a bundle file given by its path
+        return os.path.abspath(path)
+    return pathlib.Path(path).absolute().as_uri()
@@ -1,3 +1,5 @@
+import contextlib
+import contextvars
 import dataclasses
 import functools
 import inspect
@@ -186,6 +188,29 @@ class ModuleRegistrationManager:
 
         return sorted_completed_modules
 
+    @classmethod
+    def resolve_dependencies(
+        cls, blueprint: t.List[t.Type["Module"]], *, reverse: bool = False
+    ) -> t.Dict[t.Type["Module"], t.List[t.Type["Module"]]]:
+        """
+        Resolve the modules that each module in the blueprint has to wait for.
+
+        For equipping, a module has to wait for the modules it depends on.
+        For removing, a module has to wait for the modules depending on it.
+        Only the modules in the blueprint are taken into account.
+
+        :param blueprint: list of modules sorted topologically,
+            as resolved by `resolve_equip_blueprint` or `resolve_remove_blueprint`.
+        :param reverse: whether to resolve for removing instead of equipping.
+        :return: mapping from each module to the modules it has to wait for,
+            in the same order as the blueprint.
+        """
+        neighbors = cls.__graph.predecessors if reverse else cls.__graph.successors
+        return {
+            module: [other for other in neighbors(module) if other in blueprint]
+            for module in blueprint
+        }
+
     @classmethod
     def module_class_by_name(cls, name: str) -> t.Type["Module"]:
         """
@@ -282,7 +307,40 @@ class Module:
 
         Currently, the module is completely defined by its class.
         """
+        cache = _commit_ids.get()
+        if cache is not None and cls.name() in cache:
+            return cache[cls.name()]
+
         module_path = inspect.getfile(cls)
-        return vc.last_commit_id_of(repo_path=env.project_root(), path=module_path)
+        commit_id = vc.last_commit_id_of(repo_path=env.project_root(), path=module_path)
+        if cache is not None:
+            cache[cls.name()] = commit_id
+        return commit_id
 
     module = ModuleRegistrationManager.module
+
+
+_commit_ids: contextvars.ContextVar[t.Optional[t.Dict[str, str]]] = (
+    contextvars.ContextVar("commit_ids", default=None)
+)
+"""
+Cache of the last commit ids of the modules in the current context, if any.
+"""
+
+
+@contextlib.contextmanager
+def cached_commit_ids(cache: t.Dict[str, str]):
+    """
+    Cache the last commit ids of the modules in the current context.
+
+    The commit ids only change with new commits to the project,
+    so the owner of the cache decides when to drop it.
+
+    :param cache: mapping from the module names to their last commit ids,
+        which is filled as the commit ids are looked up.
+    """
+    token = _commit_ids.set(cache)
+    try:
+        yield
+    finally:
+        _commit_ids.reset(token)
@@ -1,5 +1,11 @@
+import contextlib
+import contextvars
 import dataclasses
 import enum
+import typing as t
+
+if t.TYPE_CHECKING:
+    from dofu.lockfile import LockFile
 
 
 class Strategy(enum.Enum):
@@ -64,12 +70,80 @@ class Options:
     whether to overwrite the destination, create a backup, or cancel the operation.
     """
 
+    jobs: int = 1
+    """
+    Maximum number of modules to equip or remove concurrently.
+
+    Each module is started as soon as the modules it waits for are done,
+    so that only independent modules run at the same time.
+    """
+
+    refresh: bool = False
+    """
+    If True, sync every module even if its fingerprint is unchanged.
+    Otherwise, the unchanged modules never pull the updates of their repos and packages.
+    """
+
+    prefetch: bool = False
+    """
+    If True, download the git repos and the package payloads of all the modules
+    to sync before changing anything, and sync them from the local data.
+    """
+
+    decisions: t.Dict[str, Strategy] = dataclasses.field(default_factory=dict)
+    """
+    Strategies decided ahead for the conflicting paths, keyed by absolute path.
+
+    A conflict on any of these paths is resolved by the decided strategy
+    instead of the global one, so that it never blocks the run with a prompt.
+    """
+
+    pins: t.Optional["LockFile"] = None
+    """
+    Pins of the git repos and the packages to sync to, like the ones written by
+    `dofu lock`.
+
+    If None, git repos follow their branches and packages their versions.
+    """
+
+    @staticmethod
+    def instance() -> "Options":
+        """
+        Get the options of the current context.
+
+        The options are context-local, so that the threads and asyncio tasks
+        running with different options never see each other's.
+        Outside any scope, the process-wide default options are returned.
+        """
+        return _options.get()
+
     @staticmethod
-    def instance():
-        return _options
+    @contextlib.contextmanager
+    def scoped(**changes) -> t.Iterator["Options"]:
+        """
+        Run with a copy of the current options in the current context.
+
+        The copy is seen by everything run in the context,
+        including the workers started through `utils.ContextExecutor`
+        and the asyncio tasks created in it,
+        and is dropped when leaving the scope.
+
+        :param changes: the options to change in the copy.
+        :return: context manager yielding the copied options.
+        """
+        current = _options.get()
+        changes.setdefault("decisions", dict(current.decisions))
+        token = _options.set(dataclasses.replace(current, **changes))
+        try:
+            yield _options.get()
+        finally:
+            _options.reset(token)
 
 
-_options: Options = Options(
-    dry_run=False,
-    strategy=Strategy.ASK,
+_options: contextvars.ContextVar[Options] = contextvars.ContextVar(
+    "options",
+    default=Options(
+        dry_run=False,
+        strategy=Strategy.ASK,
+    ),
 )
@@ -0,0 +1,195 @@
+import dataclasses
+import json
+import os
+import threading
+import typing as t
+
+from dofu import undoable_command as uc
+from dofu.options import Options
+
+if t.TYPE_CHECKING:
+    from dofu import equipment as eqp
+
+
+@dataclasses.dataclass(frozen=True)
+class Owner:
+    """
+    The module and command that manage a path.
+    """
+
+    module_name: str
+    """
+    Name of the module managing the path.
+    """
+
+    cmdline: str
+    """
+    Command line of the command managing the path, or of the clone of a repo.
+    """
+
+    transaction: t.Optional[int] = None
+    """
+    Index of the transaction in the module, None for a cloned repo.
+    """
+
+    command: t.Optional[int] = None
+    """
+    Index of the command in the transaction, None for a cloned repo.
+    """
+
+
+class OwnershipIndex:
+    """
+    Index from the absolute paths to the modules and commands managing them.
+
+    The index is kept up to date module by module whenever a module makes a step,
+    and persisted together with the equipment meta information,
+    so that looking up the owner of a path never scans the transactions.
+    """
+
+    def __init__(self, owners: t.Dict[str, Owner] = None):
+        """
+        :param owners: mapping from the absolute paths to their owners.
+        """
+        self._lock = threading.Lock()
+        self._owners: t.Dict[str, Owner] = {}
+        self._paths: t.Dict[str, t.Set[str]] = {}
+        for path, owner in (owners or {}).items():
+            self._add(path, owner)
+
+    def __len__(self):
+        return len(self._owners)
+
+    def items(self) -> t.List[t.Tuple[str, Owner]]:
+        """
+        Get a snapshot of the paths and their owners.
+        """
+        with self._lock:
+            return list(self._owners.items())
+
+    @staticmethod
+    def load(path: os.PathLike) -> t.Optional["OwnershipIndex"]:
+        """
+        Load the index from the persistence file.
+
+        :param path: path to the persistence file.
+        :return: the index, or None if it has not been persisted.
+        """
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, "r") as file:
+            owners = json.load(file)
+
+        return OwnershipIndex(
+            {path: Owner(*owner) for path, owner in owners.items()},
+        )
+
+    def save(self, path: os.PathLike):
+        """
+        Save the index to the persistence file.
+
+        Nothing is saved in dry run mode.
+
+        :param path: path to the persistence file.
+        """
+        if Options.instance().dry_run:
+            return
+
+        with self._lock:
+            owners = {
+                owned: dataclasses.astuple(owner)
+                for owned, owner in self._owners.items()
+            }
+
+        tmp_path = f"{path}.dofu.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(owners, file)
+        os.replace(tmp_path, path)
+
+    def lookup(self, path: os.PathLike) -> t.Optional[Owner]:
+        """
+        Look up the owner of a path.
+
+        :param path: the path to look up.
+        :return: the owner, or None if the path is not managed by any module.
+        """
+        with self._lock:
+            return self._owners.get(os.path.abspath(os.path.expanduser(path)))
+
+    def rebuild(self, metas: t.Iterable["eqp.ModuleEquipmentMetaInfo"]):
+        """
+        Rebuild the index from the meta information of all the modules.
+
+        :param metas: equipment meta info of all the modules.
+        """
+        with self._lock:
+            self._owners.clear()
+            self._paths.clear()
+
+        for meta in metas:
+            self.update(meta)
+
+    def update(self, meta: "eqp.ModuleEquipmentMetaInfo", *, removed: bool = False):
+        """
+        Update the paths owned by a module after it makes a step.
+
+        :param meta: equipment meta info of the module.
+        :param removed: whether the module has been removed.
+        """
+        owners = {} if removed else dict(owned_paths(meta))
+        with self._lock:
+            for path in self._paths.pop(meta.module_name, ()):
+                # a shared path may have been taken over by another module
+                owner = self._owners.get(path)
+                if owner is not None and owner.module_name == meta.module_name:
+                    del self._owners[path]
+            for path, owner in owners.items():
+                self._add(path, owner)
+
+    def _add(self, path: str, owner: Owner):
+        self._owners[path] = owner
+        self._paths.setdefault(owner.module_name, set()).add(path)
+
+
+def owned_paths(
+    meta: "eqp.ModuleEquipmentMetaInfo",
+) -> t.Iterator[t.Tuple[str, Owner]]:
+    """
+    Iterate over the paths a module owns, which are its cloned repos
+    and the paths created by its effective commands.
+
+    :param meta: equipment meta info of the module.
+    :return: generator of the absolute paths and their owners.
+    """
+    for installation in meta.gitrepo_installations:
+        requirement = installation.requirement
+        yield os.path.abspath(requirement.path), Owner(
+            module_name=meta.module_name, cmdline=f"git clone {requirement.url}"
+        )
+
+    for i, transaction in enumerate(meta.transactions):
+        for j, command in enumerate(transaction.effect_records):
+            for path in command_paths(command):
+                yield path, Owner(
+                    module_name=meta.module_name,
+                    cmdline=command.cmdline(),
+                    transaction=i,
+                    command=j,
+                )
+
+
+def command_paths(command: uc.UndoableCommand) -> t.List[str]:
+    """
+    Get the absolute paths created or changed by a command,
+    excluding the ones it moves away.
+
+    :param command: the command.
+    :return: list of the absolute paths.
+    """
+    vacated = set(map(os.path.abspath, command.vacated_paths()))
+    return [
+        path
+        for path in map(os.path.abspath, command.managed_paths())
+        if path not in vacated
+    ]
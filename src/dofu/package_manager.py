@@ -1,5 +1,6 @@
 import abc
 import dataclasses
+import typing as t
 
 import autoserde
 
@@ -23,3 +24,46 @@ class PackageManager(autoserde.Serdeable, abc.ABC):
     @abc.abstractmethod
     def is_available(self) -> bool:
         return False
+
+    def installed_version(self, spec: sp.PackageSpecification) -> t.Optional[str]:
+        """
+        Get the version of a package installed by this package manager.
+
+        The version is in the format that `install` accepts,
+        so that installing the package at the version reproduces it.
+
+        :param spec: the specification of the package.
+        :return: the installed version,
+            or None if not installed or not supported by this package manager.
+        """
+        return None
+
+    def prefetch(self, specs: t.List[sp.PackageSpecification]):
+        """
+        Download the payloads of packages without installing them,
+        so that installing them afterward needs no network.
+
+        Package managers unable to download ahead do nothing.
+
+        :param specs: the specifications of the packages.
+        """
+        pass
+
+    def archive(self, specs: t.List[sp.PackageSpecification], directory: str) -> bool:
+        """
+        Download the archives of packages into a directory to install them offline,
+        together with their dependencies missing on this machine.
+
+        :param specs: the specifications of the packages.
+        :param directory: the directory to download the archives into.
+        :return: whether the package manager supports archiving.
+        """
+        return False
+
+    def install_archives(self, directory: str):
+        """
+        Install all the package archives in a directory, downloaded by `archive`.
+
+        :param directory: the directory of the archives.
+        """
+        pass
@@ -1,4 +1,8 @@
 import dataclasses
+import glob
+import os
+import shlex
+import subprocess
 
 from dofu import shutils
 from dofu.package_manager import PackageManager
@@ -20,3 +24,44 @@ class AptPackageManager(PackageManager):
 
     def is_available(self) -> bool:
         return shutils.do_commands_exist("apt")
+
+    def prefetch(self, specs):
+        shutils.check_call(f"sudo apt-get install -y --download-only {_args(specs)}")
+
+    def archive(self, specs, directory):
+        # apt requires the partial directory to download into
+        os.makedirs(os.path.join(directory, "partial"), exist_ok=True)
+        shutils.check_call(
+            "sudo apt-get install -y --reinstall --download-only"
+            f" -o Dir::Cache::archives={shlex.quote(directory)} {_args(specs)}"
+        )
+        return True
+
+    def install_archives(self, directory):
+        archives = sorted(glob.glob(os.path.join(directory, "*.deb")))
+        if archives:
+            shutils.check_call(f"sudo apt-get install -y {shlex.join(archives)}")
+
+    def installed_version(self, spec):
+        try:
+            version = shutils.check_output_no_side_effect(
+                f"dpkg-query -W -f='${{Status}} ${{Version}}' {spec.package}",
+                stderr=subprocess.DEVNULL,
+                encoding="utf-8",
+            )
+        except subprocess.CalledProcessError:
+            return None
+
+        status, _, version = version.rpartition(" ")
+        return version if status.endswith("installed") and version else None
+
+
+def _args(specs) -> str:
+    return shlex.join(
+        (
+            spec.package
+            if not spec.version or spec.version == "latest"
+            else f"{spec.package}={spec.version}"
+        )
+        for spec in specs
+    )
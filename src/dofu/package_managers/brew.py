@@ -1,4 +1,5 @@
 import dataclasses
+import shlex
 
 from dofu import shutils
 from dofu.package_manager import PackageManager
@@ -26,3 +27,14 @@ class BrewPackageManager(PackageManager):
 
     def is_available(self) -> bool:
         return shutils.do_commands_exist("brew")
+
+    def prefetch(self, specs):
+        packages = [
+            (
+                spec.package
+                if not spec.version or spec.version == "latest"
+                else f"{spec.package}@{spec.version}"
+            )
+            for spec in specs
+        ]
+        shutils.check_call(f"brew fetch {shlex.join(packages)}")
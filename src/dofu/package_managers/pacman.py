@@ -1,4 +1,7 @@
 import dataclasses
+import glob
+import os
+import shlex
 
 from dofu import shutils
 from dofu.package_manager import PackageManager
@@ -17,3 +20,21 @@ class PacmanPackageManager(PackageManager):
 
     def is_available(self) -> bool:
         return shutils.do_commands_exist("pacman")
+
+    def prefetch(self, specs):
+        packages = [spec.package for spec in specs]
+        shutils.check_call(f"sudo pacman -Sw --noconfirm {shlex.join(packages)}")
+
+    def archive(self, specs, directory):
+        packages = [spec.package for spec in specs]
+        shutils.check_call(
+            f"sudo pacman -Sw --noconfirm --cachedir {shlex.quote(directory)}"
+            f" {shlex.join(packages)}"
+        )
+        return True
+
+    def install_archives(self, directory):
+        archives = sorted(glob.glob(os.path.join(directory, "*.pkg.tar.*")))
+        archives = [archive for archive in archives if not archive.endswith(".sig")]
+        if archives:
+            shutils.check_call(f"sudo pacman -U --noconfirm {shlex.join(archives)}")
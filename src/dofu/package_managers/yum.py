@@ -1,4 +1,8 @@
 import dataclasses
+import glob
+import os
+import shlex
+import subprocess
 
 from dofu import shutils
 from dofu.package_manager import PackageManager
@@ -23,3 +27,39 @@ class YumPackageManager(PackageManager):
 
     def is_available(self) -> bool:
         return shutils.do_commands_exist("yum")
+
+    def prefetch(self, specs):
+        shutils.check_call(f"sudo yum install -y --downloadonly {_args(specs)}")
+
+    def archive(self, specs, directory):
+        shutils.check_call(
+            "sudo yum install -y --downloadonly"
+            f" --downloaddir={shlex.quote(directory)} {_args(specs)}"
+        )
+        return True
+
+    def install_archives(self, directory):
+        archives = sorted(glob.glob(os.path.join(directory, "*.rpm")))
+        if archives:
+            shutils.check_call(f"sudo yum localinstall -y {shlex.join(archives)}")
+
+    def installed_version(self, spec):
+        try:
+            return shutils.check_output_no_side_effect(
+                f"rpm -q --qf '%{{VERSION}}-%{{RELEASE}}' {spec.package}",
+                stderr=subprocess.DEVNULL,
+                encoding="utf-8",
+            ).strip()
+        except subprocess.CalledProcessError:
+            return None
+
+
+def _args(specs) -> str:
+    return shlex.join(
+        (
+            spec.package
+            if not spec.version or spec.version == "latest"
+            else f"{spec.package}-{spec.version}"
+        )
+        for spec in specs
+    )
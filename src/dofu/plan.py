@@ -0,0 +1,244 @@
+import dataclasses
+import json
+import typing as t
+
+from rich.console import Console
+from rich.table import Table
+
+from dofu import equipment as eqp, lockfile as lf, module as m, sharing, timing, utils
+from dofu.timing import Action
+
+
+@dataclasses.dataclass
+class PlannedAction:
+    """
+    An action that a sync is going to take.
+    """
+
+    module_name: str
+    """
+    Name of the module the action belongs to.
+    """
+
+    action: Action
+    """
+    Kind of the action.
+    """
+
+    target: str
+    """
+    What the action is applied to,
+    such as a package specification, a repo url or a command line.
+    """
+
+    estimate: t.Optional[float] = None
+    """
+    Estimated wall time of the action in seconds, None if never recorded.
+    """
+
+    def to_dict(self):
+        return {
+            "module": self.module_name,
+            "action": self.action.value,
+            "target": self.target,
+            "estimate": self.estimate,
+        }
+
+
+@dataclasses.dataclass
+class Plan:
+    """
+    Execution plan of a sync.
+
+    The plan is resolved by comparing the recorded equipment state
+    with the blueprint, without changing anything.
+    Only the fingerprints and the pinned checkouts are probed,
+    to leave out what the sync is going to skip.
+    """
+
+    actions: t.List[PlannedAction] = dataclasses.field(default_factory=list)
+    """
+    List of the planned actions in executing order.
+    """
+
+    @staticmethod
+    def resolve_sync(
+        manager: eqp.ModuleEquipmentManager, module_names: t.List[str]
+    ) -> "Plan":
+        """
+        Resolve the plan of syncing the modules.
+
+        :param manager: the manager holding the recorded equipment state.
+        :param module_names: list of module names to sync.
+        :return: the resolved plan.
+        """
+        plan = Plan()
+        blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+        remove_blueprint = m.ModuleRegistrationManager.resolve_remove_blueprint(
+            set(manager.meta) - set(module.name() for module in blueprint)
+        )
+
+        for module in remove_blueprint:
+            meta = manager.meta.get(module.name())
+            if meta is not None:
+                plan._plan_remove(meta)
+
+        # the modules whose fingerprint is unchanged are skipped by the sync
+        unchanged = manager.unchanged_modules(blueprint)
+        for module in blueprint:
+            if module in unchanged:
+                continue
+
+            meta = manager.meta.get(module.name())
+            plan._plan_packages(module, meta)
+            plan._plan_gitrepos(module, meta)
+            plan._plan_commands(module, meta)
+
+        store = timing.TimingStore.instance()
+        for action in plan.actions:
+            action.estimate = store.estimate(
+                timing.action_key(action.action, action.target)
+            )
+
+        return plan
+
+    @property
+    def estimate(self) -> float:
+        """
+        Estimated wall time of the whole plan in seconds.
+
+        Actions that have never been recorded are not counted.
+        """
+        return sum(action.estimate or 0.0 for action in self.actions)
+
+    @property
+    def len_unestimated(self) -> int:
+        """
+        Number of actions that have never been recorded.
+        """
+        return sum(action.estimate is None for action in self.actions)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "actions": [action.to_dict() for action in self.actions],
+                "estimate": self.estimate,
+                "unestimated": self.len_unestimated,
+            },
+            indent=2,
+        )
+
+    def to_table(self) -> Table:
+        table = Table(title="Sync Plan")
+        table.add_column("Module")
+        table.add_column("Action")
+        table.add_column("Target", overflow="fold")
+        table.add_column("Estimate", justify="right")
+
+        for action in self.actions:
+            table.add_row(
+                action.module_name,
+                action.action.value,
+                action.target,
+                timing.repr_seconds(action.estimate),
+            )
+
+        table.caption = (
+            f"{len(self.actions)} actions, estimated {timing.repr_seconds(self.estimate)}"
+            + (f" + {self.len_unestimated} unknown" if self.len_unestimated else "")
+        )
+        return table
+
+    def print(self, fmt: t.Literal["table", "json"] = "table"):
+        if fmt == "json":
+            print(self.to_json())
+        else:
+            Console().print(self.to_table())
+
+    def _add(self, module_name: str, action: Action, target: str):
+        self.actions.append(PlannedAction(module_name, action, target))
+
+    def _plan_remove(self, meta: eqp.ModuleEquipmentMetaInfo):
+        for command in reversed(list(meta.commands())):
+            self._add(meta.module_name, Action.UNDO, command.cmdline())
+
+        for installation in reversed(meta.gitrepo_installations):
+            self._add(meta.module_name, Action.REMOVE, installation.requirement.url)
+
+        for installation in reversed(meta.package_installations):
+            if installation.manager is not None:
+                self._add(
+                    meta.module_name,
+                    Action.UNINSTALL,
+                    eqp.repr_pkg_requirement(installation.requirement),
+                )
+
+    def _plan_packages(
+        self, module: t.Type[m.Module], meta: t.Optional[eqp.ModuleEquipmentMetaInfo]
+    ):
+        installations = meta.package_installations if meta else []
+        requirements = module.package_requirements()
+
+        for installation in installations:
+            if installation.requirement not in requirements:
+                if not installation.used_existing and installation.manager:
+                    self._add(
+                        module.name(),
+                        Action.UNINSTALL,
+                        eqp.repr_pkg_requirement(installation.requirement),
+                    )
+
+        for requirement in requirements:
+            installation = utils.find(
+                installations,
+                pred=lambda x: x.requirement == requirement,
+                default=None,
+            )
+            if installation is None:
+                self._add(
+                    module.name(),
+                    Action.INSTALL,
+                    eqp.repr_pkg_requirement(requirement),
+                )
+
+    def _plan_gitrepos(
+        self, module: t.Type[m.Module], meta: t.Optional[eqp.ModuleEquipmentMetaInfo]
+    ):
+        installations = meta.gitrepo_installations if meta else []
+        requirements = module.gitrepo_requirements()
+
+        for installation in installations:
+            required = utils.find(
+                requirements,
+                value=installation.requirement,
+                key=lambda x: sharing.normalize_url(x.url),
+                default=None,
+            )
+            if required is None:
+                self._add(module.name(), Action.REMOVE, installation.requirement.url)
+            elif required.path != installation.requirement.path:
+                self._add(module.name(), Action.MOVE, installation.requirement.url)
+
+        for requirement in requirements:
+            installation = utils.find(
+                installations,
+                pred=lambda x: sharing.normalize_url(x.requirement.url)
+                == sharing.normalize_url(requirement.url),
+                default=None,
+            )
+            if installation is None:
+                self._add(module.name(), Action.CLONE, requirement.url)
+            elif not lf.pinned(requirement).is_pinned_checked_out():
+                self._add(module.name(), Action.FETCH, requirement.url)
+
+    def _plan_commands(
+        self, module: t.Type[m.Module], meta: t.Optional[eqp.ModuleEquipmentMetaInfo]
+    ):
+        installed = list(meta.commands()) if meta else []
+        withdrawn, fresh = eqp.diff_commands(installed, module.command_requirements())
+
+        for command in reversed(withdrawn):
+            self._add(module.name(), Action.UNDO, command.cmdline())
+
+        for command in fresh:
+            self._add(module.name(), Action.EXEC, command.cmdline())
@@ -0,0 +1,77 @@
+import concurrent.futures
+import logging
+import os
+import typing as t
+
+from dofu import lockfile as lf, mirrors, utils
+
+if t.TYPE_CHECKING:
+    from dofu import module as m
+
+_logger = logging.getLogger(__name__)
+
+
+def prefetch(
+    modules: t.List[t.Type["m.Module"]], *, max_workers: int = 8
+) -> t.Dict[str, str]:
+    """
+    Download the git repos and the package payloads of the modules concurrently,
+    without changing anything out of the cache.
+
+    Git repos are mirrored into the cache, and packages are downloaded
+    into the caches of their package managers in one batch per manager.
+    Repos whose pinned commit is checked out already and packages
+    whose commands exist already are skipped, as syncing them needs no network.
+    A failed download is only warned about,
+    leaving the requirement to be downloaded when it is synced.
+
+    :param modules: the modules going to be synced.
+    :param max_workers: maximum number of downloads running at the same time.
+    :return: paths of the updated mirrors keyed by repo url.
+    """
+    gitrepos = {}
+    batches = {}
+    for module in modules:
+        for git in map(lf.pinned, module.gitrepo_requirements()):
+            if not git.is_pinned_checked_out():
+                gitrepos.setdefault(git.url, git)
+
+        for pkg in map(lf.pinned, module.package_requirements()):
+            if pkg.is_satisfied():
+                continue
+            manager = pkg.available_manager()
+            if manager is not None:
+                batches.setdefault(type(manager), (manager, []))[1].append(pkg.spec)
+
+    if not gitrepos and not batches:
+        return {}
+
+    _logger.info(
+        f"Prefetching {len(gitrepos)} gitrepos"
+        f" and {sum(len(specs) for _, specs in batches.values())} packages"
+    )
+
+    updated = {}
+    with utils.ContextExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(mirrors.update_mirror, git.url, reference=git.path): url
+            for url, git in gitrepos.items()
+        }
+        futures.update(
+            {
+                executor.submit(manager.prefetch, specs): type(manager).__name__
+                for manager, specs in batches.values()
+            }
+        )
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                path = future.result()
+            except Exception as e:
+                _logger.warning(f"Failed to prefetch {futures[future]} - {e}")
+                continue
+
+            if futures[future] in gitrepos and os.path.isdir(path):
+                updated[futures[future]] = path
+
+    _logger.info(f"Prefetched {len(updated)} gitrepos")
+    return updated
@@ -7,6 +7,7 @@ import typing as t
 import autoserde
 
 from dofu import (
+    mirrors,
     package_manager as pm,
     platform as pf,
     shutils,
@@ -81,13 +82,17 @@ class GitRepoRequirement(Requirement):
         self.url = vc.normalize_repo_url(self.url)
 
     def install(self):
+        mirror = mirrors.local_url(self.url)
         vc.clone(
             *[f"--branch={branch}" for branch in opt(self.branch)],
             *[f"--depth={depth}" for depth in opt(self.depth)],
             *[f"--submodules={submodules}" for submodules in opt(self.submodule)],
-            repo=self.url,
+            repo=mirror or self.url,
             repo_path=self.path,
         )
+        if mirror is not None:
+            # track the upstream rather than the local mirror cloned from
+            vc.remote("set-url", "origin", self.url, repo_path=self.path)
         if self.commit_id is not None:
             vc.checkout(repo_path=self.path, revision=self.commit_id)
 
@@ -98,8 +103,21 @@ class GitRepoRequirement(Requirement):
         return False
 
     def update(self):
+        if self.is_pinned_checked_out():
+            # nothing to fetch as the pinned commit never moves
+            return
+
         branch = self.branch or vc.default_branch(self.path)
-        vc.fetch("origin", branch, repo_path=self.path)
+        mirror = mirrors.local_url(self.url)
+        if mirror is not None:
+            vc.fetch(
+                "--tags",
+                mirror,
+                "+refs/heads/*:refs/remotes/origin/*",
+                repo_path=self.path,
+            )
+        else:
+            vc.fetch("origin", branch, repo_path=self.path)
         vc.checkout(repo_path=self.path, revision=branch)
         if self.commit_id is not None:
             vc.checkout(repo_path=self.path, revision=self.commit_id)
@@ -112,6 +130,18 @@ class GitRepoRequirement(Requirement):
         # noinspection PyUnreachableCode
         return False
 
+    def is_pinned_checked_out(self) -> bool:
+        """
+        Check whether the repo is pinned to a commit id that is checked out already.
+        """
+        if self.commit_id is None or not os.path.isdir(self.path):
+            return False
+
+        with utils.supress(subprocess.CalledProcessError):
+            return vc.current_commit_id(self.path).startswith(self.commit_id)
+        # noinspection PyUnreachableCode
+        return False
+
 
 @dataclasses.dataclass
 class PackageRequirement(Requirement):
@@ -193,6 +223,48 @@ class PackageRequirement(Requirement):
     def is_satisfied(self):
         return shutils.do_commands_exist(self.command)
 
+    def candidate_managers(
+        self, platform: pf.Platform = None
+    ) -> t.Iterator[pm.PackageManager]:
+        """
+        Iterate over the package managers to install the tool on a platform,
+        in the order they are tried.
+
+        :param platform: the platform to install on, the current one if not given.
+        :return: generator of the package managers.
+        """
+        for candidate, pkg_managers in self._pkg_manager_candidates.items():
+            if candidate() if platform is None else candidate in (pf.ANY, platform):
+                if isinstance(pkg_managers, pm.PackageManager):
+                    pkg_managers = [pkg_managers]
+                yield from pkg_managers
+
+    def available_manager(self) -> t.Optional[pm.PackageManager]:
+        """
+        Get the first available package manager on the current platform,
+        which is the one most likely to install the tool.
+
+        :return: the package manager, or None if none is available.
+        """
+        for pkg_manager in self.candidate_managers():
+            if pkg_manager.is_available():
+                return pkg_manager
+        return None
+
+    def installed_version(self) -> t.Optional[str]:
+        """
+        Get the installed version of the tool.
+
+        :return: the version reported by the first available package manager
+            on the current platform that knows it, or None if none does.
+        """
+        for pkg_manager in self.candidate_managers():
+            if pkg_manager.is_available():
+                version = pkg_manager.installed_version(self.spec)
+                if version is not None:
+                    return version
+        return None
+
 
 def opt(obj, *, empty=None):
     if obj is not empty:
@@ -0,0 +1,204 @@
+import argparse
+import dataclasses
+import logging
+import os
+import typing as t
+
+import autoserde
+
+from dofu import equipment as eqp, requirement as req, undoable_command as uc
+from dofu.logging import init as init_logging
+from dofu.options import Options, Strategy
+
+_logger = logging.getLogger("dofu.runner")
+
+
+@dataclasses.dataclass(eq=False)
+class CompiledModule:
+    """
+    A module resolved ahead of time.
+
+    This class provides the same interface as the module classes,
+    so that it can be equipped in the same way as a registered module.
+    """
+
+    module_name: str
+    """
+    Name of the module.
+    """
+
+    commit_id: str
+    """
+    Hashcode of the last commit where the module was changed.
+    """
+
+    requires: t.List[str]
+    """
+    Names of the modules that this module depends on.
+    """
+
+    packages: t.List[req.PackageRequirement]
+    """
+    List of required packages.
+    """
+
+    gitrepos: t.List[req.GitRepoRequirement]
+    """
+    List of required git repos.
+    """
+
+    commands: t.List[uc.UndoableCommand]
+    """
+    List of required undoable commands in executing order.
+    """
+
+    def name(self):
+        return self.module_name
+
+    def package_requirements(self):
+        return list(self.packages)
+
+    def gitrepo_requirements(self):
+        return list(self.gitrepos)
+
+    def command_requirements(self):
+        return list(self.commands)
+
+    def last_commit_id(self):
+        return self.commit_id
+
+
+@dataclasses.dataclass
+class CompiledPlan:
+    """
+    A blueprint resolved ahead of time.
+
+    The compiled plan is self-contained, so that applying it requires neither
+    importing the modules nor resolving the blueprint from the module registry.
+    """
+
+    modules: t.List[CompiledModule] = dataclasses.field(default_factory=list)
+    """
+    List of the compiled modules sorted topologically.
+    """
+
+    @staticmethod
+    def compile(module_names: t.List[str]) -> "CompiledPlan":
+        """
+        Compile the blueprint of equipping the modules.
+
+        :param module_names: list of module names.
+        :return: the compiled plan.
+        """
+        # only compiling requires the registered modules
+        from dofu import modules  # noqa: F401 - register all the modules
+        from dofu.module import ModuleRegistrationManager as registry
+
+        blueprint = registry.resolve_equip_blueprint(module_names)
+        dependencies = registry.resolve_dependencies(blueprint)
+
+        return CompiledPlan(
+            modules=[
+                CompiledModule(
+                    module_name=module.name(),
+                    commit_id=module.last_commit_id(),
+                    requires=[dep.name() for dep in dependencies[module]],
+                    packages=module.package_requirements(),
+                    gitrepos=module.gitrepo_requirements(),
+                    commands=module.command_requirements(),
+                )
+                for module in blueprint
+            ]
+        )
+
+    @staticmethod
+    def load(path: os.PathLike) -> "CompiledPlan":
+        """
+        Load a compiled plan from a file.
+        """
+        options = autoserde.Options(recursively=True, strict=True)
+        return autoserde.AutoSerde.deserialize(
+            path, cls=CompiledPlan, options=options, fmt="yaml"
+        )
+
+    def save(self, path: os.PathLike):
+        """
+        Save the compiled plan to a file.
+        """
+        options = autoserde.Options(recursively=True, strict=True, with_cls=True)
+        autoserde.AutoSerde.serialize(
+            self, path, options=options, fmt="yaml", sort_keys=False
+        )
+
+    def dependencies(self) -> t.Dict[CompiledModule, t.List[CompiledModule]]:
+        """
+        Get the mapping from each module to the modules it depends on.
+        """
+        by_name = {module.name(): module for module in self.modules}
+        return {
+            module: [by_name[name] for name in module.requires if name in by_name]
+            for module in self.modules
+        }
+
+    def apply(self, manager: eqp.ModuleEquipmentManager):
+        """
+        Equip all the compiled modules.
+
+        :param manager: the manager to record the equipment with.
+        """
+        manager.equip_resolved(self.modules, self.dependencies())
+
+
+def main(argv: t.List[str] = None):
+    """
+    Apply a plan compiled by `dofu compile`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="dofu-run", description="Apply a plan compiled by `dofu compile`."
+    )
+    parser.add_argument("plan", help="Path to the compiled plan.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Dry run mode without changing anything.",
+    )
+    parser.add_argument(
+        "--strategy",
+        choices=["ask", "force", "auto", "quit"],
+        default="ask",
+        help="The strategy to use when meeting a destructive command.",
+    )
+    parser.add_argument(
+        "--loglevel",
+        choices=["debug", "info", "warn", "error", "fatal"],
+        default=None,
+        help="The log level.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="The maximum number of modules to equip concurrently.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Sync every module even if nothing seems changed.",
+    )
+    args = parser.parse_args(argv)
+
+    init_logging(loglevel=args.loglevel)
+
+    options = Options.instance()
+    options.dry_run = args.dry_run
+    options.strategy = Strategy.from_name(args.strategy)
+    options.jobs = args.jobs
+    options.refresh = args.refresh
+
+    plan = CompiledPlan.load(args.plan)
+    _logger.info(f"Applying {len(plan.modules)} compiled modules from {args.plan}")
+    plan.apply(eqp.ModuleEquipmentManager.load())
+
+
+if __name__ == "__main__":
+    main()
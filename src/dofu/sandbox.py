@@ -0,0 +1,218 @@
+import dataclasses
+import logging
+import os
+import subprocess
+import tempfile
+import typing as t
+
+from dofu import client, env, module as m, platform, undoable_command as uc, utils
+from dofu.target import Target
+
+_logger = logging.getLogger(__name__)
+
+_excluded_names = (".cache",)
+"""
+Names of the dotfiles in the user home that are not copied into a sandbox,
+since they are large and rebuilt on demand.
+"""
+
+
+@dataclasses.dataclass
+class Sandbox:
+    """
+    Disposable copy of the user home to try modules in.
+
+    The dotfiles of the user home are copied with reflinks where the filesystem
+    supports copy-on-write, so that creating a sandbox is cheap.
+    Elsewhere, like on ext4, only the dotfiles touched by the modules to try
+    are copied, since copying all of them in full could take long and fill the disk.
+    Processes run in the sandbox see it as their home and cache root,
+    and never forward their commands to the daemon serving the real home.
+    Discarding a sandbox renames it away at once and deletes it in the background.
+    """
+
+    path: str
+    """
+    Path to the sandbox.
+    """
+
+    @property
+    def home(self) -> os.PathLike:
+        """
+        Path to the home in the sandbox.
+        """
+        return os.path.join(self.path, "home")
+
+    @property
+    def cache_root(self) -> os.PathLike:
+        """
+        Path to the cache root in the sandbox.
+        """
+        return os.path.join(self.path, "cache")
+
+    @staticmethod
+    def create(touched: t.Iterable[os.PathLike] = None) -> "Sandbox":
+        """
+        Create a sandbox with the dotfiles of the user home.
+
+        :param touched: the paths touched by the modules to try, if known,
+            to copy only their dotfiles if the filesystem has no reflinks.
+        :return: the created sandbox.
+        """
+        root = env.sandboxes_root()
+        sandbox = Sandbox(path=tempfile.mkdtemp(prefix="sandbox-", dir=root))
+        os.makedirs(sandbox.home)
+        os.makedirs(sandbox.cache_root)
+
+        home = env.user_home()
+        srcs = []
+        for name in sorted(os.listdir(home)):
+            src = os.path.join(home, name)
+            if not name.startswith(".") or name in _excluded_names:
+                continue
+
+            # never copy the sandboxes into themselves
+            if not os.path.islink(src) and utils.is_subpath(root, src):
+                _logger.debug(f"Skip copying {src} holding the sandboxes")
+                continue
+
+            srcs.append(src)
+
+        if srcs and not _copies_with_reflinks(srcs, sandbox.path):
+            if touched is None:
+                _logger.warning(
+                    "The filesystem cannot copy with reflinks,"
+                    " copying all the dotfiles in full might take long"
+                )
+            else:
+                touched = [os.path.abspath(path) for path in touched]
+                srcs = [
+                    src
+                    for src in srcs
+                    if any(utils.is_subpath(path, src) for path in touched)
+                ]
+                _logger.warning(
+                    "The filesystem cannot copy with reflinks,"
+                    f" copying only the {len(srcs)} dotfiles touched by the modules"
+                )
+
+        if srcs:
+            ret = subprocess.run(
+                [*_copy_command(), *srcs, sandbox.home],
+                stderr=subprocess.PIPE,
+                encoding="utf-8",
+            )
+            if ret.returncode != 0:
+                _logger.warning(f"Some dotfiles are not copied - {ret.stderr.strip()}")
+
+        _logger.info(f"Created sandbox {sandbox.path} with {len(srcs)} dotfiles")
+        return sandbox
+
+    def environ(self) -> t.Dict[str, str]:
+        """
+        Get the environment variables of the processes run in the sandbox.
+        """
+        environ = Target(home=self.home, cache_root=self.cache_root).environ()
+        # the daemon would run the commands in the real home
+        environ[client.NO_DAEMON_ENV_VAR] = "1"
+        return environ
+
+    def run(self, args: t.List[str]) -> int:
+        """
+        Run a process in the sandbox and wait for it.
+
+        :param args: the program and its arguments.
+        :return: the exit code of the process.
+        """
+        return subprocess.call(args, env=self.environ(), cwd=self.home)
+
+    def discard(self):
+        """
+        Discard the sandbox in constant time.
+
+        The sandbox is renamed to a trash path at once,
+        which is then deleted by a detached process.
+        """
+        trash = os.path.join(
+            os.path.dirname(self.path), f".trash-{os.path.basename(self.path)}"
+        )
+        os.rename(self.path, trash)
+        subprocess.Popen(
+            ["rm", "-rf", trash],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        _logger.info(f"Discarded sandbox {self.path}")
+
+
+def touched_paths(module_names: t.List[str]) -> t.List[str]:
+    """
+    Get the paths touched by the commands of the modules and their dependencies.
+
+    :param module_names: the names of the modules.
+    :return: list of the absolute paths.
+    """
+    blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+    return [
+        path
+        for module in blueprint
+        for command in module.command_requirements()
+        for path in (*command.managed_paths(), *uc.spec_paths(command))
+    ]
+
+
+def _copies_with_reflinks(srcs: t.List[str], directory: str) -> bool:
+    """
+    Check whether the files are copied into a directory with reflinks,
+    by cloning the first regular file found among them.
+    """
+    file = next(_regular_files(srcs), None)
+    if file is None:
+        # nothing to copy in full
+        return True
+
+    probe = os.path.join(directory, ".reflink-probe")
+    ret = subprocess.run(
+        [*_clone_command(), file, probe],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if os.path.lexists(probe):
+        os.unlink(probe)
+    return ret.returncode == 0
+
+
+def _regular_files(srcs: t.List[str]) -> t.Iterator[str]:
+    """
+    Iterate over the regular files among the paths and under the directories.
+    """
+    for src in srcs:
+        if os.path.islink(src):
+            continue
+        if os.path.isfile(src):
+            yield src
+        for root, _, names in os.walk(src):
+            for name in names:
+                file = os.path.join(root, name)
+                if os.path.isfile(file) and not os.path.islink(file):
+                    yield file
+
+
+def _clone_command() -> t.List[str]:
+    """
+    Get the command copying a file only if it can be copied with a reflink.
+    """
+    if platform.MACOS():
+        return ["cp", "-c"]
+    return ["cp", "--reflink=always"]
+
+
+def _copy_command() -> t.List[str]:
+    """
+    Get the command copying files with reflinks if possible.
+    """
+    if platform.MACOS():
+        # clone the files on APFS
+        return ["cp", "-cRp"]
+    return ["cp", "-a", "--reflink=auto"]
@@ -0,0 +1,190 @@
+import concurrent.futures
+import heapq
+import logging
+import typing as t
+
+from dofu import utils
+
+_logger = logging.getLogger(__name__)
+
+Node = t.TypeVar("Node", bound=t.Hashable)
+
+
+class DagScheduler(t.Generic[Node]):
+    """
+    Scheduler running the nodes of a dependency graph with a bounded worker pool.
+
+    Each node is started as soon as all of its dependencies have been done,
+    so that independent nodes run concurrently in dependency waves.
+    Whenever several nodes are ready, the one coming first in the given
+    dependency mapping is started first.
+    Hence, running with a single job follows exactly the order of the mapping
+    if the mapping is sorted topologically.
+
+    If the costs of the nodes are given and more than one job is allowed,
+    the ready node on the longest remaining path is started first instead,
+    so that the expensive chains do not end up running alone at last.
+    """
+
+    def __init__(
+        self,
+        dependencies: t.Mapping[Node, t.Iterable[Node]],
+        *,
+        jobs=1,
+        costs: t.Mapping[Node, float] = None,
+    ):
+        """
+        :param dependencies: mapping from each node to the nodes it depends on.
+            Dependencies which are not nodes of the mapping are ignored.
+        :param jobs: maximum number of nodes to run concurrently.
+        :param costs: mapping from each node to its estimated cost in seconds.
+            Nodes missing from the mapping cost nothing.
+        """
+        self.dependencies = {
+            node: set(deps).intersection(dependencies)
+            for node, deps in dependencies.items()
+        }
+        self.jobs = max(1, jobs or 1)
+        self.costs = {
+            node: (costs or {}).get(node) or 0.0 for node in self.dependencies
+        }
+        self._paths: t.Optional[t.Dict[Node, float]] = None
+
+    def critical_paths(self) -> t.Dict[Node, float]:
+        """
+        Compute the cost of the longest path starting from each node.
+
+        The path goes from a node through the nodes depending on it,
+        so it is the least time to finish everything after the node is started.
+
+        :return: mapping from each node to the cost of its longest path.
+        """
+        if self._paths is not None:
+            return self._paths
+
+        dependents: t.Dict[Node, t.List[Node]] = {node: [] for node in self.costs}
+        for node, deps in self.dependencies.items():
+            for dep in deps:
+                dependents[dep].append(node)
+
+        paths: t.Dict[Node, float] = {}
+
+        def longest(node):
+            # iterate instead of recursion to support deep graphs
+            stack = [node]
+            while stack:
+                top = stack[-1]
+                todo = [dep for dep in dependents[top] if dep not in paths]
+                if todo:
+                    stack.extend(todo)
+                    continue
+
+                stack.pop()
+                paths[top] = self.costs[top] + max(
+                    (paths[dep] for dep in dependents[top]), default=0.0
+                )
+
+        for node in self.costs:
+            if node not in paths:
+                longest(node)
+
+        self._paths = paths
+        return paths
+
+    def estimate(self, nodes: t.Iterable[Node] = None) -> float:
+        """
+        Estimate the time to run the nodes with the allowed jobs.
+
+        It is bounded below by both the longest path among the nodes,
+        and the total cost spread over all the jobs.
+
+        :param nodes: the nodes to estimate, all the nodes by default.
+        :return: the estimated time in seconds.
+        """
+        nodes = list(self.costs if nodes is None else nodes)
+        paths = self.critical_paths()
+        return max(
+            max((paths[node] for node in nodes), default=0.0),
+            sum(self.costs[node] for node in nodes) / self.jobs,
+        )
+
+    def run(
+        self,
+        fn: t.Callable[[Node], t.Any],
+        *,
+        on_progress: t.Callable[[int, int, float], t.Any] = None,
+    ):
+        """
+        Run all the nodes.
+
+        Once a node fails, no more node will be started.
+        The nodes that are running will be waited,
+        and then the first error will be raised.
+
+        :param fn: function to run each node with.
+        :param on_progress: function called whenever a node is done,
+            with the number of done nodes, the number of all the nodes,
+            and the estimated time in seconds to run the remaining nodes.
+        """
+        if self.jobs > 1 and any(self.costs.values()):
+            paths = self.critical_paths()
+            order = {
+                node: (-paths[node], i) for i, node in enumerate(self.dependencies)
+            }
+        else:
+            order = {node: (0.0, i) for i, node in enumerate(self.dependencies)}
+
+        pending = {node: set(deps) for node, deps in self.dependencies.items()}
+        dependents: t.Dict[Node, t.List[Node]] = {node: [] for node in pending}
+        for node, deps in pending.items():
+            for dep in deps:
+                dependents[dep].append(node)
+
+        ready = [(order[node], node) for node, deps in pending.items() if not deps]
+        heapq.heapify(ready)
+        remaining = set(pending)
+
+        def release(done_node):
+            for dependent in dependents[done_node]:
+                pending[dependent].discard(done_node)
+                if not pending[dependent]:
+                    heapq.heappush(ready, (order[dependent], dependent))
+
+            remaining.discard(done_node)
+            if on_progress is not None:
+                done = len(pending) - len(remaining)
+                on_progress(done, len(pending), self.estimate(remaining))
+
+        if self.jobs == 1:
+            # run in the current thread so that prompts behave as usual
+            while ready:
+                _, node = heapq.heappop(ready)
+                fn(node)
+                release(node)
+            return
+
+        error = None
+        with utils.ContextExecutor(max_workers=self.jobs) as executor:
+            running: t.Dict[concurrent.futures.Future, Node] = {}
+            while ready or running:
+                while ready and error is None and len(running) < self.jobs:
+                    _, node = heapq.heappop(ready)
+                    running[executor.submit(fn, node)] = node
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    node = running.pop(future)
+                    if future.exception() is not None:
+                        _logger.debug(f"Stop scheduling as {node} failed")
+                        error = error or future.exception()
+                        continue
+
+                    release(node)
+
+        if error is not None:
+            raise error
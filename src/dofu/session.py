@@ -0,0 +1,166 @@
+import contextlib
+import dataclasses
+import threading
+import typing as t
+
+from dofu import modules  # noqa: F401 - register all the modules
+from dofu import module as m
+from dofu.equipment import ModuleEquipmentManager
+from dofu.options import Options
+from dofu.plan import Plan
+
+
+class Session:
+    """
+    Long-lived entry point for using dofu as a library.
+
+    A session keeps the equipment state loaded, together with the last commit ids
+    of the modules and the resolved plans, so that repeated calls skip loading
+    the persistence files and running git again.
+    Every call runs with the options of the session,
+    which never leak into other sessions running in the same process.
+
+    The caches are invalidated precisely by the operations of the session:
+    equipping, removing or syncing drops the resolved plans,
+    and also the loaded state in dry run mode, where the state is only simulated.
+    Changes made outside the session, like new commits to the project
+    or another dofu process, are picked up after calling `refresh`.
+    Mutating operations of a session are serialized,
+    while planning and verifying may run concurrently with them.
+    """
+
+    def __init__(self, **options):
+        """
+        :param options: the options of the session, see `Options`.
+            Unspecified options are copied from the current ones.
+        """
+        self.options = dataclasses.replace(
+            Options.instance(),
+            **{"decisions": dict(Options.instance().decisions), **options},
+        )
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._manager: t.Optional[ModuleEquipmentManager] = None
+        self._commit_ids: t.Dict[str, str] = {}
+        self._plans: t.Dict[t.Tuple[str, ...], Plan] = {}
+        # bumped when a mutation starts and ends, so that it is odd meanwhile
+        self._generation = 0
+
+    @property
+    def manager(self) -> ModuleEquipmentManager:
+        """
+        The loaded equipment state, loaded on first use.
+        """
+        with self._load_lock:
+            if self._manager is None:
+                self._manager = ModuleEquipmentManager.reload()
+            return self._manager
+
+    def refresh(self):
+        """
+        Drop all the caches, so that changes made outside the session are seen.
+        """
+        with self._lock, self._load_lock:
+            self._manager = None
+            self._commit_ids.clear()
+            self._plans.clear()
+
+    def equipped_module_names(self) -> t.List[str]:
+        """
+        Get the names of the equipped modules.
+        """
+        return self.manager.equipped_module_names()
+
+    def plan(self, module_names: t.Iterable[str] = None) -> Plan:
+        """
+        Resolve the plan of syncing the modules.
+
+        :param module_names: names of the modules to sync, the equipped ones by default.
+        :return: the resolved plan.
+        """
+        with self._scope():
+            manager = self.manager
+            if module_names is None:
+                module_names = manager.equipped_module_names()
+
+            key = tuple(sorted(module_names))
+            plan = self._plans.get(key)
+            if plan is None:
+                generation = self._generation
+                plan = Plan.resolve_sync(manager, list(key))
+                # never cache a plan that a mutation may have outdated
+                if generation == self._generation and generation % 2 == 0:
+                    self._plans[key] = plan
+            return plan
+
+    def equip(self, module_names: t.Iterable[str]):
+        """
+        Equip the modules and their dependencies.
+
+        :param module_names: names of the modules.
+        """
+        self._mutate(ModuleEquipmentManager.equip, list(module_names))
+
+    def remove(self, module_names: t.Iterable[str]):
+        """
+        Remove the modules and their dependents.
+
+        :param module_names: names of the modules.
+        """
+        self._mutate(ModuleEquipmentManager.remove, list(module_names))
+
+    def sync(self, module_names: t.Iterable[str]):
+        """
+        Equip the modules and remove the ones not required any more.
+
+        :param module_names: names of the modules.
+        """
+        self._mutate(ModuleEquipmentManager.sync, list(module_names))
+
+    def verify(
+        self, module_names: t.Iterable[str] = None
+    ) -> t.Dict[str, t.List[t.Tuple[str, str]]]:
+        """
+        Check the paths managed by the modules for drift.
+
+        :param module_names: names of the modules, all the equipped ones by default.
+        :return: mapping from the module names to their drifted paths and reasons.
+        """
+        with self._scope():
+            return self.manager.states.verify(module_names)
+
+    @contextlib.contextmanager
+    def _scope(self):
+        """
+        Run with the options and the caches of the session.
+        """
+        changes = {
+            field.name: getattr(self.options, field.name)
+            for field in dataclasses.fields(Options)
+        }
+        changes["decisions"] = dict(self.options.decisions)
+        with Options.scoped(**changes), m.cached_commit_ids(self._commit_ids):
+            yield
+
+    def _mutate(
+        self,
+        operation: t.Callable[[ModuleEquipmentManager, t.List[str]], None],
+        module_names: t.List[str],
+    ):
+        """
+        Run an operation changing the equipment state and invalidate the caches.
+        """
+        with self._lock, self._scope():
+            self._generation += 1
+            try:
+                operation(self.manager, module_names)
+
+            finally:
+                self._generation += 1
+                self._plans.clear()
+                if self.options.dry_run:
+                    # the loaded state has been changed by the simulation
+                    self._manager = None
+                else:
+                    # the state cached for the process is stale now
+                    ModuleEquipmentManager.load.cache_clear()
@@ -0,0 +1,239 @@
+import collections
+import json
+import os
+import re
+import threading
+import typing as t
+import urllib.parse
+
+from dofu import package_manager as pm, requirement as req
+
+if t.TYPE_CHECKING:
+    from dofu import equipment as eqp
+
+Key = t.Tuple
+
+HANDOVER_ENV_VAR = "DOFU_HANDED_OVER_PACKAGES"
+"""
+Environment variable listing the packages installed by a parent dofu process
+for a child to take over, as encoded by `encode_handover`.
+"""
+
+_SCP_LIKE = re.compile(r"(?:[\w.-]+@)?(?P<host>[\w.-]+):(?P<path>[^/].*)")
+"""
+Scp-like git url, such as "git@github.com:user/repo".
+"""
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a git repo url, so that all the spellings of one repo are equal.
+
+    Remote urls, either scp-like or with a scheme like https or ssh,
+    are turned into "https://<host>/<path>" with the host lowercased.
+    The ".git" suffix and the trailing slashes are stripped from any url,
+    including local paths.
+
+    :param url: the git repo url.
+    :return: the normalized url.
+    """
+    url = url.strip()
+
+    scp = _SCP_LIKE.fullmatch(url) if "://" not in url else None
+    if scp is not None:
+        url = f"https://{scp['host']}/{scp['path']}"
+
+    parsed = urllib.parse.urlsplit(url)
+    path = parsed.path if parsed.scheme else url
+    path = path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[: -len(".git")].rstrip("/")
+
+    if parsed.scheme in ("http", "https", "ssh", "git") and parsed.hostname:
+        port = (
+            f":{parsed.port}"
+            if parsed.port and parsed.scheme in ("http", "https")
+            else ""
+        )
+        return f"https://{parsed.hostname.lower()}{port}{path}"
+    if parsed.scheme:
+        return urllib.parse.urlunsplit(parsed._replace(path=path))
+    return path
+
+
+def requirement_key(requirement: req.Requirement) -> Key:
+    """
+    Make the key identifying a requirement shared across modules.
+
+    Packages are identified by their kind and specification,
+    and git repos are identified by their normalized url and local path,
+    so that the different spellings of a repo url share one checkout.
+
+    :param requirement: the package or git repo requirement.
+    :return: the key of the requirement.
+    """
+    if isinstance(requirement, req.GitRepoRequirement):
+        return (
+            "gitrepo",
+            normalize_url(requirement.url),
+            os.path.abspath(requirement.path),
+        )
+
+    return (
+        "package",
+        type(requirement).__qualname__,
+        requirement.spec.package,
+        requirement.spec.version,
+    )
+
+
+def encode_handover(managers: t.Dict[Key, pm.PackageManager]) -> str:
+    """
+    Encode the packages installed by this process for a child to take over.
+
+    :param managers: the package managers used, keyed by the requirement keys.
+    :return: the value of `HANDOVER_ENV_VAR`.
+    """
+    return json.dumps(
+        [[list(key), type(manager).__name__] for key, manager in managers.items()]
+    )
+
+
+def decode_handover(value: t.Optional[str]) -> t.Dict[Key, str]:
+    """
+    Decode the packages handed over by the parent process.
+
+    :param value: the value of `HANDOVER_ENV_VAR`, if any.
+    :return: the type names of the package managers used, keyed by the requirement keys.
+    """
+    return {tuple(key): manager for key, manager in json.loads(value or "[]")}
+
+
+class SharedRequirementTable:
+    """
+    Table of the requirements shared across the equipped modules.
+
+    Each module still records the installations of its own requirements.
+    This table looks through the records of all modules, so that:
+    - each requirement is probed once per run, however many modules require it;
+    - each requirement is synced by one module at a time;
+    - each requirement is removed only when no other module holds it,
+      otherwise the ownership is transferred to another holder;
+    - each package installed by the parent process for several targets
+      is owned by the one target it is handed over to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: t.Dict[Key, threading.RLock] = collections.defaultdict(
+            threading.RLock
+        )
+        self._satisfied: t.Dict[Key, bool] = {}
+        self._updated: t.Set[Key] = set()
+        self._handed_over: t.Dict[Key, str] = {}
+
+    def reset(self):
+        """
+        Forget all the probes and updates, which is called at the start of a run.
+        """
+        with self._lock:
+            self._satisfied.clear()
+            self._updated.clear()
+            self._handed_over = decode_handover(os.environ.get(HANDOVER_ENV_VAR))
+
+    def lock(self, requirement: req.Requirement) -> threading.RLock:
+        """
+        Get the lock to hold while syncing a requirement.
+
+        :param requirement: the package or git repo requirement.
+        :return: the lock of the requirement.
+        """
+        with self._lock:
+            return self._key_locks[requirement_key(requirement)]
+
+    def is_satisfied(self, requirement: req.Requirement) -> bool:
+        """
+        Probe whether a requirement is satisfied, at most once per run.
+
+        :param requirement: the package or git repo requirement.
+        :return: whether the requirement is satisfied.
+        """
+        key = requirement_key(requirement)
+        with self._lock:
+            if key in self._satisfied:
+                return self._satisfied[key]
+
+        satisfied = bool(requirement.is_satisfied())
+        with self._lock:
+            return self._satisfied.setdefault(key, satisfied)
+
+    def mark_satisfied(self, requirement: req.Requirement, satisfied: bool):
+        """
+        Record the state of a requirement that has just been installed or removed.
+
+        :param requirement: the package or git repo requirement.
+        :param satisfied: whether the requirement is satisfied now.
+        """
+        with self._lock:
+            self._satisfied[requirement_key(requirement)] = satisfied
+
+    def mark_updated(self, requirement: req.Requirement) -> bool:
+        """
+        Record that a requirement is updated in this run.
+
+        :param requirement: the package or git repo requirement.
+        :return: False if the requirement has already been updated in this run.
+        """
+        key = requirement_key(requirement)
+        with self._lock:
+            if key in self._updated:
+                return False
+            self._updated.add(key)
+            return True
+
+    def take_over(
+        self, requirement: req.PackageRequirement
+    ) -> t.Optional[pm.PackageManager]:
+        """
+        Take over a package installed by the parent process, at most once per run.
+
+        :param requirement: the package requirement found satisfied.
+        :return: the package manager installed the package,
+            or None if the package is not handed over.
+        """
+        with self._lock:
+            name = self._handed_over.pop(requirement_key(requirement), None)
+        if name is None:
+            return None
+
+        for manager in requirement.candidate_managers():
+            if type(manager).__name__ == name:
+                return manager
+        return None
+
+    @staticmethod
+    def holders(
+        metas: t.Iterable["eqp.ModuleEquipmentMetaInfo"],
+        requirement: req.Requirement,
+        *,
+        excluded: "eqp.ModuleEquipmentMetaInfo",
+    ) -> t.List[t.Tuple["eqp.ModuleEquipmentMetaInfo", t.Any]]:
+        """
+        Find the other modules holding an installation of a requirement.
+
+        :param metas: equipment meta info of all the modules.
+        :param requirement: the package or git repo requirement.
+        :param excluded: the module to exclude, usually the one releasing it.
+        :return: list of the holding modules and their installations.
+        """
+        key = requirement_key(requirement)
+        return [
+            (meta, installation)
+            for meta in list(metas)
+            if meta is not excluded and meta.module_name != excluded.module_name
+            for installation in (
+                *meta.package_installations,
+                *meta.gitrepo_installations,
+            )
+            if requirement_key(installation.requirement) == key
+        ]
@@ -10,6 +10,8 @@ import shutil
 import subprocess
 import typing as t
 
+import yaml
+
 from dofu import gum
 from dofu.options import Options, Strategy
 
@@ -299,7 +301,8 @@ class Ensure(abc.ABC):
         return self.ensure()
 
     def ensure(self):
-        strategy = Options.instance().strategy
+        options = Options.instance()
+        strategy = options.decisions.get(self.decision_key(), options.strategy)
         while strategy is not None and not self.condition():
             if Options.instance().dry_run:
                 return
@@ -309,6 +312,13 @@ class Ensure(abc.ABC):
     def condition(self) -> bool:
         pass
 
+    @abc.abstractmethod
+    def decision_key(self) -> str:
+        """
+        Key of the decided strategy in `Options.decisions`.
+        """
+        pass
+
     def interactive(self) -> t.Optional[Strategy]:
         strategy = gum.choose(
             "TRY-AGAIN",
@@ -371,8 +381,14 @@ class EnsurePathExists(Ensure):
     """
 
     def condition(self) -> bool:
+        # a dangling link still exists to be deleted
+        if self.to_del:
+            return os.path.lexists(self.path)
         return os.path.exists(self.path)
 
+    def decision_key(self) -> str:
+        return os.path.abspath(self.path)
+
     def overwrite(self):
         return self.non_intrusive()
 
@@ -396,6 +412,9 @@ class EnsurePathNotExists(Ensure):
     def condition(self) -> bool:
         return not os.path.exists(self.path)
 
+    def decision_key(self) -> str:
+        return os.path.abspath(self.path)
+
     def overwrite(self):
         if os.path.islink(self.path) or os.path.isfile(self.path):
             os.remove(self.path)
@@ -409,6 +428,67 @@ class EnsurePathNotExists(Ensure):
         return f"{self.path} already exists"
 
 
+def decide(conflicts: t.List[Ensure]) -> t.Dict[str, Strategy]:
+    """
+    Decide how to resolve the conflicts in a single batch prompt.
+
+    The chosen conflicts are resolved by overwriting,
+    and the others are resolved non-intrusively, such as by backing up.
+
+    :param conflicts: the failing checks of the conflicts.
+    :return: mapping from the decision keys to the decided strategies.
+    """
+    messages = {ensure.failure_message(): ensure for ensure in conflicts}
+    chosen = gum.choose(
+        *messages,
+        header="Choose the conflicts to overwrite, the others will be backed up",
+        no_limit=True,
+    )
+    chosen = set(filter(None, chosen.strip().split("\n")))
+
+    return {
+        ensure.decision_key(): Strategy.FORCE if message in chosen else Strategy.AUTO
+        for message, ensure in messages.items()
+    }
+
+
+def load_decisions(path: os.PathLike) -> t.Dict[str, Strategy]:
+    """
+    Load the decisions of the conflicts from a yaml file.
+
+    The file maps the conflicting paths to the strategy names,
+    like "/home/me/.zshrc: auto".
+
+    :param path: path to the decisions file.
+    :return: mapping from the absolute paths to the decided strategies.
+    """
+    with open(path, "r") as file:
+        decisions = yaml.safe_load(file) or {}
+
+    return {
+        os.path.abspath(os.path.expanduser(conflict)): Strategy.from_name(name)
+        for conflict, name in decisions.items()
+    }
+
+
+def save_decisions(path: os.PathLike, decisions: t.Dict[str, Strategy]):
+    """
+    Save the decisions of the conflicts into a yaml file.
+
+    :param path: path to the decisions file.
+    :param decisions: mapping from the absolute paths to the decided strategies.
+    """
+    with open(path, "w") as file:
+        yaml.safe_dump(
+            {
+                conflict: strategy.name.lower()
+                for conflict, strategy in decisions.items()
+            },
+            file,
+            sort_keys=False,
+        )
+
+
 def ensure_path_exists(
     action: str, path: str, is_dir: bool = None, to_del: bool = False
 ):
@@ -0,0 +1,212 @@
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import subprocess
+import sys
+import typing as t
+
+from dofu import env, module as m, package_manager as pm, sharing, utils
+from dofu.options import Options, Strategy
+
+_logger = logging.getLogger(__name__)
+
+_redirected_env_vars = (
+    "XDG_CONFIG_HOME",
+    "XDG_DATA_HOME",
+    "XDG_STATE_HOME",
+    "XDG_CACHE_HOME",
+    "ZDOTDIR",
+)
+"""
+Environment variables pointing into the user home,
+which are redirected into the home of a target.
+"""
+
+
+@dataclasses.dataclass
+class Target:
+    """
+    A home to equip modules into, together with its own cache root.
+
+    Each target keeps its own equipment persistence file under its cache root,
+    so that the modules are equipped into the targets independently.
+    Processes run for a target see its home as their home.
+    """
+
+    home: str
+    """
+    Path to the home of the target.
+    """
+
+    cache_root: str = None
+    """
+    Path to the cache root of the target, `<home>/.cache/dofu` by default.
+    """
+
+    def __post_init__(self):
+        self.home = os.path.abspath(os.path.expanduser(self.home))
+        if self.cache_root is None:
+            self.cache_root = os.path.join(self.home, ".cache", "dofu")
+        self.cache_root = os.path.abspath(os.path.expanduser(self.cache_root))
+
+    @staticmethod
+    def parse(spec: str) -> "Target":
+        """
+        Parse a target from its specification.
+
+        :param spec: the specification like "HOME" or "HOME:CACHE_ROOT".
+        :return: the target.
+        """
+        home, _, cache_root = spec.partition(":")
+        return Target(home=home, cache_root=cache_root or None)
+
+    def environ(self) -> t.Dict[str, str]:
+        """
+        Get the environment variables of the processes run for the target.
+        """
+        home = env.user_home()
+        environ = dict(os.environ, HOME=self.home)
+        environ[env.CACHE_ROOT_ENV_VAR] = self.cache_root
+        for var in _redirected_env_vars:
+            value = environ.get(var)
+            if value and utils.is_subpath(value, home):
+                environ[var] = os.path.join(self.home, os.path.relpath(value, home))
+
+        return environ
+
+    def run(
+        self, args: t.List[str], *, extra_env: t.Dict[str, str] = None, **kwargs
+    ) -> subprocess.CompletedProcess:
+        """
+        Run a process for the target and wait for it.
+
+        :param args: the program and its arguments.
+        :param extra_env: other environment variables of the process, if any.
+        :param kwargs: other arguments passed to `subprocess.run`.
+        :return: the completed process.
+        """
+        environ = dict(self.environ(), **(extra_env or {}))
+        return subprocess.run(args, env=environ, cwd=self.home, **kwargs)
+
+
+def fan_out(command: str, module_names: t.List[str], targets: t.List[Target]):
+    """
+    Run an equipment command for the modules across the targets in parallel.
+
+    The packages required by the modules are installed once ahead,
+    since they are shared by all the targets.
+    Then each target runs the command in a dofu process of its own,
+    where the packages are found satisfied.
+    The packages installed ahead are handed over to the first target,
+    which owns them and uninstalls them on removal,
+    while the other targets use them as existing ones.
+    The output of a single target is not captured,
+    so that it can prompt for the conflicts as usual.
+
+    :param command: the equipment command, like "equip" or "sync".
+    :param module_names: the names of the modules.
+    :param targets: the targets to run the command for.
+    """
+    options = Options.instance()
+    if options.strategy == Strategy.ASK and len(targets) > 1:
+        raise ValueError("choose a non-interactive strategy for multiple targets")
+
+    blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+    handover = {
+        sharing.HANDOVER_ENV_VAR: sharing.encode_handover(
+            install_shared_packages(blueprint)
+        )
+    }
+
+    args = [
+        sys.executable,
+        "-m",
+        "dofu",
+        command,
+        *module_names,
+        f"--strategy={options.strategy.name.lower()}",
+        f"--jobs={options.jobs}",
+        f"--dry_run={options.dry_run}",
+        f"--refresh={options.refresh}",
+        f"--prefetch={options.prefetch}",
+        f"--locked={options.pins is not None}",
+    ]
+
+    # the outputs of multiple targets would interleave
+    captured = (
+        dict(stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8")
+        if len(targets) > 1
+        else {}
+    )
+
+    def run(target: Target) -> subprocess.CompletedProcess:
+        os.makedirs(target.home, exist_ok=True)
+        return target.run(
+            args,
+            extra_env=handover if target is targets[0] else None,
+            **captured,
+        )
+
+    failed = []
+    max_workers = min(len(targets), os.cpu_count() or 1) or 1
+    with utils.ContextExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, target): target for target in targets}
+        for future in concurrent.futures.as_completed(futures):
+            target, ret = futures[future], future.result()
+            if ret.returncode != 0:
+                _logger.error(f"Failed to {command} target {target.home}")
+                if ret.stdout is not None:
+                    _logger.error(ret.stdout.rstrip())
+                failed.append(target)
+            else:
+                _logger.info(f"Done {command} target {target.home}")
+                if ret.stdout is not None:
+                    _logger.debug(ret.stdout.rstrip())
+
+    if failed:
+        raise RuntimeError(f"failed to {command} {len(failed)}/{len(targets)} targets")
+
+
+def install_shared_packages(
+    blueprint: t.List[t.Type["m.Module"]],
+) -> t.Dict[sharing.Key, pm.PackageManager]:
+    """
+    Install the packages required by the modules once for all the targets.
+
+    If any package fails to install, the packages installed so far
+    are uninstalled again, as no target would own them.
+
+    :param blueprint: the modules in equipping order.
+    :return: the package managers used by the packages installed,
+        keyed by the requirement keys, excluding the packages installed before.
+    """
+    probed, installed = set(), {}
+    try:
+        for module in blueprint:
+            for requirement in module.package_requirements():
+                key = sharing.requirement_key(requirement)
+                if key in probed:
+                    continue
+
+                probed.add(key)
+                if not requirement.is_satisfied():
+                    _logger.info(
+                        f"Installing shared package {requirement.spec.package}"
+                        f"@{requirement.spec.version}"
+                    )
+                    installed[key] = requirement, requirement.install()
+
+    except BaseException:
+        for requirement, manager in reversed(list(installed.values())):
+            _logger.warning(
+                f"Uninstalling shared package {requirement.spec.package}"
+                f"@{requirement.spec.version}"
+            )
+            try:
+                requirement.uninstall(manager)
+            except Exception as e:
+                _logger.error(f"Failed to uninstall {requirement.spec.package}: {e}")
+        raise
+
+    return {key: manager for key, (_, manager) in installed.items()}
@@ -0,0 +1,199 @@
+import contextlib
+import dataclasses
+import enum
+import logging
+import os
+import threading
+import time
+import typing as t
+
+import yaml
+
+from dofu import env
+from dofu.options import Options
+
+_logger = logging.getLogger(__name__)
+
+
+class Action(enum.Enum):
+    """
+    Kind of the actions taken when syncing modules.
+    """
+
+    INSTALL = "install"
+    """
+    Install a package.
+    """
+
+    UNINSTALL = "uninstall"
+    """
+    Uninstall a package.
+    """
+
+    CLONE = "clone"
+    """
+    Clone a git repo.
+    """
+
+    FETCH = "fetch"
+    """
+    Fetch and checkout a cloned git repo.
+    """
+
+    MOVE = "move"
+    """
+    Move a cloned git repo to another path.
+    """
+
+    REMOVE = "remove"
+    """
+    Remove a cloned git repo.
+    """
+
+    EXEC = "exec"
+    """
+    Execute an undoable command.
+    """
+
+    UNDO = "undo"
+    """
+    Undo an executed undoable command.
+    """
+
+
+@dataclasses.dataclass
+class TimingStore:
+    """
+    Store of the wall time that past runs took for each action.
+
+    Each action is identified by a key made by `action_key`,
+    such as "clone https://github.com/zplug/zplug".
+    This store is used to estimate how long a sync will take.
+    Only the most recent samples of each action are kept.
+    """
+
+    durations: t.Dict[str, t.List[float]] = dataclasses.field(default_factory=dict)
+    """
+    Mapping from action keys to the recent wall times in seconds.
+    """
+
+    max_samples: t.ClassVar[int] = 5
+    """
+    Maximum number of samples kept for each action.
+    """
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def instance() -> "TimingStore":
+        """
+        Get the timing store of this process, which is loaded on first use.
+        """
+        global _store
+        if _store is None:
+            _store = TimingStore.load()
+        return _store
+
+    @staticmethod
+    def load() -> "TimingStore":
+        """
+        Load the timing store from the persistence file.
+        """
+        path = env.timing_persistence_file()
+        if not os.path.isfile(path):
+            return TimingStore()
+
+        try:
+            with open(path, "r") as file:
+                durations = yaml.safe_load(file) or {}
+
+        except (OSError, yaml.YAMLError) as e:
+            _logger.warning(f"Ignore broken timing store {path} - {e}")
+            return TimingStore()
+
+        return TimingStore(durations=durations)
+
+    def save(self):
+        """
+        Save the timing store to the persistence file.
+
+        Nothing is saved in dry run mode.
+        """
+        if Options.instance().dry_run:
+            return
+
+        path = env.timing_persistence_file()
+        with self._lock:
+            durations = {key: list(samples) for key, samples in self.durations.items()}
+
+        tmp_path = f"{path}.dofu.tmp"
+        with open(tmp_path, "w") as file:
+            yaml.safe_dump(durations, file, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def record(self, key: str, seconds: float):
+        """
+        Record the wall time of an action.
+
+        :param key: key of the action.
+        :param seconds: wall time in seconds.
+        """
+        with self._lock:
+            samples = self.durations.setdefault(key, [])
+            samples.append(round(seconds, 3))
+            del samples[: -self.max_samples]
+
+    def estimate(self, key: str) -> t.Optional[float]:
+        """
+        Estimate the wall time of an action from its recent samples.
+
+        :param key: key of the action.
+        :return: the estimated wall time in seconds, or None if never recorded.
+        """
+        with self._lock:
+            samples = self.durations.get(key)
+            return sum(samples) / len(samples) if samples else None
+
+    @contextlib.contextmanager
+    def timing(self, key: str):
+        """
+        Record the wall time of the action run in the context.
+
+        Nothing is recorded if the action raises in the context or in dry run mode,
+        so a failure reported otherwise, like a nonzero return code,
+        should be raised within the context.
+
+        :param key: key of the action.
+        """
+        start = time.monotonic()
+        yield
+        if not Options.instance().dry_run:
+            self.record(key, time.monotonic() - start)
+
+
+def action_key(action: Action, target: str) -> str:
+    """
+    Make the key identifying an action in the timing store.
+
+    :param action: the kind of the action.
+    :param target: what the action is applied to,
+        such as a package specification, a repo url or a command line.
+    """
+    return f"{action.value} {target}"
+
+
+def repr_seconds(seconds: t.Optional[float]) -> str:
+    """
+    Represent a duration in a short human-readable form, like "42.0s" or "3m05s".
+
+    :param seconds: the duration in seconds, or None if unknown.
+    """
+    if seconds is None:
+        return "?"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+
+
+_store: t.Optional[TimingStore] = None
@@ -1,11 +1,16 @@
 import abc
+import copy
 import dataclasses
+import logging
+import os
 import subprocess
 import typing as t
 
 import autoserde
 
-from dofu import shutils
+from dofu import shutils, utils
+
+_logger = logging.getLogger(__name__)
 
 
 @dataclasses.dataclass
@@ -51,6 +56,22 @@ class UndoableCommand(autoserde.Serdeable, abc.ABC):
         except Exception as e:
             return self._failure_result(e)
 
+    def repair(self) -> ExecutionResult:
+        """
+        Put the effect of this executed command back in place after it has drifted.
+
+        The command is executed again on a copy by default,
+        so that undoing this command still restores the state
+        from before it was executed for the first time.
+
+        :return: the result of the repair.
+        """
+        try:
+            return self._repair()
+
+        except Exception as e:
+            return self._failure_result(e)
+
     def undo(self) -> t.Optional[ExecutionResult]:
         try:
             return self._undo()
@@ -70,10 +91,50 @@ class UndoableCommand(autoserde.Serdeable, abc.ABC):
     def _undo(self) -> None:
         pass
 
+    def _repair(self) -> ExecutionResult:
+        return copy.copy(self)._exec()
+
     @abc.abstractmethod
     def spec_tuple(self):
         pass
 
+    def managed_paths(self) -> t.Tuple[str, ...]:
+        """
+        Get the paths whose state is managed by this command.
+
+        :return: tuple of the paths created, changed or moved by this command.
+        """
+        return ()
+
+    def conflicts(self) -> t.List[shutils.Ensure]:
+        """
+        Find the conflicting destinations that executing this command now would meet.
+
+        A destination conflicts if it is occupied before the command creates it,
+        which is resolved by the strategy when executing.
+
+        :return: list of the failing checks of the conflicting destinations.
+        """
+        return []
+
+    def vacated_paths(self) -> t.Tuple[str, ...]:
+        """
+        Get the paths this command moves away, which are free once it is executed.
+        """
+        return ()
+
+    def is_applied(self) -> t.Optional[bool]:
+        """
+        Probe whether the effect of this executed command is still in place.
+
+        The probe only inspects the managed paths without changing anything,
+        so it is much cheaper than executing the command again.
+
+        :return: True if the effect is in place, False if it has drifted,
+            or None if this command cannot be probed.
+        """
+        return None
+
     def _failure_result(self, exc):
         return ExecutionResult(
             cmdline=self.cmdline(), retcode=1, stderr=str(exc).encode("utf-8")
@@ -83,3 +144,46 @@ class UndoableCommand(autoserde.Serdeable, abc.ABC):
         return ExecutionResult(
             cmdline=self.cmdline(), retcode=0, stdout=stdout, stderr=stderr
         )
+
+
+def spec_paths(command: UndoableCommand) -> t.List[str]:
+    """
+    Get the absolute paths referenced by the spec of a command,
+    like the source and the destination of a symlink.
+
+    :param command: the command.
+    :return: list of the absolute paths.
+    """
+    paths = []
+    for value in command.spec_tuple() or ():
+        if isinstance(value, (str, os.PathLike)) and os.path.isabs(value):
+            paths.append(os.fspath(value))
+    return paths
+
+
+def probe_applied(
+    commands: t.List[UndoableCommand], *, max_workers: int = 16
+) -> t.List[t.Optional[bool]]:
+    """
+    Probe whether the effects of the executed commands are in place concurrently.
+
+    A command whose probe raises is regarded as unknown.
+
+    :param commands: list of executed commands.
+    :param max_workers: maximum number of probes running at the same time.
+    :return: list of the probe results in the same order as the commands.
+    """
+    if not commands:
+        return []
+
+    with utils.ContextExecutor(max_workers=min(max_workers, len(commands))) as executor:
+        return list(executor.map(_probe_applied, commands))
+
+
+def _probe_applied(command: UndoableCommand) -> t.Optional[bool]:
+    try:
+        return command.is_applied()
+
+    except Exception as e:
+        _logger.debug(f"Failed to probe command {command.cmdline()} - {e}")
+        return None
@@ -1,4 +1,5 @@
 import dataclasses
+import os
 import re
 import sys
 import typing as t
@@ -97,3 +98,19 @@ class UCAppendEnvVar(UndoableCommand):
 
     def spec_tuple(self):
         return self.varname, self.value, self.rc
+
+    def managed_paths(self):
+        return (self.rc,)
+
+    def is_applied(self):
+        if not os.path.isfile(self.rc):
+            return False
+
+        with open(self.rc, "r") as file:
+            for line in file:
+                m = re.match(_export_path_pattern, line.rstrip())
+                # the first export of the var takes effect in the same way as exec
+                if m is not None and m.group(1) == self.varname:
+                    return m.group(2) == self.value
+
+        return False
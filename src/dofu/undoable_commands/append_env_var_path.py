@@ -1,4 +1,5 @@
 import dataclasses
+import os
 import re
 import sys
 import typing as t
@@ -115,3 +116,21 @@ class UCAppendEnvVarPath(UndoableCommand):
 
     def spec_tuple(self):
         return self.path, self.rc
+
+    def managed_paths(self):
+        return (self.rc,)
+
+    def is_applied(self):
+        if not os.path.isfile(self.rc):
+            return False
+
+        with open(self.rc, "r") as file:
+            for line in file:
+                m = re.match(_export_path_pattern, line.rstrip())
+                if m is not None and self.path in (
+                    *m.group(1).split(":"),
+                    *m.group(2).split(":"),
+                ):
+                    return True
+
+        return False
@@ -1,4 +1,5 @@
 import dataclasses
+import os
 import re
 import sys
 import typing as t
@@ -58,3 +59,14 @@ class UCAppendLine(UndoableCommand):
 
     def spec_tuple(self):
         return self.path, self.pattern, self.repl
+
+    def managed_paths(self):
+        return (self.path,)
+
+    def is_applied(self):
+        if not os.path.isfile(self.path):
+            return False
+
+        repl = self.repl.rstrip("\n")
+        with open(self.path, "r") as file:
+            return any(line.rstrip("\n") == repl for line in file)
@@ -35,3 +35,9 @@ class UCBackupMv(UndoableCommand):
 
     def spec_tuple(self):
         return (self.path,)
+
+    def managed_paths(self):
+        return (self.path,)
+
+    def vacated_paths(self):
+        return (self.path,)
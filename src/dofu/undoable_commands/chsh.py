@@ -17,7 +17,7 @@ class UCChSh(UndoableCommand):
         return f"chsh -s {self.shell}"
 
     def _exec(self):
-        origin_shell = os.environ.get("SHELL")
+        origin_shell = login_shell()
         shell = shutils.command_path(self.shell)
         if origin_shell != shell:
             shutils.check_call(f"chsh -s {shell}")
@@ -39,3 +39,16 @@ class UCChSh(UndoableCommand):
 
     def spec_tuple(self):
         return (self.shell,)
+
+    def is_applied(self):
+        return login_shell() == (self.real_shell or shutils.command_path(self.shell))
+
+
+def login_shell() -> str:
+    """
+    Get the login shell of the current user, which is what chsh changes,
+    rather than the $SHELL of the running session.
+    """
+    import pwd  # only available on unix
+
+    return pwd.getpwuid(os.getuid()).pw_shell
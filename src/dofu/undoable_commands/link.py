@@ -28,3 +28,10 @@ class UCLink(UndoableCommand):
 
     def spec_tuple(self):
         return self.src, self.dst
+
+    def managed_paths(self):
+        return (self.dst,)
+
+    def conflicts(self):
+        ensure = shutils.EnsurePathNotExists(action="ln", path=self.dst)
+        return [] if ensure.condition() else [ensure]
@@ -44,3 +44,9 @@ class UCMkdir(UndoableCommand):
 
     def spec_tuple(self):
         return (self.path,)
+
+    def managed_paths(self):
+        return (self.path,)
+
+    def is_applied(self):
+        return os.path.isdir(self.path)
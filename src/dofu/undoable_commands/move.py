@@ -28,3 +28,13 @@ class UCMove(UndoableCommand):
 
     def spec_tuple(self):
         return self.src, self.dst
+
+    def managed_paths(self):
+        return self.src, self.dst
+
+    def conflicts(self):
+        ensure = shutils.EnsurePathNotExists(action="mv", path=self.dst)
+        return [] if ensure.condition() else [ensure]
+
+    def vacated_paths(self):
+        return (self.src,)
@@ -40,5 +40,31 @@ class UCSafeMove(UndoableCommand):
         self.real_dst = None
         self.ret = None
 
+    def _repair(self):
+        if self.moved and os.path.lexists(self.real_dst or self.dst):
+            # keep the original backup for the undo, and move the new source aside
+            if os.path.lexists(self.src):
+                shutils.move(self.src, shutils.backup_path(self.real_dst or self.dst))
+            return self._success_result()
+
+        return super()._repair()
+
     def spec_tuple(self):
         return self.src, self.dst
+
+    def managed_paths(self):
+        return self.src, self.dst
+
+    def conflicts(self):
+        if not os.path.exists(self.src):
+            return []
+        ensure = shutils.EnsurePathNotExists(action="mv", path=self.dst)
+        return [] if ensure.condition() else [ensure]
+
+    def vacated_paths(self):
+        return (self.src,)
+
+    def is_applied(self):
+        if os.path.lexists(self.src):
+            return False
+        return not self.moved or os.path.lexists(self.real_dst or self.dst)
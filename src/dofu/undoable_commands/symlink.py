@@ -37,3 +37,15 @@ class UCSymlink(UndoableCommand):
 
     def spec_tuple(self):
         return self.src, self.dst
+
+    def managed_paths(self):
+        return (self.dst,)
+
+    def conflicts(self):
+        if self.is_applied():
+            return []
+        ensure = shutils.EnsurePathNotExists(action="ln -s", path=self.dst)
+        return [] if ensure.condition() else [ensure]
+
+    def is_applied(self):
+        return os.path.islink(self.dst) and os.readlink(self.dst) == os.fspath(self.src)
@@ -1,5 +1,8 @@
+import concurrent.futures
 import contextlib
+import contextvars
 import logging
+import os
 
 import typing as t
 
@@ -70,3 +73,28 @@ def find(iterable: t.Iterable, value=None, *, key=None, pred=None, default=None)
             if key(element) == value:
                 return element
     return default
+
+
+def is_subpath(path: os.PathLike, parent: os.PathLike) -> bool:
+    """
+    Check whether a path is the parent path or inside it.
+
+    :param path: The path to check.
+    :param parent: The parent path.
+    :return: True if the path is the parent path or inside it, False otherwise.
+    """
+    path, parent = os.path.abspath(path), os.path.abspath(parent)
+    return path == parent or path.startswith(parent + os.sep)
+
+
+class ContextExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Thread pool executor running each task in a copy of the submitting context.
+
+    The context variables of the submitter, like the options,
+    are seen by the workers as by the submitter itself.
+    """
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
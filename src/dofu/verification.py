@@ -0,0 +1,274 @@
+import dataclasses
+import hashlib
+import json
+import os
+import stat
+import threading
+import typing as t
+
+from dofu import utils
+from dofu.options import Options
+
+LINK = "link"
+DIR = "dir"
+FILE = "file"
+OTHER = "other"
+MISSING = "missing"
+
+
+@dataclasses.dataclass(frozen=True)
+class PathState:
+    """
+    Recorded state of a managed path.
+
+    Links are compared by their targets and directories by their modes.
+    Files are compared by their stat results first,
+    and by their content hashes only when the stat results differ,
+    so that a file touched without any change is not regarded as drifted.
+    """
+
+    kind: str
+    """
+    Kind of the path, one of "link", "dir", "file", "other" and "missing".
+    """
+
+    target: t.Optional[str] = None
+    """
+    Target of a link.
+    """
+
+    mode: t.Optional[int] = None
+    """
+    Permission bits of a directory or a file.
+    """
+
+    size: t.Optional[int] = None
+    """
+    Size of a file in bytes.
+    """
+
+    mtime_ns: t.Optional[int] = None
+    """
+    Modification time of a file in nanoseconds.
+    """
+
+    digest: t.Optional[str] = None
+    """
+    Sha256 digest of the content of a file.
+    """
+
+    @staticmethod
+    def capture(path: os.PathLike) -> "PathState":
+        """
+        Capture the current state of a path.
+
+        :param path: the path.
+        :return: the state of the path.
+        """
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return PathState(kind=MISSING)
+
+        if stat.S_ISLNK(st.st_mode):
+            return PathState(kind=LINK, target=os.readlink(path))
+        if stat.S_ISDIR(st.st_mode):
+            return PathState(kind=DIR, mode=stat.S_IMODE(st.st_mode))
+        if stat.S_ISREG(st.st_mode):
+            return PathState(
+                kind=FILE,
+                mode=stat.S_IMODE(st.st_mode),
+                size=st.st_size,
+                mtime_ns=st.st_mtime_ns,
+                digest=_digest(path),
+            )
+        return PathState(kind=OTHER)
+
+    def drift(self, path: os.PathLike) -> t.Optional[str]:
+        """
+        Check whether a path has drifted from this state.
+
+        :param path: the path.
+        :return: the reason of the drift, or None if not drifted.
+        """
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return None if self.kind == MISSING else f"{self.kind} is missing"
+
+        if stat.S_ISLNK(st.st_mode):
+            kind = LINK
+        elif stat.S_ISDIR(st.st_mode):
+            kind = DIR
+        elif stat.S_ISREG(st.st_mode):
+            kind = FILE
+        else:
+            kind = OTHER
+
+        if kind != self.kind:
+            return f"{self.kind} is replaced by {kind}"
+
+        if kind == LINK:
+            target = os.readlink(path)
+            if target != self.target:
+                return f"link target {self.target} is changed to {target}"
+
+        elif kind in (DIR, FILE) and stat.S_IMODE(st.st_mode) != self.mode:
+            return f"mode {self.mode:o} is changed to {stat.S_IMODE(st.st_mode):o}"
+
+        elif kind == FILE:
+            if st.st_size == self.size and st.st_mtime_ns == self.mtime_ns:
+                return None
+            if st.st_size != self.size or _digest(path) != self.digest:
+                return "content is changed"
+
+        return None
+
+
+class StateIndex:
+    """
+    Index of the recorded states of the paths managed by each module.
+
+    The states of a module are recorded once its commands are synced,
+    and forgotten once it is removed.
+    A path shared by several modules, like an rc file that they all append to,
+    is recorded again for all of them whenever any of them changes it.
+    """
+
+    max_workers: t.ClassVar[int] = 8
+    """
+    Maximum number of paths captured or checked at the same time.
+    """
+
+    def __init__(self, states: t.Dict[str, t.Dict[str, PathState]] = None):
+        """
+        :param states: mapping from the module names to their paths and states.
+        """
+        self._lock = threading.Lock()
+        self._states = states or {}
+
+    @staticmethod
+    def load(path: os.PathLike) -> "StateIndex":
+        """
+        Load the index from the persistence file.
+
+        :param path: path to the persistence file.
+        :return: the index, which is empty if it has not been persisted.
+        """
+        if not os.path.isfile(path):
+            return StateIndex()
+
+        with open(path, "r") as file:
+            states = json.load(file)
+
+        return StateIndex(
+            {
+                module_name: {
+                    managed: PathState(**state) for managed, state in paths.items()
+                }
+                for module_name, paths in states.items()
+            }
+        )
+
+    def save(self, path: os.PathLike):
+        """
+        Save the index to the persistence file.
+
+        Nothing is saved in dry run mode.
+
+        :param path: path to the persistence file.
+        """
+        if Options.instance().dry_run:
+            return
+
+        with self._lock:
+            states = {
+                module_name: {
+                    managed: dataclasses.asdict(state)
+                    for managed, state in paths.items()
+                }
+                for module_name, paths in self._states.items()
+            }
+
+        tmp_path = f"{path}.dofu.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(states, file)
+        os.replace(tmp_path, path)
+
+    def module_names(self) -> t.List[str]:
+        """
+        Get the names of the modules with recorded states.
+        """
+        with self._lock:
+            return list(self._states)
+
+    def record(self, module_name: str, paths: t.Iterable[str]):
+        """
+        Record the current states of the paths managed by a module.
+
+        :param module_name: name of the module.
+        :param paths: the absolute paths managed by the module.
+        """
+        paths = list(dict.fromkeys(paths))
+        states = dict(zip(paths, self._map(PathState.capture, paths)))
+
+        with self._lock:
+            self._states[module_name] = states
+            for other in self._states.values():
+                for path in other.keys() & states.keys():
+                    other[path] = states[path]
+
+    def forget(self, module_name: str):
+        """
+        Forget the states of a removed module.
+
+        :param module_name: name of the module.
+        """
+        with self._lock:
+            self._states.pop(module_name, None)
+
+    def verify(
+        self, module_names: t.Iterable[str] = None
+    ) -> t.Dict[str, t.List[t.Tuple[str, str]]]:
+        """
+        Check the recorded paths for drift in parallel.
+
+        :param module_names: names of the modules to verify, all by default.
+        :return: mapping from the module names to their drifted paths and reasons.
+        """
+        with self._lock:
+            names = list(self._states) if module_names is None else module_names
+            states = {name: dict(self._states.get(name, {})) for name in names}
+
+        unique = {
+            path: state for paths in states.values() for path, state in paths.items()
+        }
+        paths = list(unique)
+        drifts = dict(
+            zip(paths, self._map(lambda path: unique[path].drift(path), paths))
+        )
+
+        return {
+            name: [(path, drifts[path]) for path in paths if drifts[path] is not None]
+            for name, paths in states.items()
+        }
+
+    def _map(self, fn: t.Callable, items: t.List) -> t.List:
+        if len(items) <= 1:
+            return list(map(fn, items))
+
+        with utils.ContextExecutor(
+            max_workers=min(self.max_workers, len(items))
+        ) as executor:
+            return list(executor.map(fn, items))
+
+
+def _digest(path: os.PathLike) -> str:
+    """
+    Hash the content of a file.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
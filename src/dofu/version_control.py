@@ -132,6 +132,18 @@ def remote_get_url(*opts: str, repo_path: str, name: str = "origin") -> None:
     )
 
 
+def bundle_create(*revs: str, repo_path: str, file: str) -> None:
+    """
+    Pack the revisions of a repo into a bundle file.
+
+    :param revs: the revisions to pack, like --all.
+    :param repo_path: where the repo having been cloned to
+    :param file: path of the bundle file to create.
+    """
+    shutils.ensure_path_exists(action="git bundle", path=repo_path, is_dir=True)
+    shutils.check_call(f"git bundle create {shc([file, *revs])}", cwd=repo_path)
+
+
 def checkout_paths(*opts: str, repo_path: str, paths: t.List[str]) -> None:
     """
     Checkout a path at a revision.
@@ -205,6 +217,42 @@ def last_commit_id_of(*, repo_path, revision: str = "", path: str = "") -> str:
     ).strip()
 
 
+def remote_commit_id(repo: str, revision: str = "HEAD") -> str:
+    """
+    Get the commit id a revision of a remote repo points to.
+
+    :param repo: the url of the remote repo.
+    :param revision: the branch, the tag or HEAD.
+    :return: the commit id.
+    """
+    output = shutils.check_output_no_side_effect(
+        f"git ls-remote {shc([repo, revision])}", encoding="utf-8"
+    )
+    for line in output.splitlines():
+        return line.split()[0]
+    raise ValueError(f"revision {revision} is not found in {repo}")
+
+
+def commit_time(*, repo_path, revision: str) -> int:
+    """
+    Get the committer time of a revision.
+
+    :param repo_path: where the repo having been cloned to
+    :param revision: the revision to check.
+    :return: the committer time in seconds since the epoch.
+    """
+    return int(
+        log(
+            "-1",
+            "--pretty=%ct",
+            repo_path=repo_path,
+            path="",
+            revision=revision,
+            encoding="utf-8",
+        )
+    )
+
+
 def shc(opts) -> str:
     """
     Convert a list of options to a string that can be used in shell.
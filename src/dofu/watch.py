@@ -0,0 +1,458 @@
+import abc
+import ctypes
+import ctypes.util
+import inspect
+import logging
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+import typing as t
+
+from dofu import (
+    env,
+    fingerprint as fp,
+    module as m,
+    platform,
+    undoable_command as uc,
+    utils,
+)
+from dofu.options import Options
+
+_logger = logging.getLogger(__name__)
+
+_ignored_names = (".git", "__pycache__", ".venv", ".idea")
+"""
+Names of the directories in the project that are never watched.
+"""
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+_in_mask = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+
+_in_event = struct.Struct("iIII")
+"""
+Layout of the header of an inotify event: wd, mask, cookie and len.
+"""
+
+
+class Watcher(abc.ABC):
+    """
+    Watcher of filesystem changes.
+
+    The roots are watched recursively, including the directories created later,
+    while the single paths are watched together with their direct children,
+    so that a path is seen when it is created, replaced or deleted.
+    """
+
+    def __init__(
+        self,
+        roots: t.Iterable[str],
+        paths: t.Iterable[str],
+        excluded: t.Iterable[str] = (),
+    ):
+        """
+        :param roots: the directories to watch recursively.
+        :param paths: the paths to watch without descending into them.
+        :param excluded: the directories in the roots never to watch.
+        """
+        self.roots = sorted(set(map(os.path.abspath, roots)))
+        self.paths = sorted(set(map(os.path.abspath, paths)))
+        self.excluded = set(map(os.path.abspath, excluded))
+
+    @abc.abstractmethod
+    def poll(self, timeout: t.Optional[float]) -> t.Set[str]:
+        """
+        Wait for changes.
+
+        :param timeout: maximum seconds to wait, forever if None.
+        :return: the changed paths, empty if nothing changed in time.
+        """
+
+    def close(self):
+        """
+        Stop watching.
+        """
+
+    def _walk(self, root: str) -> t.Iterator[t.Tuple[str, t.List[str], t.List[str]]]:
+        """
+        Walk a root, skipping the ignored and excluded directories.
+        """
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if name not in _ignored_names
+                and os.path.join(directory, name) not in self.excluded
+            ]
+            yield directory, dirnames, filenames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """
+    Watcher backed by Linux inotify, driven through ctypes.
+    """
+
+    def __init__(
+        self,
+        roots: t.Iterable[str],
+        paths: t.Iterable[str],
+        excluded: t.Iterable[str] = (),
+    ):
+        super().__init__(roots, paths, excluded)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # mapping from the watch descriptors to the directories and recursiveness
+        self._watches: t.Dict[int, t.Tuple[str, bool]] = {}
+        for root in self.roots:
+            self._add_tree(root)
+        for path in self.paths:
+            self._add(os.path.dirname(path), recursive=False)
+            self._add(path, recursive=False)
+
+    def poll(self, timeout: t.Optional[float]) -> t.Set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _in_event.unpack_from(data, offset)
+            offset += _in_event.size
+            name = data[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events are lost, regard everything as changed
+                _logger.warning("Too many changes at once, some events are lost")
+                changed.update(self.roots, self.paths)
+                continue
+
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            if wd not in self._watches:
+                continue
+
+            directory, recursive = self._watches[wd]
+            path = os.path.join(directory, name) if name else directory
+            if path in self.excluded:
+                continue
+
+            changed.add(path)
+            if recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_tree(self, root: str):
+        for directory, _, _ in self._walk(root):
+            self._add(directory, recursive=True)
+
+    def _add(self, directory: str, *, recursive: bool):
+        if not os.path.isdir(directory) or os.path.islink(directory):
+            return
+
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _in_mask)
+        if wd < 0:
+            _logger.debug(
+                f"Failed to watch {directory} - {os.strerror(ctypes.get_errno())}"
+            )
+            return
+
+        # a directory watched both ways keeps watching recursively
+        _, was_recursive = self._watches.get(wd, (directory, False))
+        self._watches[wd] = (directory, recursive or was_recursive)
+
+
+class PollingWatcher(Watcher):
+    """
+    Watcher comparing snapshots of the stat results periodically,
+    used where inotify is not available.
+    """
+
+    def __init__(
+        self,
+        roots: t.Iterable[str],
+        paths: t.Iterable[str],
+        excluded: t.Iterable[str] = (),
+        interval: float = 1.0,
+    ):
+        """
+        :param roots: the directories to watch recursively.
+        :param paths: the paths to watch without descending into them.
+        :param excluded: the directories in the roots never to watch.
+        :param interval: seconds between two snapshots.
+        """
+        super().__init__(roots, paths, excluded)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def poll(self, timeout: t.Optional[float]) -> t.Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            time.sleep(wait)
+
+    def _take_snapshot(self) -> t.Dict[str, t.Tuple]:
+        snapshot = {}
+        for root in self.roots:
+            for directory, dirnames, filenames in self._walk(root):
+                for name in dirnames + filenames:
+                    path = os.path.join(directory, name)
+                    snapshot[path] = fp.path_state(path)
+
+        for path in self.paths:
+            snapshot[path] = fp.path_state(path)
+            if os.path.isdir(path) and not os.path.islink(path):
+                for name in os.listdir(path):
+                    child = os.path.join(path, name)
+                    snapshot[child] = fp.path_state(child)
+
+        return snapshot
+
+
+def create_watcher(
+    roots: t.Iterable[str],
+    paths: t.Iterable[str],
+    excluded: t.Iterable[str] = (),
+    *,
+    polling: bool = False,
+) -> Watcher:
+    """
+    Create the most efficient watcher available on this platform.
+
+    :param roots: the directories to watch recursively.
+    :param paths: the paths to watch without descending into them.
+    :param excluded: the directories in the roots never to watch.
+    :param polling: whether to poll even if inotify is available.
+    :return: the watcher.
+    """
+    if not polling and platform.LINUX():
+        try:
+            return InotifyWatcher(roots, paths, excluded)
+
+        except (OSError, AttributeError) as e:
+            _logger.warning(f"Fall back to polling as inotify is not available - {e}")
+
+    return PollingWatcher(roots, paths, excluded)
+
+
+class ChangeMapper:
+    """
+    Mapper from the changed paths to the modules affected by them.
+
+    A module is affected by a change to its definition,
+    to any source path referenced by its commands, like the target of a symlink,
+    or to any path it manages, like the symlink itself or a cloned repo.
+    """
+
+    def __init__(self, blueprint: t.List[t.Type["m.Module"]]):
+        """
+        :param blueprint: the watched modules.
+        """
+        self._definitions: t.Dict[str, t.List[str]] = {}
+        self._sources: t.Dict[str, t.List[str]] = {}
+        self._destinations: t.Dict[str, t.List[str]] = {}
+
+        for module in blueprint:
+            name = module.name()
+            definition = os.path.abspath(inspect.getfile(module))
+            self._definitions.setdefault(definition, []).append(name)
+
+            for git in module.gitrepo_requirements():
+                self._destinations.setdefault(os.path.abspath(git.path), []).append(
+                    name
+                )
+
+            for command in module.command_requirements():
+                for path in command.managed_paths():
+                    self._destinations.setdefault(os.path.abspath(path), []).append(
+                        name
+                    )
+                for source in uc.spec_paths(command):
+                    if source not in self._destinations:
+                        self._sources.setdefault(source, []).append(name)
+
+    @property
+    def definitions(self) -> t.List[str]:
+        """
+        Paths to the files defining the modules.
+        """
+        return list(self._definitions)
+
+    @property
+    def sources(self) -> t.List[str]:
+        """
+        Paths referenced by the commands of the modules.
+        """
+        return list(self._sources)
+
+    @property
+    def destinations(self) -> t.List[str]:
+        """
+        Paths managed by the modules.
+        """
+        return list(self._destinations)
+
+    def affected(self, changed: t.Iterable[str]) -> t.List[str]:
+        """
+        Find the modules affected by the changed paths.
+
+        :param changed: the changed paths.
+        :return: names of the affected modules in a stable order.
+        """
+        affected = set()
+        for path in map(os.path.abspath, changed):
+            affected.update(self._definitions.get(path, ()))
+            for index in (self._sources, self._destinations):
+                for parent, names in index.items():
+                    if utils.is_subpath(path, parent):
+                        affected.update(names)
+
+        return sorted(affected)
+
+
+def watch(
+    module_names: t.List[str],
+    *,
+    debounce: float = 0.5,
+    polling: bool = False,
+):
+    """
+    Watch the project and the managed paths, and re-apply the affected modules.
+
+    The changes within the debounce window are batched into one apply,
+    which equips only the affected modules in a new dofu process,
+    so that the modules are always defined by the latest code.
+    Modules whose fingerprints turn out unchanged are skipped as usual.
+    When a module definition changes, the watcher restarts itself
+    to pick up the changed paths.
+
+    :param module_names: names of the modules to watch, with their dependencies.
+    :param debounce: seconds without any change before applying.
+    :param polling: whether to poll instead of using inotify.
+    """
+    blueprint = m.ModuleRegistrationManager.resolve_equip_blueprint(module_names)
+    mapper = ChangeMapper(blueprint)
+    root = os.fspath(env.project_root())
+    paths = [
+        path
+        for path in mapper.sources + mapper.destinations
+        if not utils.is_subpath(path, root)
+    ]
+    # never watch the persisted states changed by every apply
+    excluded = [env.cache_root()]
+
+    with create_watcher([root], paths, excluded, polling=polling) as watcher:
+        _logger.info(
+            f"Watching {len(blueprint)} modules with {type(watcher).__name__},"
+            " press Ctrl-C to stop"
+        )
+
+        pending: t.Set[str] = set()
+        while True:
+            changed = watcher.poll(debounce if pending else None)
+            if changed:
+                pending.update(changed)
+                continue
+
+            affected = mapper.affected(pending)
+            redefined = set(map(os.path.abspath, pending)) & set(mapper.definitions)
+            pending.clear()
+            if not affected:
+                continue
+
+            _apply(affected)
+            # drop the changes made by the apply itself
+            while watcher.poll(0):
+                pass
+
+            if redefined:
+                _logger.info("Restarting to reload the changed modules")
+                os.execv(sys.executable, [sys.executable, "-m", "dofu", *sys.argv[1:]])
+
+
+def _apply(module_names: t.List[str]):
+    """
+    Equip the affected modules in a new dofu process.
+    """
+    options = Options.instance()
+    _logger.info(f"Re-applying {', '.join(module_names)}")
+    retcode = subprocess.call(
+        [
+            sys.executable,
+            "-m",
+            "dofu",
+            "equip",
+            *module_names,
+            f"--strategy={options.strategy.name.lower()}",
+            f"--jobs={options.jobs}",
+            f"--dry_run={options.dry_run}",
+        ]
+    )
+    if retcode != 0:
+        _logger.error(f"Failed to re-apply {', '.join(module_names)}")
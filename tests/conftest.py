@@ -6,6 +6,7 @@ import dotenv
 import pytest
 
 __all__ = [
+    "fresh_timing",
     "load_dotenv",
     "mock_env",
     "temp_cache",
@@ -80,3 +81,16 @@ def mock_env(temp_cache, temp_user_home):
     # Mock the env methods for tests
     env.cache_root = __overwrite_cache_root_for_tests
     env.user_home = __overwrite_user_home
+
+
+@pytest.fixture(scope="function", autouse=True)
+def fresh_timing(monkeypatch):
+    """
+    Give each test an empty timing store.
+
+    The timing store is a process-wide singleton,
+    so that the timings recorded by a test would leak into the estimates of others.
+    """
+    from dofu import timing
+
+    monkeypatch.setattr(timing, "_store", timing.TimingStore())
@@ -0,0 +1,55 @@
+import subprocess
+
+import pytest
+
+from dofu import bundle as bdl, mirrors, requirement as req, version_control as vc
+from dofu.runner import CompiledModule, CompiledPlan
+
+
+@pytest.fixture(scope="function")
+def upstream(tmp_path):
+    """
+    A local repo standing for the upstream, which needs no network.
+    """
+    path = tmp_path / "upstream"
+    path.mkdir()
+    for sh in (
+        "git init -q",
+        "git -c user.name=test -c user.email=test@test commit -q --allow-empty -m init",
+    ):
+        subprocess.check_call(sh, shell=True, cwd=path)
+    return path
+
+
+def test_bundle_and_equip_offline(upstream, tmp_path, monkeypatch):
+    url = upstream.as_uri()
+    plan = CompiledPlan(
+        modules=[
+            CompiledModule(
+                module_name="test-bundle",
+                commit_id="",
+                requires=[],
+                packages=[],
+                gitrepos=[
+                    req.GitRepoRequirement(url=url, path=str(tmp_path / "clone"))
+                ],
+                commands=[],
+            )
+        ]
+    )
+    monkeypatch.setattr(CompiledPlan, "compile", staticmethod(lambda names: plan))
+    bdl.create_bundle(["test-bundle"], tmp_path / "bundle.tar")
+
+    # the upstream is gone, so the repo can only be cloned from the bundle
+    head = vc.current_commit_id(upstream)
+    subprocess.check_call(f"rm -rf {upstream}", shell=True)
+
+    with bdl.extracted(tmp_path / "bundle.tar") as extracted:
+        assert [module.name() for module in extracted.modules] == ["test-bundle"]
+
+        git = extracted.modules[0].gitrepos[0]
+        assert mirrors.local_url(url).endswith(".bundle")
+        git.install()
+
+    assert vc.current_commit_id(git.path) == head
+    assert vc.remote_get_url(repo_path=git.path) == url
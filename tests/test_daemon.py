@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+from dofu import client, daemon as dmn, env
+from dofu.options import Options
+
+
+class DummyApp:
+    @staticmethod
+    def echo(*words: str, dry_run: bool = False):
+        Options.instance().dry_run = dry_run
+        print(" ".join(words))
+        logging.getLogger("dofu.test").info(f"dry run {Options.instance().dry_run}")
+
+    @staticmethod
+    def fail(code: int):
+        sys.exit(code)
+
+
+class TestClient:
+    def test_forwardable(self):
+        assert client.forwardable(["list"])
+        assert client.forwardable(["plan", "zsh", "--fmt", "json"])
+        assert client.forwardable(["sync", "--strategy", "auto", "zsh"])
+        assert client.forwardable(["equip", "zsh", "--strategy=force"])
+
+        # they might prompt
+        assert not client.forwardable(["sync", "zsh"])
+        assert not client.forwardable(["sync", "--strategy", "auto"])
+        assert not client.forwardable(["try", "zsh"])
+        assert not client.forwardable(["list", "--help"])
+        assert not client.forwardable([])
+
+
+class TestDaemon:
+    @pytest.fixture(scope="function")
+    def serving(self):
+        """
+        Serve a dummy app, restoring the streams and the logging afterwards.
+        """
+        root = logging.getLogger()
+        stdout, stderr = sys.stdout, sys.stderr
+        handlers, level = list(root.handlers), root.level
+
+        daemon = dmn.Daemon(env.daemon_socket_file(), DummyApp)
+        thread = threading.Thread(target=daemon.serve)
+        thread.start()
+        while client.connect() is None:
+            time.sleep(0.01)
+
+        yield daemon
+
+        client.stop()
+        thread.join()
+        sys.stdout, sys.stderr = stdout, stderr
+        root.handlers, root.level = handlers, level
+
+    def test_forward(self, serving, capsys):
+        assert client.forward(["echo", "hello", "world", "--dry_run"]) == 0
+        out = capsys.readouterr().out
+        assert "hello world" in out
+        assert "dry run True" in out
+
+        # the options of a command never leak into the next one
+        assert client.forward(["echo", "again"]) == 0
+        assert "dry run False" in capsys.readouterr().out
+        assert not Options.instance().dry_run
+
+    def test_exit_code(self, serving):
+        assert client.forward(["fail", "3"]) == 3
+
+    def test_no_daemon(self):
+        assert client.connect() is None
+        assert client.forward(["list"]) is None
+
+    def test_other_environment(self, serving, monkeypatch, capsys):
+        monkeypatch.setenv("XDG_CONFIG_HOME", "/elsewhere")
+        assert client.forward(["echo", "hello"]) is None
+        assert "hello" not in capsys.readouterr().out
+
+
+class TestLostDaemon:
+    @staticmethod
+    def serve_once(*replies: dict) -> threading.Thread:
+        """
+        Serve one request with the given replies and then hang up.
+        """
+        path = os.fspath(env.daemon_socket_file())
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+
+        def serve():
+            conn, _ = server.accept()
+            with conn, conn.makefile("r", encoding="utf-8") as requests:
+                requests.readline()
+                for reply in replies:
+                    conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            server.close()
+            os.unlink(path)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        return thread
+
+    def test_lost_before_accepted(self):
+        thread = self.serve_once()
+        assert client.forward(["list"]) is None
+        thread.join()
+
+    def test_lost_after_accepted(self):
+        thread = self.serve_once({"accepted": True}, {"out": "half"})
+        with pytest.raises(ConnectionError):
+            client.forward(["list"])
+        thread.join()
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from dofu import (
+    env,
+    export as ex,
+    package_requirements as prs,
+    undoable_commands as ucs,
+    undoable_command as uc,
+    version_control as vc,
+)
+from dofu.runner import CompiledModule, CompiledPlan
+from tests.dummies import DummyPackageRequirement
+
+
+def compiled(name: str, commit_id: str, requires=(), packages=()) -> CompiledModule:
+    return CompiledModule(
+        module_name=name,
+        commit_id=commit_id,
+        requires=list(requires),
+        packages=list(packages),
+        gitrepos=[],
+        commands=[],
+    )
+
+
+def test_order_by_change(monkeypatch):
+    times = {"old": 100, "mid": 200, "new": 300}
+    monkeypatch.setattr(
+        vc, "commit_time", lambda *, repo_path, revision: times[revision]
+    )
+
+    base = compiled("base", "new")
+    plan = CompiledPlan(
+        modules=[
+            compiled("uncommitted", ""),
+            base,
+            compiled("top", "old", requires=["base"]),
+            compiled("stable", "mid"),
+        ]
+    )
+
+    # the least recently changed first, but never before its dependencies
+    assert [module.name() for module in ex._order_by_change(plan)] == [
+        "stable",
+        "base",
+        "top",
+        "uncommitted",
+    ]
+
+
+def test_apt_packages():
+    module = compiled(
+        "test-export",
+        "",
+        packages=[
+            prs.PRSystem.make("zsh"),
+            prs.PRSystem.make("tmux", version="3.2a-4"),
+            DummyPackageRequirement(),
+        ],
+    )
+
+    packages = ex._apt_packages([module])
+    assert "zsh" in packages
+    assert "tmux=3.2a-4" in packages
+    assert "dummy-pkg" not in packages
+    assert set(ex._base_packages) <= set(packages)
+
+
+def test_spec_paths():
+    command = ucs.UCSymlink(src="/project/xdg-config/a", dst="/home/.config/a")
+    assert uc.spec_paths(command) == ["/project/xdg-config/a", "/home/.config/a"]
+
+
+def test_run():
+    assert ex._run("a", "b") == "RUN a \\\n    && b"
+
+
+def test_copy_build_files(tmp_path, monkeypatch):
+    tomllib = pytest.importorskip("tomllib")
+    with open(os.path.join(env.project_root(), "pyproject.toml"), "rb") as file:
+        pyproject = tomllib.load(file)
+
+    monkeypatch.setattr(env, "project_root", lambda: tmp_path)
+    monkeypatch.setattr(
+        CompiledPlan, "compile", staticmethod(lambda names: CompiledPlan(modules=[]))
+    )
+    content = ex.export_dockerfile([], tmp_path / "Dockerfile")
+
+    # every file the build backend reads is copied before installing dofu
+    copied = set()
+    for line in content.splitlines():
+        if line.startswith("COPY "):
+            copied.update(line.split()[1:-1])
+    project = pyproject["project"]
+    needed = {"pyproject.toml", project["readme"], project["license"]["file"]}
+    for package in pyproject["tool"]["hatch"]["build"]["targets"]["wheel"]["packages"]:
+        needed.add(package.split("/")[0])
+    assert needed <= copied
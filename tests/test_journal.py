@@ -0,0 +1,44 @@
+import dataclasses
+
+from dofu import journal as jnl
+from dofu.options import Options
+
+
+@dataclasses.dataclass
+class Entry:
+    name: str
+    value: int
+
+
+class TestJournal:
+    def test_append_replay(self, tmp_path):
+        journal = jnl.Journal(tmp_path / "test.journal")
+        assert list(journal.replay(Entry)) == []
+
+        journal.append(Entry("a", 1))
+        journal.append(Entry("b", 2))
+        assert list(journal.replay(Entry)) == [Entry("a", 1), Entry("b", 2)]
+
+        journal.truncate()
+        assert list(journal.replay(Entry)) == []
+
+    def test_drop_torn_entry(self, tmp_path):
+        journal = jnl.Journal(tmp_path / "test.journal")
+        journal.append(Entry("a", 1))
+
+        # mock a crash in the middle of appending
+        with open(journal.path, "a") as file:
+            file.write("name: b\nval")
+
+        assert list(journal.replay(Entry)) == [Entry("a", 1)]
+
+    def test_dry_run(self, tmp_path):
+        journal = jnl.Journal(tmp_path / "test.journal")
+
+        Options.instance().dry_run = True
+        try:
+            journal.append(Entry("a", 1))
+        finally:
+            Options.instance().dry_run = False
+
+        assert list(journal.replay(Entry)) == []
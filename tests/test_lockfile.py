@@ -0,0 +1,141 @@
+import os
+import subprocess
+import types
+
+import pytest
+
+from dofu import (
+    env,
+    lockfile as lf,
+    package_requirements as prs,
+    requirement as req,
+    version_control as vc,
+)
+from dofu.options import Options
+
+
+@pytest.fixture(scope="function")
+def local_repo(tmp_path):
+    """
+    A local git repo with a single commit, which needs no network.
+    """
+    path = tmp_path / "local-repo"
+    path.mkdir()
+    for sh in (
+        "git init -q",
+        "git -c user.name=test -c user.email=test@test commit -q --allow-empty -m init",
+    ):
+        subprocess.check_call(sh, shell=True, cwd=path)
+    return path
+
+
+class TestLockFile:
+    def test_pin(self):
+        lock = lf.LockFile(
+            gitrepos={"https://github.com/some/repo": {"/x": "abc123", "/y": "def456"}},
+            packages={"PRSystem": {"zsh": "5.8-6"}},
+        )
+
+        git = req.GitRepoRequirement(url="git@GitHub.com:some/repo.git", path="/x")
+        assert lock.pin(git).commit_id == "abc123"
+        assert git.commit_id is None
+
+        # the checkouts of one repo at other paths keep their own pins
+        other = req.GitRepoRequirement(url="https://github.com/some/repo", path="/y")
+        assert lock.pin(other).commit_id == "def456"
+        unpinned = req.GitRepoRequirement(url="https://github.com/some/repo", path="/z")
+        assert lock.pin(unpinned) is unpinned
+
+        zsh, tmux = prs.PRSystem.make("zsh"), prs.PRSystem.make("tmux")
+        assert lock.pin(zsh).spec.version == "5.8-6"
+        assert zsh.spec.version == "latest"
+        assert lock.pin(tmux) is tmux
+
+    def test_pinned(self):
+        zsh = prs.PRSystem.make("zsh")
+        assert lf.pinned(zsh) is zsh
+
+        pins = lf.LockFile(packages={"PRSystem": {"zsh": "5.8-6"}})
+        with Options.scoped(pins=pins):
+            assert lf.pinned(zsh).spec.version == "5.8-6"
+
+    def test_capture(self, local_repo):
+        commit_id = vc.current_commit_id(local_repo)
+        meta = types.SimpleNamespace(
+            gitrepo_installations=[
+                types.SimpleNamespace(
+                    requirement=req.GitRepoRequirement(
+                        url="https://github.com/some/repo", path=str(local_repo)
+                    )
+                ),
+                types.SimpleNamespace(
+                    requirement=req.GitRepoRequirement(
+                        url="https://github.com/some/missing", path="/not/cloned"
+                    )
+                ),
+            ],
+            package_installations=[],
+        )
+
+        lock = lf.LockFile.capture([meta])
+        assert lock.gitrepos == {
+            "https://github.com/some/repo": {str(local_repo): commit_id}
+        }
+
+    def test_capture_spellings(self, local_repo, tmp_path, monkeypatch):
+        """
+        Two spellings of one repo url checked out at two paths get two pins.
+        """
+        monkeypatch.setattr(env, "user_home", lambda: str(tmp_path))
+        other = tmp_path / "other"
+        subprocess.check_call(f"git clone -q {local_repo} {other}", shell=True)
+        meta = types.SimpleNamespace(
+            gitrepo_installations=[
+                types.SimpleNamespace(
+                    requirement=req.GitRepoRequirement(url=url, path=str(path))
+                )
+                for url, path in (
+                    ("https://github.com/some/repo.git", local_repo),
+                    ("git@github.com:some/repo", other),
+                )
+            ],
+            package_installations=[],
+        )
+
+        lock = lf.LockFile.capture([meta])
+        commit_id = vc.current_commit_id(local_repo)
+        assert lock.gitrepos == {
+            "https://github.com/some/repo": {
+                os.path.join("~", "local-repo"): commit_id,
+                os.path.join("~", "other"): commit_id,
+            }
+        }
+
+    def test_save_and_load(self, tmp_path):
+        lock = lf.LockFile(
+            gitrepos={"https://github.com/some/repo": {"~/repo": "abc123"}},
+            packages={"PRSystem": {"zsh": "5.8-6"}},
+        )
+        lock.save(tmp_path / "dofu.lock")
+        assert lf.LockFile.load(tmp_path / "dofu.lock") == lock
+
+
+class TestPinnedGitRepo:
+    def test_skip_update(self, local_repo, monkeypatch):
+        commit_id = vc.current_commit_id(local_repo)
+        requirement = req.GitRepoRequirement(
+            url="https://github.com/some/repo",
+            path=str(local_repo),
+            commit_id=commit_id[:7],
+        )
+        assert requirement.is_pinned_checked_out()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("the pinned repo must not be fetched")
+
+        monkeypatch.setattr(vc, "fetch", fail)
+        monkeypatch.setattr(vc, "checkout", fail)
+        requirement.update()
+
+        requirement.commit_id = "0" * 40
+        assert not requirement.is_pinned_checked_out()
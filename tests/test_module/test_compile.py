@@ -0,0 +1,103 @@
+import subprocess
+import sys
+
+import pytest
+
+from dofu import equipment as eqp, module, requirement as req
+from dofu.runner import CompiledPlan
+from tests.dummies import DummyPackageRequirement, UCDummy
+
+
+class TestCompiledPlan:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function")
+    def prepare_modules(self, tmp_path):
+        @module.Module.module("test-base")
+        class TestBaseModule(module.Module):
+            _package_requirements = [DummyPackageRequirement()]
+            _gitrepo_requirements = [
+                req.GitRepoRequirement(
+                    url="https://github.com/some/repo.git",
+                    path=str(tmp_path / "some-repo"),
+                ),
+            ]
+            _command_requirements = [UCDummy(content="base")]
+
+        @module.Module.module("test-top", requires=[TestBaseModule])
+        class TestTopModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                UCDummy(content="top-1"),
+                UCDummy(content="top-2"),
+            ]
+
+        yield TestBaseModule, TestTopModule
+
+    def test_compile(self, prepare_modules):
+        base, top = prepare_modules
+        plan = CompiledPlan.compile(["test-top"])
+
+        assert [compiled.name() for compiled in plan.modules] == [
+            "test-base",
+            "test-top",
+        ]
+        assert plan.modules[0].requires == []
+        assert plan.modules[1].requires == ["test-base"]
+        assert plan.modules[0].package_requirements() == base.package_requirements()
+        assert plan.modules[0].gitrepo_requirements() == base.gitrepo_requirements()
+        assert plan.modules[1].command_requirements() == top.command_requirements()
+        assert plan.modules[1].last_commit_id() == top.last_commit_id()
+
+    def test_save_and_load(self, tmp_path, prepare_modules):
+        plan = CompiledPlan.compile(["test-top"])
+        plan.save(tmp_path / "plan.yaml")
+
+        loaded = CompiledPlan.load(tmp_path / "plan.yaml")
+        assert [compiled.name() for compiled in loaded.modules] == [
+            "test-base",
+            "test-top",
+        ]
+        for compiled, loaded_compiled in zip(plan.modules, loaded.modules):
+            assert compiled.requires == loaded_compiled.requires
+            assert compiled.commit_id == loaded_compiled.commit_id
+            assert compiled.packages == loaded_compiled.packages
+            assert compiled.gitrepos == loaded_compiled.gitrepos
+            assert compiled.commands == loaded_compiled.commands
+
+    def test_apply(self, tmp_path, prepare_modules):
+        plan = CompiledPlan.compile(["test-top"])
+        # commands are applied without the repo, which needs network to clone
+        plan.modules[0].gitrepos.clear()
+        plan.save(tmp_path / "plan.yaml")
+
+        mngr = eqp.ModuleEquipmentManager()
+        CompiledPlan.load(tmp_path / "plan.yaml").apply(mngr)
+
+        assert sorted(mngr.meta) == ["test-base", "test-top"]
+        assert all(meta.installed for meta in mngr.meta.values())
+        assert [cmd.content for cmd in mngr.meta["test-top"].commands()] == [
+            "top-1",
+            "top-2",
+        ]
+
+    def test_runner_imports_no_registry(self):
+        heavy_modules = ["dofu.module", "dofu.modules", "fire", "networkx"]
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import sys, dofu.runner; "
+                f"print([m for m in {heavy_modules!r} if m in sys.modules])",
+            ],
+            encoding="utf-8",
+        )
+        assert output.strip() == "[]"
@@ -1,9 +1,52 @@
+import dataclasses
+import os
+import threading
+import typing as t
+
 import autoserde
 import pytest
 
-from dofu import equipment as eqp, module, requirement as req, undoable_commands as ucs
+from dofu import (
+    env,
+    equipment as eqp,
+    module,
+    requirement as req,
+    undoable_command as uc,
+    undoable_commands as ucs,
+)
+from dofu.options import Options, Strategy
 from tests.dummies import DummyPackageRequirement, UCDummy
 
+executed_contents: t.List[str] = []
+"""
+Contents of the executed recording commands in order.
+"""
+
+_executed_contents_lock = threading.Lock()
+
+
+@dataclasses.dataclass
+class UCRecording(uc.UndoableCommand):
+    content: str
+    ret: t.Optional[uc.ExecutionResult] = None
+
+    def cmdline(self) -> str:
+        return f'echo "uc-recording exec {self.content}"'
+
+    def _exec(self) -> uc.ExecutionResult:
+        with _executed_contents_lock:
+            executed_contents.append(self.content)
+        self.ret = self._success_result()
+        return self.ret
+
+    def _undo(self):
+        with _executed_contents_lock:
+            executed_contents.remove(self.content)
+        self.ret = None
+
+    def spec_tuple(self):
+        return (self.content,)
+
 
 class TestEquipmentSerde:
     @pytest.fixture(scope="function", autouse=True)
@@ -89,3 +132,307 @@ class TestEquipmentSerde:
         # deserialize
         loaded_mngr = eqp.ModuleEquipmentManager.load()
         assert mngr == loaded_mngr
+
+
+class TestEquipmentPipeline:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function", autouse=True)
+    def clean_records(self):
+        executed_contents.clear()
+        yield executed_contents
+        executed_contents.clear()
+
+    @pytest.fixture(scope="function", params=[1, 4])
+    def jobs(self, request):
+        old_value = Options.instance().jobs
+        Options.instance().jobs = request.param
+        yield request.param
+        Options.instance().jobs = old_value
+
+    @pytest.fixture(scope="function")
+    def prepare_modules(self):
+        @module.Module.module("base", requires=[])
+        class BaseModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [UCRecording("base-1"), UCRecording("base-2")]
+
+        @module.Module.module("top", requires=[BaseModule])
+        class TopModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [UCRecording("top-1")]
+
+        @module.Module.module("standalone", requires=[])
+        class StandaloneModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [UCRecording("standalone-1")]
+
+        yield BaseModule, TopModule, StandaloneModule
+
+    def test_equip_commands_after_dependencies(self, jobs, prepare_modules):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.equip(["top", "standalone"])
+
+        assert sorted(mngr.meta) == ["base", "standalone", "top"]
+        assert all(meta.installed for meta in mngr.meta.values())
+
+        assert sorted(executed_contents) == [
+            "base-1",
+            "base-2",
+            "standalone-1",
+            "top-1",
+        ]
+        assert executed_contents.index("base-1") < executed_contents.index("base-2")
+        assert executed_contents.index("base-2") < executed_contents.index("top-1")
+
+    def test_remove_dependents_first(self, jobs, prepare_modules):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.equip(["top", "standalone"])
+
+        mngr.remove(["base"])
+
+        assert sorted(mngr.meta) == ["standalone"]
+        assert executed_contents == ["standalone-1"]
+
+
+class TestEquipmentFingerprint:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function")
+    def equipped_stages(self, monkeypatch):
+        stages = []
+        equip_stage = eqp.ModuleEquipmentManager._equip_stage
+
+        def recording_equip_stage(self, module, stage, meta):
+            stages.append((module.name(), stage))
+            return equip_stage(self, module, stage, meta)
+
+        monkeypatch.setattr(
+            eqp.ModuleEquipmentManager, "_equip_stage", recording_equip_stage
+        )
+        yield stages
+
+    @pytest.fixture(scope="function")
+    def prepare_modules(self, tmp_path):
+        src = tmp_path / "src"
+        src.touch()
+
+        @module.Module.module("linked", requires=[])
+        class LinkedModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                ucs.UCSymlink(str(src), str(tmp_path / "dst")),
+            ]
+
+        yield LinkedModule, tmp_path / "dst"
+
+    def test_skip_unchanged(self, equipped_stages, prepare_modules):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["linked"])
+        assert mngr.meta["linked"].fingerprint is not None
+        assert len(equipped_stages) == 3
+
+        equipped_stages.clear()
+        mngr.sync(["linked"])
+        assert equipped_stages == []
+
+    def test_fingerprint_once_per_run(
+        self, equipped_stages, prepare_modules, monkeypatch
+    ):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["linked"])
+        equipped_stages.clear()
+
+        computed = []
+        module_fingerprint = eqp.fp.module_fingerprint
+        monkeypatch.setattr(
+            eqp.fp,
+            "module_fingerprint",
+            lambda m: computed.append(m) or module_fingerprint(m),
+        )
+        with Options.scoped(strategy=Strategy.ASK, prefetch=True):
+            mngr.sync(["linked"])
+        assert equipped_stages == []
+        assert len(computed) == 1
+
+    def test_resync_changed_target(self, equipped_stages, prepare_modules):
+        _, dst = prepare_modules
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["linked"])
+        fingerprint = mngr.meta["linked"].fingerprint
+
+        dst.unlink()
+        equipped_stages.clear()
+        mngr.sync(["linked"])
+        assert len(equipped_stages) == 3
+        assert mngr.meta["linked"].fingerprint != fingerprint
+
+    def test_repair_drifted_command(self, prepare_modules):
+        _, dst = prepare_modules
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["linked"])
+
+        dst.unlink()
+        mngr.sync(["linked"])
+        assert dst.is_symlink()
+        assert len(list(mngr.meta["linked"].commands())) == 1
+
+        # the repaired link is still undone on removal
+        mngr.remove(["linked"])
+        assert not os.path.lexists(dst)
+
+    def test_refresh(self, equipped_stages, prepare_modules):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["linked"])
+
+        equipped_stages.clear()
+        Options.instance().refresh = True
+        try:
+            mngr.sync(["linked"])
+        finally:
+            Options.instance().refresh = False
+        assert len(equipped_stages) == 3
+
+
+class TestEquipmentJournal:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function", autouse=True)
+    def clean_journal(self):
+        eqp._journal().truncate()
+        executed_contents.clear()
+        yield
+        eqp._journal().truncate()
+        executed_contents.clear()
+
+    @pytest.fixture(scope="function")
+    def prepare_module(self):
+        @module.Module.module("journaled", requires=[])
+        class JournaledModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [UCRecording("cmd-1"), UCRecording("cmd-2")]
+
+        yield JournaledModule
+
+    @staticmethod
+    def load_without_cache():
+        return eqp.ModuleEquipmentManager.load.__wrapped__()
+
+    def test_recover_interrupted_equip(self, prepare_module):
+        mngr = eqp.ModuleEquipmentManager()
+        meta = mngr._equipment_meta(prepare_module.name())
+
+        # mock an interrupted run, which has executed commands but never saved
+        mngr._sync_commands_step(prepare_module, meta)
+
+        recovered = self.load_without_cache()
+        assert recovered.meta["journaled"].len_commands == 2
+
+        # each command step is journaled as a delta instead of a snapshot
+        entries = list(eqp._journal().replay(eqp.ModuleEquipmentJournalEntry))
+        assert len(entries) == 2
+        assert all(entry.meta is None and entry.record for entry in entries)
+
+        mngr.meta["journaled"] = meta
+        mngr.save()
+        assert not os.path.exists(env.equipment_journal_file())
+
+    def test_recover_interrupted_remove(self, prepare_module):
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.equip(["journaled"])
+
+        # mock an interrupted run, which has undone the last command only
+        meta = mngr.meta["journaled"]
+        next(iter(meta.rollback_lazily()))
+        mngr._checkpoint(meta)
+
+        recovered = self.load_without_cache()
+        assert recovered.meta["journaled"].len_commands == 1
+
+        mngr._remove_module(prepare_module)
+        assert "journaled" not in self.load_without_cache().meta
+
+    def test_replay_steps(self):
+        Entry, Step = eqp.ModuleEquipmentJournalEntry, eqp.ModuleEquipmentJournalStep
+        git = eqp.GitRepoInstallationMetaInfo(
+            requirement=req.GitRepoRequirement(url="https://github.com/a/b", path="/x"),
+            used_existing=False,
+        )
+        moved = eqp.GitRepoInstallationMetaInfo(
+            requirement=req.GitRepoRequirement(url="https://github.com/a/b", path="/y"),
+            used_existing=False,
+        )
+        git_key, moved_key = eqp._installation_key(git), eqp._installation_key(moved)
+        transaction = eqp.ModuleEquipmentTransaction("abc")
+        commands = [UCRecording("cmd-1"), UCRecording("cmd-2")]
+
+        metas = {}
+        for entry in (
+            Entry("m", step=Step.GITREPO, key=git_key, gitrepo=git),
+            # the repo is moved to another path
+            Entry("m", step=Step.GITREPO, key=git_key, gitrepo=moved),
+            *(
+                Entry(
+                    "m",
+                    step=Step.TRANSACTION,
+                    key="0",
+                    transaction=transaction,
+                    record_index=i,
+                    record=command,
+                )
+                for i, command in enumerate(commands)
+            ),
+        ):
+            entry.replay(metas)
+
+        meta = metas["m"]
+        assert meta.gitrepo_installations == [moved]
+        assert list(meta.commands()) == commands
+
+        # the steps undoing them are replayed as well
+        for entry in (
+            Entry(
+                "m",
+                step=Step.TRANSACTION,
+                key="0",
+                transaction=transaction,
+                record_index=0,
+            ),
+            Entry("m", step=Step.GITREPO, key=moved_key),
+        ):
+            entry.replay(metas)
+        assert list(meta.commands()) == commands[1:]
+        assert meta.gitrepo_installations == []
+
+        Entry("m", step=Step.TRANSACTION, key="0").replay(metas)
+        assert meta.transactions == []
+        Entry("m").replay(metas)
+        assert "m" not in metas
@@ -3,7 +3,7 @@ import subprocess
 
 import pytest
 
-from dofu import equipment as eqp, module, undoable_commands as ucs
+from dofu import equipment as eqp, module, timing, undoable_commands as ucs
 
 
 class TestEquipmentSyncCommands:
@@ -140,14 +140,13 @@ class TestEquipmentSyncCommands:
         mngr = eqp.ModuleEquipmentManager()
         mngr.sync(["test-one-module"])
 
-        # mock the env broken -- some traced file is deleted for unknown reason
-        # this will cause the following command failed
-        os.unlink(tmp_path / "test-config-link")
-
+        # mock the env broken -- some untraced file is missing for unknown reason
+        # this will cause the following command failed, since only the drifted
+        # traced files can be repaired
         # change the commands while preserving the first two steps
         prepare_module._command_requirements.append(
             ucs.UCMove(
-                tmp_path / "test-config-link",
+                tmp_path / "test-config-missing",
                 tmp_path / "test-config-moved",
             )
         )
@@ -157,3 +156,144 @@ class TestEquipmentSyncCommands:
         meta = mngr.meta["test-one-module"]
         assert meta.len_commands == 3
         assert len(meta.transactions) == 1
+
+        # the failed attempt is never taken for a duration of the command
+        failed = prepare_module._command_requirements[-1]
+        key = timing.action_key(timing.Action.EXEC, failed.cmdline())
+        assert timing.TimingStore.instance().estimate(key) is None
+
+    def test_sync_with_changed_middle_step(self, tmp_path, prepare_module):
+        # install test-one-module
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module"])
+
+        # change the link only, the backup-mv after it is not affected
+        prepare_module._command_requirements[1] = ucs.UCSymlink(
+            src=tmp_path / "test-config-dir.dofu.bak",
+            dst=tmp_path / "test-config-link-changed",
+        )
+        mngr.sync(["test-one-module"])
+        meta = mngr.meta["test-one-module"]
+
+        # assert only the link is undone and executed again
+        assert meta.len_commands == 3
+        assert len(meta.transactions) == 2
+        assert meta.transactions[0].len == 2
+        assert meta.transactions[0].effect_len == 2
+        assert meta.transactions[1].len == 1
+
+        assert not os.path.exists(tmp_path / "test-config-link")
+        assert os.path.islink(tmp_path / "test-config-link-changed")
+        assert os.path.isdir(tmp_path / "test-config-dir.dofu.bak")
+
+    def test_bisect(self, tmp_path, prepare_module):
+        # install test-one-module
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module"])
+        meta = mngr.meta["test-one-module"]
+
+        # the link is the bad command
+        index = mngr.bisect(
+            "test-one-module",
+            lambda: not os.path.islink(tmp_path / "test-config-link"),
+        )
+        assert index == 1
+
+        # assert all the commands are applied again
+        assert meta.len_commands == 3
+        assert meta.transactions[0].rollback_cursor == -1
+        assert os.path.islink(tmp_path / "test-config-link")
+        assert os.path.isdir(tmp_path / "test-config-dir.dofu.bak")
+
+    def test_bisect_not_broken(self, tmp_path, prepare_module):
+        # install test-one-module
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module"])
+
+        assert mngr.bisect("test-one-module", lambda: True) is None
+        assert mngr.bisect("test-one-module", lambda: False) is None
+        assert mngr.meta["test-one-module"].len_commands == 3
+
+    def test_scan_conflicts(self, tmp_path, prepare_module, monkeypatch):
+        # occupy the destination of the link
+        (tmp_path / "test-config-link").write_text("occupied")
+
+        mngr = eqp.ModuleEquipmentManager()
+        conflicts = mngr.scan_conflicts([prepare_module])
+        assert [ensure.decision_key() for ensure in conflicts] == [
+            str(tmp_path / "test-config-link")
+        ]
+
+        # decide to overwrite it ahead, so that no prompt blocks the sync
+        options = eqp.Options.instance()
+        monkeypatch.setattr(options, "strategy", eqp.Strategy.ASK)
+        monkeypatch.setattr(
+            options,
+            "decisions",
+            {str(tmp_path / "test-config-link"): eqp.Strategy.FORCE},
+        )
+        mngr.sync(["test-one-module"])
+
+        assert os.path.islink(tmp_path / "test-config-link")
+        assert mngr.scan_conflicts([prepare_module]) == []
+
+    def test_clash_with_other_module(self, tmp_path, prepare_module):
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-other-module")
+        class TestOtherModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                ucs.UCMkdir(path=tmp_path / "test-config-dir"),
+                ucs.UCSymlink(
+                    src=tmp_path / "other-config-dir",
+                    dst=tmp_path / "test-config-link",
+                ),
+            ]
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module"])
+        assert mngr.ownership.lookup(tmp_path / "test-config-link").command == 1
+
+        # the same directory is fine, but the link clashes
+        with pytest.raises(ValueError, match="1 paths are managed by multiple"):
+            mngr.equip(["test-other-module"])
+        assert "test-other-module" not in mngr.meta
+
+
+class TestDiffCommands:
+    def test_keep_unchanged_commands(self, tmp_path):
+        installed = [
+            ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / f"link-{i}")
+            for i in range(5)
+        ]
+        required = [
+            ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / f"link-{i}")
+            for i in range(5)
+        ]
+        required[2] = ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / "link-new")
+
+        withdrawn, fresh = eqp.diff_commands(installed, required)
+        assert withdrawn == [installed[2]]
+        assert fresh == [required[2]]
+
+    def test_redo_commands_after_inserted_parent(self, tmp_path):
+        mkdir = ucs.UCMkdir(path=tmp_path / "dir")
+        link = ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / "dir" / "link")
+        other = ucs.UCMkdir(path=tmp_path / "other")
+        parent = ucs.UCMkdir(path=tmp_path)
+
+        withdrawn, fresh = eqp.diff_commands(
+            [mkdir, link, other], [parent, mkdir, link, other]
+        )
+        assert withdrawn == [mkdir, link, other]
+        assert fresh == [parent, mkdir, link, other]
+
+    def test_redo_reordered_commands(self, tmp_path):
+        mkdir = ucs.UCMkdir(path=tmp_path / "dir")
+        link = ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / "dir" / "link")
+        other = ucs.UCMkdir(path=tmp_path / "other")
+
+        withdrawn, fresh = eqp.diff_commands([mkdir, link, other], [link, mkdir, other])
+        assert withdrawn == [mkdir, link]
+        assert fresh == [link, mkdir]
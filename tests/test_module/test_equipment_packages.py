@@ -9,7 +9,9 @@ from dofu import (
     package_manager as pm,
     platform as pf,
     requirement as req,
+    sharing,
     specification as sp,
+    target as tg,
 )
 
 
@@ -358,6 +360,126 @@ class TestEquipmentSyncPackages:
         assert installation is None
         assert other_pkg_requirement.command not in error_env.commands
 
+    @classmethod
+    def test_share_package_across_modules(cls, clean_env: ExecEnv):
+        """
+        Test that a package required by two modules is installed only once,
+        and uninstalled only when the last module requiring it is removed.
+        """
+        one_pkg_requirement = TestOnePackageRequirement()
+
+        @module.Module.module("test-one-module")
+        class TestOneModule(module.Module):
+            _package_requirements = [TestOnePackageRequirement()]
+            _gitrepo_requirements = []
+            _command_requirements = []
+
+        @module.Module.module("test-other-module")
+        class TestOtherModule(module.Module):
+            _package_requirements = [TestOnePackageRequirement()]
+            _gitrepo_requirements = []
+            _command_requirements = []
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module", "test-other-module"])
+
+        # check that the shared package is installed only once
+        assert clean_env.commands == [one_pkg_requirement.command]
+
+        # check that the shared package survives removing the first module
+        mngr.remove(["test-one-module"])
+        assert clean_env.commands == [one_pkg_requirement.command]
+
+        # check that the ownership is handed over to the remaining module
+        meta = mngr.meta["test-other-module"]
+        installation = get_installation(meta, one_pkg_requirement)
+        assert installation.used_existing == False
+        assert installation.manager is not None
+
+        # check that the shared package is uninstalled with its last user
+        mngr.remove(["test-other-module"])
+        assert clean_env.commands == []
+
+    @classmethod
+    def test_remove_modules_sharing_package(cls, clean_env: ExecEnv):
+        """
+        Test that a package shared by modules removed at the same time
+        is never handed over to any of them, but uninstalled.
+        """
+        one_pkg_requirement = TestOnePackageRequirement()
+
+        @module.Module.module("test-one-module")
+        class TestOneModule(module.Module):
+            _package_requirements = [TestOnePackageRequirement()]
+            _gitrepo_requirements = []
+            _command_requirements = []
+
+        @module.Module.module("test-other-module")
+        class TestOtherModule(module.Module):
+            _package_requirements = [TestOnePackageRequirement()]
+            _gitrepo_requirements = []
+            _command_requirements = []
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-one-module", "test-other-module"])
+        user, owner = sorted(
+            (
+                (meta, get_installation(meta, one_pkg_requirement))
+                for meta in mngr.meta.values()
+            ),
+            key=lambda held: held[1].manager is not None,
+        )
+        assert owner[1].manager is not None and user[1].manager is None
+
+        # the user releases first but is not forgotten yet, as in a concurrent wave
+        mngr._removing = {"test-one-module", "test-other-module"}
+        mngr._release_package(*user)
+        mngr._release_package(*owner)
+        assert user[1].manager is None
+        assert clean_env.commands == []
+
+    @classmethod
+    def test_share_package_across_targets(cls, clean_env: ExecEnv, monkeypatch):
+        """
+        Test that a package installed once for several targets is owned
+        by the first target, so that removing it from the targets uninstalls it.
+        """
+        one_pkg_requirement = TestOnePackageRequirement()
+
+        @module.Module.module("test-one-module")
+        class TestOneModule(module.Module):
+            _package_requirements = [TestOnePackageRequirement()]
+            _gitrepo_requirements = []
+            _command_requirements = []
+
+        managers = tg.install_shared_packages([TestOneModule])
+        assert clean_env.commands == [one_pkg_requirement.command]
+
+        # the first target is run with the packages handed over
+        monkeypatch.setenv(sharing.HANDOVER_ENV_VAR, sharing.encode_handover(managers))
+        first = eqp.ModuleEquipmentManager()
+        first.sync(["test-one-module"])
+        monkeypatch.delenv(sharing.HANDOVER_ENV_VAR)
+
+        other = eqp.ModuleEquipmentManager()
+        other.sync(["test-one-module"])
+
+        installation = get_installation(
+            first.meta["test-one-module"], one_pkg_requirement
+        )
+        assert installation.used_existing == False
+        assert installation.manager is not None
+        installation = get_installation(
+            other.meta["test-one-module"], one_pkg_requirement
+        )
+        assert installation.used_existing == True
+
+        # the package is uninstalled once removed from all the targets
+        other.remove(["test-one-module"])
+        assert clean_env.commands == [one_pkg_requirement.command]
+        first.remove(["test-one-module"])
+        assert clean_env.commands == []
+
 
 def get_installation(
     meta: eqp.ModuleEquipmentMetaInfo, requirement: req.PackageRequirement
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from dofu import env, generation as gen, module, undoable_commands as ucs
+
+
+class TestGeneration:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function")
+    def prepare_modules(self, tmp_path):
+        """
+        Prepare two modules managing different paths under the user home.
+        """
+        home = env.user_home()
+        (tmp_path / "rc").write_text("rc")
+
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-gen-server")
+        class TestGenServer(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                ucs.UCMkdir(path=os.path.join(home, "test-gen-dir")),
+                ucs.UCSymlink(
+                    src=tmp_path / "rc",
+                    dst=os.path.join(home, "test-gen-dir", "rc"),
+                ),
+            ]
+
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-gen-workstation")
+        class TestGenWorkstation(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                ucs.UCSymlink(
+                    src=tmp_path / "rc",
+                    dst=os.path.join(home, "test-gen-rc"),
+                ),
+            ]
+
+        yield home
+
+    def test_build(self, prepare_modules):
+        generation = gen.Generation.build("test-server", ["test-gen-server"])
+
+        assert generation.anchors == ["test-gen-dir"]
+        assert os.path.isdir(generation.tree_path("test-gen-dir"))
+        assert os.path.islink(generation.tree_path("test-gen-dir", "rc"))
+
+        # assert the user home is not touched
+        assert not os.path.lexists(os.path.join(prepare_modules, "test-gen-dir"))
+        assert gen.Generation.load("test-server") == generation
+
+    def test_switch(self, prepare_modules):
+        home = prepare_modules
+        server = gen.Generation.build("test-server", ["test-gen-server"])
+        workstation = gen.Generation.build("test-workstation", ["test-gen-workstation"])
+
+        server.switch()
+        assert gen.Generation.current() == server
+        with open(os.path.join(home, "test-gen-dir", "rc")) as file:
+            assert file.read() == "rc"
+
+        workstation.switch()
+        assert gen.Generation.current() == workstation
+        assert gen.Generation.previous() == server
+        assert not os.path.lexists(os.path.join(home, "test-gen-dir"))
+        with open(os.path.join(home, "test-gen-rc")) as file:
+            assert file.read() == "rc"
+
+        # switch back to the previous generation
+        gen.Generation.previous().switch()
+        assert gen.Generation.current() == server
+        assert os.path.isfile(os.path.join(home, "test-gen-dir", "rc"))
+        assert not os.path.lexists(os.path.join(home, "test-gen-rc"))
+
+    def test_roll_back_failed_switch(self, prepare_modules, monkeypatch):
+        home = prepare_modules
+
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-gen-extra")
+        class TestGenExtra(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [
+                ucs.UCMkdir(path=os.path.join(home, "test-gen-extra")),
+            ]
+
+        extra = gen.Generation.build("test-rollback-extra", ["test-gen-extra"])
+        both = gen.Generation.build(
+            "test-rollback-both", ["test-gen-server", "test-gen-workstation"]
+        )
+        assert both.anchors == ["test-gen-dir", "test-gen-rc"]
+
+        extra.switch()
+        previous = gen.Generation.previous()
+
+        symlink = gen.shutils.symlink
+
+        def fail_on_rc(src, dst, *args, **kwargs):
+            if dst.endswith("test-gen-rc"):
+                raise OSError("no space left on device")
+            return symlink(src, dst, *args, **kwargs)
+
+        monkeypatch.setattr(gen.shutils, "symlink", fail_on_rc)
+        with pytest.raises(OSError):
+            both.switch()
+
+        # the anchor linked before the failure is unlinked, and the old one stays live
+        assert not os.path.lexists(os.path.join(home, "test-gen-dir"))
+        assert not os.path.lexists(os.path.join(home, "test-gen-rc"))
+        assert gen.Generation.current() == extra
+        assert os.path.isdir(os.path.join(home, "test-gen-extra"))
+        assert gen.Generation.previous() == previous
+
+    def test_rebuild_live_generation(self, prepare_modules):
+        gen.Generation.build("test-live", ["test-gen-server"]).switch()
+
+        with pytest.raises(ValueError, match="live generation"):
+            gen.Generation.build("test-live", ["test-gen-server"])
@@ -0,0 +1,142 @@
+import json
+import subprocess
+
+import pytest
+
+from dofu import equipment as eqp, module, requirement as req, timing
+from dofu.options import Options
+from dofu.plan import Plan
+from dofu.timing import Action
+from tests.dummies import DummyPackageRequirement, UCDummy
+
+
+class TestPlan:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function")
+    def prepare_module(self, tmp_path):
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-plan-module")
+        class TestPlanModule(module.Module):
+            _package_requirements = [
+                DummyPackageRequirement(),
+            ]
+            _gitrepo_requirements = [
+                req.GitRepoRequirement(
+                    url="https://github.com/sarcasticadmin/empty-repo",
+                    path=str(tmp_path / "dummy-repo"),
+                ),
+            ]
+            _command_requirements = [
+                UCDummy(content="first"),
+                UCDummy(content="second"),
+            ]
+
+        yield TestPlanModule
+
+    def test_plan_fresh_equip(self, prepare_module):
+        plan = Plan.resolve_sync(eqp.ModuleEquipmentManager(), ["test-plan-module"])
+
+        assert [(a.action, a.target) for a in plan.actions] == [
+            (Action.INSTALL, "dummy-pkg:latest"),
+            (Action.CLONE, "https://github.com/sarcasticadmin/empty-repo"),
+            (Action.EXEC, 'echo "uc-dummy exec first"'),
+            (Action.EXEC, 'echo "uc-dummy exec second"'),
+        ]
+        assert all(a.module_name == "test-plan-module" for a in plan.actions)
+
+    def test_plan_changed_commands(self, prepare_module):
+        mngr = eqp.ModuleEquipmentManager()
+        meta = mngr._equipment_meta("test-plan-module")
+        with meta.transaction() as transaction:
+            transaction.records.extend(
+                [UCDummy(content="first"), UCDummy(content="withdrawn")]
+            )
+        mngr.meta[meta.module_name] = meta
+
+        plan = Plan.resolve_sync(mngr, ["test-plan-module"])
+
+        commands = [(a.action, a.target) for a in plan.actions][2:]
+        assert commands == [
+            (Action.UNDO, 'echo "uc-dummy exec withdrawn"'),
+            (Action.EXEC, 'echo "uc-dummy exec second"'),
+        ]
+
+    def test_plan_estimate(self, prepare_module):
+        store = timing.TimingStore.instance()
+        key = timing.action_key(Action.INSTALL, "dummy-pkg:latest")
+        store.record(key, 2.0)
+
+        try:
+            plan = Plan.resolve_sync(eqp.ModuleEquipmentManager(), ["test-plan-module"])
+
+        finally:
+            del store.durations[key]
+
+        assert plan.actions[0].estimate == 2.0
+        assert plan.estimate == 2.0
+        assert plan.len_unestimated == len(plan.actions) - 1
+
+        dumped = json.loads(plan.to_json())
+        assert dumped["actions"][0]["estimate"] == 2.0
+
+    def test_plan_unchanged_module(self, tmp_path):
+        upstream = tmp_path / "upstream"
+        upstream.mkdir()
+        for sh in (
+            "git init -q",
+            "git -c user.name=test -c user.email=test@test"
+            " commit -q --allow-empty -m init",
+        ):
+            subprocess.check_call(sh, shell=True, cwd=upstream)
+
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-plan-unchanged")
+        class TestPlanUnchanged(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = [
+                req.GitRepoRequirement(
+                    url=upstream.as_uri(), path=str(tmp_path / "clone")
+                ),
+            ]
+            _command_requirements = [UCDummy(content="only")]
+
+        mngr = eqp.ModuleEquipmentManager()
+        mngr.sync(["test-plan-unchanged"])
+
+        # the sync skips the module, and so does the plan
+        assert Plan.resolve_sync(mngr, ["test-plan-unchanged"]).actions == []
+
+        with Options.scoped(refresh=True):
+            plan = Plan.resolve_sync(mngr, ["test-plan-unchanged"])
+        assert [(a.action, a.target) for a in plan.actions] == [
+            (Action.FETCH, upstream.as_uri()),
+        ]
+
+    def test_plan_pinned_gitrepo(self, prepare_module, monkeypatch):
+        mngr = eqp.ModuleEquipmentManager()
+        meta = mngr._equipment_meta("test-plan-module")
+        meta.gitrepo_installations.extend(
+            eqp.GitRepoInstallationMetaInfo(
+                requirement=requirement, used_existing=False
+            )
+            for requirement in prepare_module.gitrepo_requirements()
+        )
+        mngr.meta[meta.module_name] = meta
+
+        plan = Plan.resolve_sync(mngr, ["test-plan-module"])
+        assert Action.FETCH in [a.action for a in plan.actions]
+
+        # nothing is fetched for a repo checked out at its pinned commit
+        monkeypatch.setattr(
+            req.GitRepoRequirement, "is_pinned_checked_out", lambda self: True
+        )
+        plan = Plan.resolve_sync(mngr, ["test-plan-module"])
+        assert Action.FETCH not in [a.action for a in plan.actions]
@@ -172,6 +172,39 @@ class TestModuleRegistration:
         blueprint = MRM.resolve_remove_blueprint(["another", "one-more", "another"])
         assert blueprint == [TestOneMoreModule, TestAnotherModule]
 
+    def test_resolve_dependencies(self, graph):
+        @Module.module("test")
+        class TestModule(Module):
+            pass
+
+        @Module.module("other", requires=[TestModule])
+        class TestOtherModule(Module):
+            pass
+
+        @Module.module("another", requires=[TestModule])
+        class TestAnotherModule(Module):
+            pass
+
+        blueprint = MRM.resolve_equip_blueprint(["other", "another"])
+        dependencies = MRM.resolve_dependencies(blueprint)
+        assert list(dependencies) == blueprint
+        assert dependencies[TestModule] == []
+        assert dependencies[TestOtherModule] == [TestModule]
+        assert dependencies[TestAnotherModule] == [TestModule]
+
+        blueprint = MRM.resolve_remove_blueprint(["test"])
+        dependencies = MRM.resolve_dependencies(blueprint, reverse=True)
+        assert list(dependencies) == blueprint
+        assert sorted(dependencies[TestModule], key=blueprint.index) == [
+            module for module in blueprint if module is not TestModule
+        ]
+        assert dependencies[TestOtherModule] == []
+        assert dependencies[TestAnotherModule] == []
+
+        blueprint = MRM.resolve_remove_blueprint(["other"])
+        dependencies = MRM.resolve_dependencies(blueprint, reverse=True)
+        assert dependencies == {TestOtherModule: []}
+
     def test_module_meta_by_name(self, graph):
         @Module.module("test")
         class TestModule(Module):
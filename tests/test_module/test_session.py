@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from dofu import env, module, undoable_commands as ucs
+from dofu.options import Options, Strategy
+from dofu.session import Session
+
+
+class TestSession:
+    @pytest.fixture(scope="function", autouse=True)
+    def graph(self, registration_preserver):
+        """
+        This fixture is responsible to provide a clean graph for each test.
+
+        Any registration happened during the test will be removed after the test.
+        """
+        yield registration_preserver
+
+    @pytest.fixture(scope="function")
+    def prepare_module(self):
+        """
+        Prepare a module making a directory under the user home.
+        """
+        path = os.path.join(env.user_home(), "test-session-dir")
+
+        # noinspection PyUnusedLocal
+        @module.Module.module("test-session")
+        class TestSessionModule(module.Module):
+            _package_requirements = []
+            _gitrepo_requirements = []
+            _command_requirements = [ucs.UCMkdir(path=path)]
+
+        yield path
+
+        Session(strategy=Strategy.AUTO).remove(["test-session"])
+
+    def test_equip_and_verify(self, prepare_module):
+        session = Session(strategy=Strategy.AUTO)
+        plan = session.plan(["test-session"])
+        assert session.plan(["test-session"]) is plan
+
+        session.equip(["test-session"])
+        assert os.path.isdir(prepare_module)
+        assert "test-session" in session.equipped_module_names()
+        assert session.verify(["test-session"]) == {"test-session": []}
+
+        # the plan is resolved again after equipping
+        assert session.plan(["test-session"]) is not plan
+
+        os.chmod(prepare_module, 0o700)
+        assert session.verify(["test-session"])["test-session"]
+
+    def test_dry_run(self, prepare_module):
+        session = Session(dry_run=True, strategy=Strategy.AUTO)
+        session.equip(["test-session"])
+
+        assert not os.path.exists(prepare_module)
+        assert "test-session" not in session.equipped_module_names()
+        assert not Options.instance().dry_run
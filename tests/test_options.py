@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from dofu import utils
+from dofu.options import Options, Strategy
+
+
+class TestOptions:
+    def test_scoped(self):
+        default = Options.instance()
+        with Options.scoped(dry_run=True, strategy=Strategy.FORCE) as options:
+            assert Options.instance() is options
+            assert options.dry_run and options.strategy == Strategy.FORCE
+            assert options.jobs == default.jobs
+
+            options.decisions["/a"] = Strategy.AUTO
+            assert "/a" not in default.decisions
+
+        assert Options.instance() is default
+
+    def test_scoped_in_threads(self):
+        barrier = threading.Barrier(2)
+        seen = {}
+
+        def run(dry_run):
+            with Options.scoped(dry_run=dry_run):
+                # both scopes are entered before either is checked
+                barrier.wait()
+                with utils.ContextExecutor(max_workers=2) as executor:
+                    seen[dry_run] = list(
+                        executor.map(lambda _: Options.instance().dry_run, range(4))
+                    )
+
+        threads = [threading.Thread(target=run, args=(v,)) for v in (True, False)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert seen == {True: [True] * 4, False: [False] * 4}
+
+    def test_scoped_in_tasks(self):
+        async def run(dry_run):
+            with Options.scoped(dry_run=dry_run):
+                await asyncio.sleep(0)
+                return Options.instance().dry_run
+
+        async def main():
+            return await asyncio.gather(run(True), run(False))
+
+        assert asyncio.run(main()) == [True, False]
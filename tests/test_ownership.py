@@ -0,0 +1,52 @@
+import os
+
+from dofu import equipment as eqp, ownership as own, undoable_commands as ucs
+
+
+def make_meta(module_name, *commands):
+    return eqp.ModuleEquipmentMetaInfo(
+        module_name=module_name,
+        package_installations=[],
+        gitrepo_installations=[],
+        transactions=[
+            eqp.ModuleEquipmentTransaction(commit_id="test", records=list(commands))
+        ],
+    )
+
+
+class TestOwnershipIndex:
+    def test_lookup(self, tmp_path):
+        link = ucs.UCSymlink(src=tmp_path / "src", dst=tmp_path / "link")
+        move = ucs.UCMove(tmp_path / "moved-from", tmp_path / "moved-to")
+
+        index = own.OwnershipIndex()
+        index.update(make_meta("test-a", link, move))
+
+        owner = index.lookup(tmp_path / "link")
+        assert owner == own.Owner("test-a", link.cmdline(), 0, 0)
+        assert index.lookup(tmp_path / "moved-to").command == 1
+
+        # the path moved away is not owned
+        assert index.lookup(tmp_path / "moved-from") is None
+
+    def test_update_and_remove(self, tmp_path):
+        index = own.OwnershipIndex()
+        meta = make_meta("test-a", ucs.UCMkdir(path=tmp_path / "a"))
+        index.update(meta)
+
+        meta.transactions[0].records = [ucs.UCMkdir(path=tmp_path / "b")]
+        index.update(meta)
+        assert index.lookup(tmp_path / "a") is None
+        assert index.lookup(tmp_path / "b").module_name == "test-a"
+
+        index.update(meta, removed=True)
+        assert len(index) == 0
+
+    def test_save_and_load(self, tmp_path):
+        index = own.OwnershipIndex()
+        index.update(make_meta("test-a", ucs.UCMkdir(path=tmp_path / "a")))
+        index.save(tmp_path / "ownership.json")
+
+        loaded = own.OwnershipIndex.load(tmp_path / "ownership.json")
+        assert loaded.items() == index.items()
+        assert os.path.isfile(tmp_path / "ownership.json")
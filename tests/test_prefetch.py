@@ -0,0 +1,112 @@
+import dataclasses
+import subprocess
+import typing as t
+
+import pytest
+
+from dofu import (
+    mirrors,
+    platform as pf,
+    prefetch as pft,
+    requirement as req,
+    version_control as vc,
+)
+from dofu.package_manager import PackageManager
+
+
+def commit(path, message: str):
+    subprocess.check_call(
+        "git -c user.name=test -c user.email=test@test"
+        f" commit -q --allow-empty -m {message}",
+        shell=True,
+        cwd=path,
+    )
+
+
+@pytest.fixture(scope="function")
+def upstream(tmp_path):
+    """
+    A local repo standing for the upstream, which needs no network.
+    """
+    path = tmp_path / "upstream"
+    path.mkdir()
+    subprocess.check_call("git init -q", shell=True, cwd=path)
+    commit(path, "init")
+    return path
+
+
+@dataclasses.dataclass
+class RecordingPackageManager(PackageManager):
+    prefetched: t.List[str] = dataclasses.field(default_factory=list)
+
+    def install(self, spec):
+        pass
+
+    def uninstall(self, spec):
+        pass
+
+    def update(self, spec):
+        pass
+
+    def is_available(self) -> bool:
+        return True
+
+    def prefetch(self, specs):
+        self.prefetched.extend(spec.package for spec in specs)
+
+
+_manager = RecordingPackageManager()
+
+
+class RecordingPackageRequirement(req.PackageRequirement):
+    _pkg_manager_candidates = {pf.ANY: _manager}
+
+
+class TestMirrors:
+    def test_clone_and_fetch_from_mirror(self, upstream, tmp_path):
+        url = upstream.as_uri()
+        mirror = mirrors.update_mirror(url)
+        requirement = req.GitRepoRequirement(url=url, path=str(tmp_path / "a"))
+
+        with mirrors.using({url: mirror}):
+            requirement.install()
+        assert vc.remote_get_url(repo_path=requirement.path) == url
+        assert vc.current_commit_id(requirement.path) == vc.current_commit_id(upstream)
+
+        # the new commit is fetched from the updated mirror
+        commit(upstream, "next")
+        mirrors.update_mirror(url)
+        with mirrors.using({url: mirror}):
+            requirement.update()
+        assert vc.last_commit_id_of(
+            repo_path=requirement.path, revision="origin/HEAD"
+        ) == vc.current_commit_id(upstream)
+
+    def test_not_mirrored(self):
+        url = "https://github.com/some/repo"
+        assert mirrors.local_url(url) is None
+        with mirrors.using({url: mirrors.mirror_path(url)}):
+            assert mirrors.local_url(url).startswith("file://")
+
+
+class TestPrefetch:
+    def test_prefetch(self, upstream, tmp_path):
+        url = upstream.as_uri()
+
+        class DummyModule:
+            @classmethod
+            def gitrepo_requirements(cls):
+                return [req.GitRepoRequirement(url=url, path=str(tmp_path / "b"))]
+
+            @classmethod
+            def package_requirements(cls):
+                return [
+                    RecordingPackageRequirement.make("a", command="dofu-no-such-a"),
+                    RecordingPackageRequirement.make("b", command="dofu-no-such-b"),
+                    # installed already
+                    RecordingPackageRequirement.make("c", command="git"),
+                ]
+
+        _manager.prefetched.clear()
+        assert pft.prefetch([DummyModule]) == {url: mirrors.mirror_path(url)}
+        assert _manager.prefetched == ["a", "b"]
@@ -0,0 +1,59 @@
+import os
+
+from dofu import client, env, sandbox as sbx
+from dofu.sandbox import Sandbox
+
+
+class TestSandbox:
+    def test_create_and_discard(self):
+        home = env.user_home()
+        with open(os.path.join(home, ".test-sandbox-rc"), "w") as file:
+            file.write("rc")
+        os.makedirs(os.path.join(home, "test-sandbox-visible"), exist_ok=True)
+
+        sandbox = Sandbox.create()
+
+        # assert only the dotfiles are copied
+        with open(os.path.join(sandbox.home, ".test-sandbox-rc")) as file:
+            assert file.read() == "rc"
+        assert not os.path.exists(os.path.join(sandbox.home, "test-sandbox-visible"))
+
+        # assert the processes run in the sandbox see it as their home
+        environ = sandbox.environ()
+        assert environ["HOME"] == sandbox.home
+        assert environ[env.CACHE_ROOT_ENV_VAR] == sandbox.cache_root
+        assert environ[client.NO_DAEMON_ENV_VAR] == "1"
+        assert sandbox.run(["sh", "-c", 'test "$PWD" = "$HOME"']) == 0
+
+        # assert the sandbox is gone at once
+        sandbox.discard()
+        assert not os.path.exists(sandbox.path)
+
+        # assert the real home is untouched
+        assert os.path.isfile(os.path.join(home, ".test-sandbox-rc"))
+
+    def test_create_without_reflinks(self, monkeypatch):
+        home = env.user_home()
+        for name in (".test-sandbox-touched", ".test-sandbox-untouched"):
+            os.makedirs(os.path.join(home, name), exist_ok=True)
+            with open(os.path.join(home, name, "rc"), "w") as file:
+                file.write("rc")
+
+        monkeypatch.setattr(sbx, "_copies_with_reflinks", lambda srcs, directory: False)
+        sandbox = Sandbox.create([os.path.join(home, ".test-sandbox-touched", "rc")])
+
+        # assert only the dotfiles touched are copied in full
+        assert os.path.isfile(os.path.join(sandbox.home, ".test-sandbox-touched", "rc"))
+        assert not os.path.exists(os.path.join(sandbox.home, ".test-sandbox-untouched"))
+        sandbox.discard()
+
+    def test_copies_with_reflinks(self, tmp_path):
+        src = tmp_path / "src"
+        src.mkdir()
+        # nothing to copy in full
+        assert sbx._copies_with_reflinks([str(src)], str(tmp_path))
+
+        (src / "file").write_text("content")
+        supported = sbx._copies_with_reflinks([str(src)], str(tmp_path))
+        assert isinstance(supported, bool)
+        assert not os.path.exists(tmp_path / ".reflink-probe")
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from dofu.scheduler import DagScheduler
+
+
+class TestDagScheduler:
+    def test_run_sequentially_in_given_order(self):
+        dependencies = {
+            "a": [],
+            "b": ["a"],
+            "c": [],
+            "d": ["b", "c"],
+        }
+
+        visited = []
+        DagScheduler(dependencies, jobs=1).run(visited.append)
+        assert visited == ["a", "b", "c", "d"]
+
+    def test_run_after_dependencies(self):
+        dependencies = {
+            "a": [],
+            "b": ["a"],
+            "c": ["a"],
+            "d": ["b", "c"],
+            "e": [],
+        }
+
+        visited = []
+        lock = threading.Lock()
+
+        def visit(node):
+            with lock:
+                assert all(dep in visited for dep in dependencies[node])
+                visited.append(node)
+
+        DagScheduler(dependencies, jobs=4).run(visit)
+        assert sorted(visited) == ["a", "b", "c", "d", "e"]
+
+    def test_run_independent_nodes_concurrently(self):
+        dependencies = {"a": [], "b": [], "c": []}
+
+        # each node waits for the others, which only passes if run concurrently
+        barrier = threading.Barrier(len(dependencies), timeout=5)
+        DagScheduler(dependencies, jobs=3).run(lambda _: barrier.wait())
+
+    def test_ignore_dependencies_out_of_graph(self):
+        visited = []
+        DagScheduler({"a": ["x"], "b": ["a"]}, jobs=2).run(visited.append)
+        assert visited == ["a", "b"]
+
+    @pytest.mark.parametrize("jobs", [1, 3])
+    def test_stop_scheduling_once_failed(self, jobs):
+        dependencies = {
+            "a": [],
+            "b": ["a"],
+            "c": ["b"],
+        }
+
+        visited = []
+
+        def visit(node):
+            visited.append(node)
+            if node == "b":
+                raise RuntimeError(f"failed to visit {node}")
+
+        with pytest.raises(RuntimeError, match="failed to visit b"):
+            DagScheduler(dependencies, jobs=jobs).run(visit)
+        assert visited == ["a", "b"]
+
+    def test_critical_paths(self):
+        dependencies = {"a": [], "b": ["a"], "c": []}
+        scheduler = DagScheduler(
+            dependencies, jobs=2, costs={"a": 2.0, "b": 3.0, "c": 1.0}
+        )
+
+        assert scheduler.critical_paths() == {"a": 5.0, "b": 3.0, "c": 1.0}
+        assert scheduler.estimate() == 5.0
+        assert scheduler.estimate(["b", "c"]) == 3.0
+
+    def test_run_critical_path_first(self):
+        dependencies = {"short-1": [], "short-2": [], "long": []}
+        costs = {"short-1": 1.0, "short-2": 1.0, "long": 10.0}
+
+        started = set()
+        lock = threading.Lock()
+        barrier = threading.Barrier(2, timeout=5)
+
+        def visit(node):
+            with lock:
+                started.add(node)
+            if node == "short-2":
+                # the long one should have been started before the other short one
+                assert "long" in started
+            else:
+                barrier.wait()
+
+        DagScheduler(dependencies, jobs=2, costs=costs).run(visit)
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_report_progress(self, jobs):
+        dependencies = {"a": [], "b": ["a"], "c": []}
+        costs = {"a": 2.0, "b": 3.0, "c": 1.0}
+
+        progress = []
+        lock = threading.Lock()
+
+        def on_progress(done, total, eta):
+            with lock:
+                progress.append((done, total, eta))
+
+        DagScheduler(dependencies, jobs=jobs, costs=costs).run(
+            lambda _: None, on_progress=on_progress
+        )
+        assert sorted(done for done, _, _ in progress) == [1, 2, 3]
+        assert all(total == 3 for _, total, _ in progress)
+        assert max(progress)[2] == 0.0
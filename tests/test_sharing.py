@@ -0,0 +1,54 @@
+import pytest
+
+from dofu import package_requirements as prs, requirement as req, sharing
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://github.com/a/b",
+        "https://github.com/a/b.git",
+        "https://github.com/a/b/",
+        "https://GitHub.com/a/b.git/",
+        "http://github.com/a/b",
+        "git@github.com:a/b.git",
+        "github.com:a/b",
+        "ssh://git@github.com/a/b.git",
+        "ssh://git@github.com:22/a/b",
+    ],
+)
+def test_normalize_url(url):
+    assert sharing.normalize_url(url) == "https://github.com/a/b"
+
+
+def test_normalize_local_url():
+    assert sharing.normalize_url("/srv/git/repo.git/") == "/srv/git/repo"
+    assert sharing.normalize_url("file:///srv/git/repo.git") == "file:///srv/git/repo"
+
+
+def test_requirement_key():
+    a = req.GitRepoRequirement(url="https://github.com/a/b.git", path="/x")
+    b = req.GitRepoRequirement(url="git@GitHub.com:a/b", path="/x")
+    c = req.GitRepoRequirement(url="git@github.com:a/b", path="/y")
+
+    assert sharing.requirement_key(a) == sharing.requirement_key(b)
+    assert sharing.requirement_key(a) != sharing.requirement_key(c)
+
+
+def test_take_over(monkeypatch):
+    zsh = prs.PRSystem.make("zsh")
+    manager = next(zsh.candidate_managers(), None)
+    if manager is None:
+        pytest.skip("no package manager on this platform")
+
+    table = sharing.SharedRequirementTable()
+    monkeypatch.setenv(
+        sharing.HANDOVER_ENV_VAR,
+        sharing.encode_handover({sharing.requirement_key(zsh): manager}),
+    )
+    table.reset()
+
+    # a handed over package is taken over only once
+    assert table.take_over(zsh) is manager
+    assert table.take_over(zsh) is None
+    assert table.take_over(prs.PRSystem.make("tmux")) is None
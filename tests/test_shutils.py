@@ -102,3 +102,30 @@ def test_commands_exists(capfd):
     assert not shutils.do_commands_exist("haha")
     assert not shutils.do_commands_exist("echo", "haha")
     capfd.readouterr()
+
+
+class TestDecisions:
+    def test_save_and_load(self, tmp_path):
+        decisions = {
+            str(tmp_path / "a"): shutils.Strategy.FORCE,
+            str(tmp_path / "b"): shutils.Strategy.AUTO,
+        }
+        shutils.save_decisions(tmp_path / "decisions.yaml", decisions)
+        assert shutils.load_decisions(tmp_path / "decisions.yaml") == decisions
+
+    def test_decided_strategy(self, tmp_path, monkeypatch):
+        options = shutils.Options.instance()
+        monkeypatch.setattr(options, "strategy", shutils.Strategy.QUIT)
+        monkeypatch.setattr(
+            options, "decisions", {str(tmp_path / "a"): shutils.Strategy.FORCE}
+        )
+
+        (tmp_path / "a").write_text("a")
+        (tmp_path / "b").write_text("b")
+
+        # the decided conflict is overwritten instead of quitting
+        shutils.EnsurePathNotExists(action="test", path=tmp_path / "a")()
+        assert not os.path.exists(tmp_path / "a")
+
+        with pytest.raises(RuntimeError, match="already exists"):
+            shutils.EnsurePathNotExists(action="test", path=tmp_path / "b")()
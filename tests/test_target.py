@@ -0,0 +1,135 @@
+import json
+import os
+import subprocess
+import types
+
+import pytest
+
+from dofu import env, module as m, sharing, target as tg
+from dofu.options import Options, Strategy
+
+
+class CountingPackageRequirement:
+    def __init__(self, installed: list, package: str = "dummy-pkg", fail=False):
+        self.installed = installed
+        self.spec = types.SimpleNamespace(package=package, version="latest")
+        self.fail = fail
+
+    def install(self):
+        if self.fail:
+            raise RuntimeError(f"failed to install {self.spec.package}")
+        self.installed.append(self.spec.package)
+        return "manager"
+
+    def uninstall(self, pkg_manager):
+        self.installed.remove(self.spec.package)
+
+    def is_satisfied(self):
+        return False
+
+
+class TestTarget:
+    def test_parse(self, tmp_path):
+        target = tg.Target.parse(str(tmp_path / "home"))
+        assert target.home == str(tmp_path / "home")
+        assert target.cache_root == str(tmp_path / "home" / ".cache" / "dofu")
+
+        target = tg.Target.parse(f"{tmp_path / 'home'}:{tmp_path / 'cache'}")
+        assert target.cache_root == str(tmp_path / "cache")
+
+    def test_environ(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CONFIG_HOME", os.path.join(env.user_home(), ".config"))
+        target = tg.Target(home=str(tmp_path / "home"))
+
+        environ = target.environ()
+        assert environ["HOME"] == target.home
+        assert environ[env.CACHE_ROOT_ENV_VAR] == target.cache_root
+        assert environ["XDG_CONFIG_HOME"] == os.path.join(target.home, ".config")
+
+    def test_install_shared_packages_once(self):
+        installed = []
+        requirements = [
+            CountingPackageRequirement(installed),
+            CountingPackageRequirement(installed),
+        ]
+
+        class ModuleA:
+            @classmethod
+            def package_requirements(cls):
+                return requirements
+
+        class ModuleB(ModuleA):
+            pass
+
+        managers = tg.install_shared_packages([ModuleA, ModuleB])
+        assert installed == ["dummy-pkg"]
+        assert list(managers.values()) == ["manager"]
+
+    def test_roll_back_shared_packages(self):
+        installed = []
+
+        class ModuleA:
+            @classmethod
+            def package_requirements(cls):
+                return [
+                    CountingPackageRequirement(installed, "a"),
+                    CountingPackageRequirement(installed, "b", fail=True),
+                ]
+
+        with pytest.raises(RuntimeError):
+            tg.install_shared_packages([ModuleA])
+        assert installed == []
+
+    def test_capture_output_of_multiple_targets(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tg, "install_shared_packages", lambda _: {})
+        monkeypatch.setattr(
+            m.ModuleRegistrationManager,
+            "resolve_equip_blueprint",
+            staticmethod(lambda names: []),
+        )
+
+        captured = {}
+
+        def run(self, args, *, extra_env=None, **kwargs):
+            captured[self.home] = kwargs.get("stdout")
+            stdout = "" if "stdout" in kwargs else None
+            return subprocess.CompletedProcess(args, 0, stdout=stdout)
+
+        monkeypatch.setattr(tg.Target, "run", run)
+        targets = [tg.Target(home=str(tmp_path / name)) for name in ("a", "b")]
+
+        # a single target may prompt, so its output is not captured
+        with Options.scoped(strategy=Strategy.ASK):
+            tg.fan_out("equip", ["dummy"], targets[:1])
+        assert captured == {targets[0].home: None}
+
+        with Options.scoped(strategy=Strategy.AUTO):
+            tg.fan_out("equip", ["dummy"], targets)
+        assert set(captured.values()) == {subprocess.PIPE}
+
+    def test_hand_over_to_first_target(self, tmp_path, monkeypatch):
+        key = ("package", "PRSystem", "dummy-pkg", "latest")
+        manager = types.SimpleNamespace()
+        monkeypatch.setattr(tg, "install_shared_packages", lambda _: {key: manager})
+        monkeypatch.setattr(
+            m.ModuleRegistrationManager,
+            "resolve_equip_blueprint",
+            staticmethod(lambda names: []),
+        )
+
+        handovers = {}
+
+        def run(self, args, *, extra_env=None, **kwargs):
+            handovers[self.home] = (extra_env or {}).get(sharing.HANDOVER_ENV_VAR)
+            return subprocess.CompletedProcess(args, 0, stdout="")
+
+        monkeypatch.setattr(tg.Target, "run", run)
+        targets = [tg.Target(home=str(tmp_path / name)) for name in ("a", "b")]
+        with Options.scoped(strategy=Strategy.AUTO):
+            tg.fan_out("equip", ["dummy"], targets)
+
+        # only the first target takes the installed packages over
+        assert json.loads(handovers[targets[0].home]) == [
+            [list(key), "SimpleNamespace"]
+        ]
+        assert handovers[targets[1].home] is None
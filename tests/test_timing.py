@@ -0,0 +1,44 @@
+import pytest
+
+from dofu import timing
+
+
+class TestTimingStore:
+    def test_record_and_estimate(self):
+        store = timing.TimingStore()
+        key = timing.action_key(timing.Action.CLONE, "https://github.com/some/repo")
+        assert store.estimate(key) is None
+
+        store.record(key, 1.0)
+        store.record(key, 3.0)
+        assert store.estimate(key) == 2.0
+
+    def test_keep_recent_samples_only(self):
+        store = timing.TimingStore()
+        for seconds in range(10):
+            store.record("exec echo", float(seconds))
+
+        assert store.durations["exec echo"] == [5.0, 6.0, 7.0, 8.0, 9.0]
+
+    def test_timing(self):
+        store = timing.TimingStore()
+        with store.timing("exec echo"):
+            pass
+
+        assert len(store.durations["exec echo"]) == 1
+
+    def test_timing_failure(self):
+        store = timing.TimingStore()
+        with pytest.raises(RuntimeError):
+            with store.timing("exec false"):
+                raise RuntimeError("exit code 1")
+
+        assert store.estimate("exec false") is None
+
+    def test_save_and_load(self):
+        store = timing.TimingStore()
+        store.record("install zsh:latest", 4.2)
+        store.save()
+
+        loaded = timing.TimingStore.load()
+        assert loaded.durations == {"install zsh:latest": [4.2]}
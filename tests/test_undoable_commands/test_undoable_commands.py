@@ -398,3 +398,154 @@ class TestReplaceLine:
         assert isinstance(ret.stderr, (str, bytes))
         assert re.search(rb"Failed to input_file.*not exists", ret.stderr)
         assert ret.stdout is None
+
+
+class TestIsApplied:
+    def test_symlink(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+        link_file = f"{dummy_file}.ln"
+
+        cmd = ucs.UCSymlink(src=dummy_file, dst=link_file)
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        os.unlink(link_file)
+        os.symlink(tmp_dir, link_file)
+        assert cmd.is_applied() is False
+
+    def test_mkdir(self, tmp_path):
+        cmd = ucs.UCMkdir(path=str(tmp_path / "a" / "b"))
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        cmd.undo()
+        assert cmd.is_applied() is False
+
+    def test_append_line(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+
+        cmd = ucs.UCAppendLine(path=dummy_file, pattern="dummy", repl="DUMMY")
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        cmd.undo()
+        assert cmd.is_applied() is False
+
+    def test_append_env_var(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+
+        cmd = ucs.UCAppendEnvVar(varname="EDITOR", value="vim", rc=dummy_file)
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        with open(dummy_file, "w") as f:
+            f.write("export EDITOR=emacs\n")
+        assert cmd.is_applied() is False
+
+    def test_append_env_var_path(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+
+        cmd = ucs.UCAppendEnvVarPath(path="/opt/bin", rc=dummy_file)
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        cmd.undo()
+        assert cmd.is_applied() is False
+
+    def test_safe_move(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+        moved_file = f"{dummy_file}.moved"
+
+        cmd = ucs.UCSafeMove(src=str(dummy_file), dst=moved_file)
+        assert cmd.is_applied() is False
+
+        cmd.exec()
+        assert cmd.is_applied() is True
+
+        # the source reappears
+        shutil.copy(moved_file, dummy_file)
+        assert cmd.is_applied() is False
+
+    def test_unknown(self):
+        cmd = ucs.UCBackupMv(path="a")
+        assert cmd.is_applied() is None
+
+    def test_probe_applied(self, tmp_path):
+        cmds = [ucs.UCMkdir(path=str(tmp_path / f"dir-{i}")) for i in range(8)]
+        for cmd in cmds[::2]:
+            cmd.exec()
+
+        assert uc.probe_applied(cmds) == [True, False] * 4
+        assert uc.probe_applied([]) == []
+
+
+class TestRepair:
+    def test_safe_move(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+        moved_file = f"{dummy_file}.moved"
+
+        cmd = ucs.UCSafeMove(src=str(dummy_file), dst=moved_file)
+        cmd.exec()
+
+        # the source reappears with other content
+        with open(dummy_file, "w") as f:
+            f.write("recreated")
+        assert cmd.repair()
+        assert cmd.is_applied() is True
+
+        # the original file comes back
+        cmd.undo()
+        with open(dummy_file) as f:
+            assert f.read() == "dummy"
+        assert not os.path.exists(moved_file)
+
+    def test_symlink(self, tmp_dir_with_a_dummy_file):
+        tmp_dir, dummy_file = tmp_dir_with_a_dummy_file
+        link = tmp_dir / "link"
+
+        cmd = ucs.UCSymlink(src=str(dummy_file), dst=str(link))
+        cmd.exec()
+        os.unlink(link)
+        assert cmd.repair()
+        assert cmd.is_applied() is True
+
+        cmd.undo()
+        assert not os.path.lexists(link)
+
+    def test_chsh(self, monkeypatch):
+        chsh = ucs.UCChSh.__module__
+        state = {"shell": "/bin/bash"}
+
+        def check_call(sh: str):
+            state["shell"] = sh.split()[-1]
+
+        monkeypatch.setattr(f"{chsh}.login_shell", lambda: state["shell"])
+        monkeypatch.setattr(f"{chsh}.shutils.check_call", check_call)
+        monkeypatch.setattr(f"{chsh}.shutils.command_path", lambda c: f"/bin/{c}")
+        # the shell of the session is never the login shell to change
+        monkeypatch.setenv("SHELL", "/bin/zsh")
+
+        cmd = ucs.UCChSh(shell="zsh")
+        cmd.exec()
+        assert state["shell"] == "/bin/zsh"
+        assert cmd.is_applied() is True
+
+        # the login shell drifts
+        state["shell"] = "/bin/fish"
+        assert cmd.is_applied() is False
+        assert cmd.repair()
+        assert cmd.is_applied() is True
+
+        # the login shell from before the first execution comes back
+        cmd.undo()
+        assert state["shell"] == "/bin/bash"
@@ -0,0 +1,84 @@
+import os
+
+from dofu import verification as vrf
+
+
+class TestPathState:
+    def test_touched_file(self, tmp_path):
+        path = tmp_path / "file"
+        path.write_text("content")
+        state = vrf.PathState.capture(path)
+
+        os.utime(path, ns=(0, state.mtime_ns + 10**9))
+        assert state.drift(path) is None
+
+        path.write_text("changed")
+        assert state.drift(path) == "content is changed"
+
+    def test_mode(self, tmp_path):
+        path = tmp_path / "file"
+        path.write_text("content")
+        path.chmod(0o644)
+        state = vrf.PathState.capture(path)
+
+        path.chmod(0o600)
+        assert state.drift(path) == "mode 644 is changed to 600"
+
+    def test_link(self, tmp_path):
+        path = tmp_path / "link"
+        path.symlink_to(tmp_path / "a")
+        state = vrf.PathState.capture(path)
+        assert state.drift(path) is None
+
+        path.unlink()
+        path.symlink_to(tmp_path / "b")
+        assert "link target" in state.drift(path)
+
+        path.unlink()
+        path.mkdir()
+        assert state.drift(path) == "link is replaced by dir"
+
+        path.rmdir()
+        assert state.drift(path) == "link is missing"
+
+
+class TestStateIndex:
+    def test_verify(self, tmp_path):
+        a, b, shared = tmp_path / "a", tmp_path / "b", tmp_path / "shared"
+        for path in (a, b, shared):
+            path.write_text("content")
+
+        index = vrf.StateIndex()
+        index.record("test-a", [str(a), str(shared)])
+        index.record("test-b", [str(b)])
+        assert index.verify() == {"test-a": [], "test-b": []}
+
+        b.write_text("changed")
+        assert index.verify(["test-b"]) == {"test-b": [(str(b), "content is changed")]}
+
+        index.forget("test-b")
+        assert index.module_names() == ["test-a"]
+
+    def test_record_shared_path(self, tmp_path):
+        shared = tmp_path / "shared"
+        shared.write_text("content")
+
+        index = vrf.StateIndex()
+        index.record("test-a", [str(shared)])
+        shared.write_text("appended")
+        index.record("test-b", [str(shared)])
+
+        # the change made by another module is not a drift
+        assert index.verify() == {"test-a": [], "test-b": []}
+
+    def test_save_and_load(self, tmp_path):
+        path = tmp_path / "file"
+        path.write_text("content")
+
+        index = vrf.StateIndex()
+        index.record("test-a", [str(path), str(tmp_path / "missing")])
+        index.save(tmp_path / "states.json")
+
+        loaded = vrf.StateIndex.load(tmp_path / "states.json")
+        assert loaded.verify() == {"test-a": []}
+        assert vrf.StateIndex.load(tmp_path / "nothing.json").module_names() == []
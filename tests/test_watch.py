@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+from dofu import undoable_commands as ucs, watch as wt
+
+
+class TestWatcher:
+    @pytest.fixture(params=["polling", "inotify"])
+    def create(self, request):
+        if request.param == "inotify":
+            if not sys.platform.startswith("linux"):
+                pytest.skip("inotify is only available on linux")
+            return wt.InotifyWatcher
+        return lambda *args: wt.PollingWatcher(*args, interval=0.01)
+
+    def test_changes(self, create, tmp_path):
+        root, excluded, single = (
+            tmp_path / "root",
+            tmp_path / "root" / "x",
+            tmp_path / "single",
+        )
+        excluded.mkdir(parents=True)
+        (root / "file").write_text("content")
+
+        with create([root], [single], [excluded]) as watcher:
+            assert watcher.poll(0.05) == set()
+
+            (root / "file").write_text("changed")
+            (excluded / "file").write_text("ignored")
+            assert watcher.poll(1) == {str(root / "file")}
+
+            (root / "dir").mkdir()
+            assert str(root / "dir") in watcher.poll(1)
+
+            # the directories created later are watched as well
+            (root / "dir" / "nested").write_text("content")
+            assert str(root / "dir" / "nested") in watcher.poll(1)
+
+            single.symlink_to(root / "file")
+            assert str(single) in watcher.poll(1)
+
+
+class DummyModule:
+    @classmethod
+    def name(cls):
+        return "test-watch"
+
+    @classmethod
+    def gitrepo_requirements(cls):
+        return []
+
+    @classmethod
+    def command_requirements(cls):
+        return [
+            ucs.UCSymlink(src="/project/xdg-config/a", dst="/home/.config/a"),
+            ucs.UCMkdir(path="/home/.config/b"),
+        ]
+
+
+class TestChangeMapper:
+    def test_affected(self):
+        mapper = wt.ChangeMapper([DummyModule])
+
+        assert mapper.affected([__file__]) == ["test-watch"]
+        assert mapper.affected(["/project/xdg-config/a/init.lua"]) == ["test-watch"]
+        assert mapper.affected(["/home/.config/b"]) == ["test-watch"]
+        assert mapper.affected(["/home/.config/c", "/project/README.md"]) == []